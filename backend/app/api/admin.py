@@ -44,6 +44,7 @@ from app.schemas.support import (
     SupportTicketResponse, SupportTicketListResponse, SupportTicketUpdate,
     TicketMessageCreate, TicketMessageResponse, SupportStats,
 )
+from app.utils.pagination import paginate
 
 router = APIRouter()
 
@@ -176,12 +177,17 @@ async def get_platform_dashboard(
     # Top societies by visitors
     top_societies = []
     try:
+        # Count per society straight off the visits.society_id indexes, then attach names
+        visit_counts = (
+            select(Visit.society_id, func.count(Visit.id).label("visit_count"))
+            .where(Visit.society_id.is_not(None))
+            .group_by(Visit.society_id)
+            .subquery()
+        )
         result = await db.execute(
-            select(Society.id, Society.name, func.count(Visit.id).label("visit_count"))
-            .outerjoin(User, User.society_id == Society.id)
-            .outerjoin(Visit, Visit.host_id == User.id)
-            .group_by(Society.id, Society.name)
-            .order_by(desc("visit_count"))
+            select(Society.id, Society.name, visit_counts.c.visit_count)
+            .outerjoin(visit_counts, visit_counts.c.society_id == Society.id)
+            .order_by(desc(func.coalesce(visit_counts.c.visit_count, 0)))
             .limit(5)
         )
         for row in result:
@@ -223,6 +229,8 @@ async def list_all_societies(
     current_user: dict = Depends(require_platform_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     search: Optional[str] = None,
     status: Optional[str] = None,
     is_active: Optional[bool] = None,
@@ -250,14 +258,15 @@ async def list_all_societies(
         query = query.where(Society.is_active == is_active)
         count_query = count_query.where(Society.is_active == is_active)
 
-    # Get total count
-    total = await db.scalar(count_query)
-
-    # Paginate
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(Society.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    societies = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, Society.created_at, Society.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    societies = page_result.items
 
     # Enrich with stats
     items = []
@@ -292,14 +301,13 @@ async def list_all_societies(
             total_residents=resident_count or 0,
         ))
 
-    total_val = total or 0
-    total_pages = (total_val + page_size - 1) // page_size if total_val else 0
     return SocietyListResponse(
         items=items,
-        total=total_val,
+        total=page_result.total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages,
+        total_pages=page_result.total_pages(page_size),
+        next_cursor=page_result.next_cursor,
     )
 
 
@@ -329,13 +337,11 @@ async def get_society_detail(
 
     visitors_today = await db.scalar(
         select(func.count(Visit.id))
-        .join(User, Visit.host_id == User.id)
-        .where(and_(User.society_id == society.id, Visit.created_at >= today_start))
+        .where(and_(Visit.society_id == society.id, Visit.created_at >= today_start))
     )
     visitors_month = await db.scalar(
         select(func.count(Visit.id))
-        .join(User, Visit.host_id == User.id)
-        .where(and_(User.society_id == society.id, Visit.created_at >= month_start))
+        .where(and_(Visit.society_id == society.id, Visit.created_at >= month_start))
     )
 
     return SocietyDetailResponse(
@@ -519,6 +525,8 @@ async def list_all_users(
     current_user: dict = Depends(require_platform_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     search: Optional[str] = None,
     role: Optional[str] = None,
     is_active: Optional[bool] = None,
@@ -549,12 +557,15 @@ async def list_all_users(
         query = query.where(User.society_id == society_id)
         count_query = count_query.where(User.society_id == society_id)
 
-    total = await db.scalar(count_query)
-
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(User.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    users = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, User.created_at, User.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    users = page_result.items
 
     # Build society cache
     society_ids = set(u.society_id for u in users if u.society_id)
@@ -583,14 +594,13 @@ async def list_all_users(
             society_name=society_map.get(u.society_id),
         ))
 
-    total_val = total or 0
-    total_pages = (total_val + page_size - 1) // page_size if total_val else 0
     return GlobalUserListResponse(
         items=items,
-        total=total_val,
+        total=page_result.total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages,
+        total_pages=page_result.total_pages(page_size),
+        next_cursor=page_result.next_cursor,
     )
 
 
@@ -780,6 +790,8 @@ async def list_audit_logs(
     current_user: dict = Depends(require_platform_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     user_id: Optional[UUID] = None,
     action: Optional[str] = None,
     start_date: Optional[datetime] = None,
@@ -805,12 +817,15 @@ async def list_audit_logs(
         query = query.where(AuditLog.created_at <= end_date)
         count_query = count_query.where(AuditLog.created_at <= end_date)
 
-    total = await db.scalar(count_query)
-
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(AuditLog.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    logs = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, AuditLog.created_at, AuditLog.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logs = page_result.items
 
     # Get user names
     user_ids = set(l.user_id for l in logs if l.user_id)
@@ -837,8 +852,9 @@ async def list_audit_logs(
 
     return AuditLogListResponse(
         items=items,
-        total=total or 0,
+        total=page_result.total,
         page=page,
         page_size=page_size,
-        total_pages=(total or 0 + page_size - 1) // page_size if total else 0,
+        total_pages=page_result.total_pages(page_size),
+        next_cursor=page_result.next_cursor,
     )
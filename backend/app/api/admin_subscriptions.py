@@ -20,6 +20,7 @@ from app.schemas.subscription import (
     PaymentCreate, PaymentUpdate, PaymentResponse,
     InvoiceCreate, InvoiceResponse,
 )
+from app.utils.pagination import paginate
 
 router = APIRouter()
 
@@ -152,6 +153,8 @@ async def list_subscriptions(
     current_user: dict = Depends(require_platform_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     society_id: Optional[UUID] = None,
     status: Optional[str] = None,
 ):
@@ -167,12 +170,15 @@ async def list_subscriptions(
         query = query.where(Subscription.status == status)
         count_query = count_query.where(Subscription.status == status)
 
-    total = await db.scalar(count_query)
-
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(Subscription.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    subscriptions = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, Subscription.created_at, Subscription.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscriptions = page_result.items
 
     # Get society and plan names
     society_ids = set(s.society_id for s in subscriptions)
@@ -200,10 +206,11 @@ async def list_subscriptions(
 
     return {
         "items": items,
-        "total": total or 0,
+        "total": page_result.total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total or 0 + page_size - 1) // page_size if total else 0,
+        "total_pages": page_result.total_pages(page_size),
+        "next_cursor": page_result.next_cursor,
     }
 
 
@@ -285,6 +292,8 @@ async def list_payments(
     current_user: dict = Depends(require_platform_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     society_id: Optional[UUID] = None,
     status: Optional[str] = None,
 ):
@@ -300,12 +309,15 @@ async def list_payments(
         query = query.where(Payment.status == status)
         count_query = count_query.where(Payment.status == status)
 
-    total = await db.scalar(count_query)
-
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(Payment.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    payments = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, Payment.created_at, Payment.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    payments = page_result.items
 
     # Get society names
     society_ids = set(p.society_id for p in payments if p.society_id)
@@ -323,10 +335,11 @@ async def list_payments(
 
     return {
         "items": items,
-        "total": total or 0,
+        "total": page_result.total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total or 0 + page_size - 1) // page_size if total else 0,
+        "total_pages": page_result.total_pages(page_size),
+        "next_cursor": page_result.next_cursor,
     }
 
 
@@ -400,6 +413,8 @@ async def list_invoices(
     current_user: dict = Depends(require_platform_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     society_id: Optional[UUID] = None,
     status: Optional[str] = None,
 ):
@@ -415,21 +430,25 @@ async def list_invoices(
         query = query.where(Invoice.status == status)
         count_query = count_query.where(Invoice.status == status)
 
-    total = await db.scalar(count_query)
-
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(Invoice.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    invoices = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, Invoice.created_at, Invoice.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    invoices = page_result.items
 
     items = [InvoiceResponse.model_validate(inv) for inv in invoices]
 
     return {
         "items": items,
-        "total": total or 0,
+        "total": page_result.total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total or 0 + page_size - 1) // page_size if total else 0,
+        "total_pages": page_result.total_pages(page_size),
+        "next_cursor": page_result.next_cursor,
     }
 
 
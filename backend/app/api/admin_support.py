@@ -19,6 +19,7 @@ from app.schemas.support import (
     TicketMessageCreate, TicketMessageResponse,
     SupportStats,
 )
+from app.utils.pagination import paginate
 
 router = APIRouter()
 
@@ -34,6 +35,8 @@ async def list_support_tickets(
     current_user: dict = Depends(require_platform_admin),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     search: Optional[str] = None,
     society_id: Optional[UUID] = None,
     status: Optional[str] = None,
@@ -74,12 +77,15 @@ async def list_support_tickets(
         query = query.where(SupportTicket.assigned_to == assigned_to)
         count_query = count_query.where(SupportTicket.assigned_to == assigned_to)
 
-    total = await db.scalar(count_query)
-
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(SupportTicket.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    tickets = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, SupportTicket.created_at, SupportTicket.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    tickets = page_result.items
 
     # Get society and user names
     society_ids = set(t.society_id for t in tickets if t.society_id)
@@ -130,10 +136,11 @@ async def list_support_tickets(
 
     return SupportTicketListResponse(
         items=items,
-        total=total or 0,
+        total=page_result.total,
         page=page,
         page_size=page_size,
-        total_pages=(total or 0 + page_size - 1) // page_size if total else 0,
+        total_pages=page_result.total_pages(page_size),
+        next_cursor=page_result.next_cursor,
     )
 
 
@@ -18,7 +18,7 @@ from app.services.auth_service import (
     _user_to_response,
 )
 from app.services.refresh_token_service import rotate_refresh_token, revoke_all_for_user
-from app.core.security import create_access_token
+from app.core.security import create_access_token, invalidate_token
 
 router = APIRouter()
 
@@ -229,6 +229,8 @@ async def logout(current_user: dict = Depends(get_current_user), db: AsyncSessio
     # Revoke all refresh tokens for this user (local-auth only).
     user_id = current_user.get("sub") or current_user.get("user_id")
     if user_id:
+        # Drop the user's verified tokens from this worker's cache; others re-verify within AUTH_TOKEN_CACHE_TTL
+        invalidate_token(user_id=user_id)
         from uuid import UUID
         try:
             result = await db.execute(select(User).where(User.id == UUID(user_id)))
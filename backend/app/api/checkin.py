@@ -5,19 +5,109 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.dependencies import get_db, get_current_guard_or_admin, get_current_user_id
-from app.core.rbac import log_admin_action
+from app.core.pass_tokens import PassTokenError, accepts_legacy_code, is_pass_token, verify_pass_token
+from app.core.rbac import build_admin_audit_entry, log_admin_action
 from app.schemas.checkin import CheckInRequest, CheckOutRequest, CheckInResponse
 from app.services.visit_service import (
     get_visit_by_id,
-    get_visit_by_otp,
-    get_visit_by_qr,
+    load_visit_for_checkin,
+    find_pass_by_otp,
+    find_pass_by_qr,
     checkin_visit,
     checkout_visit,
 )
+from app.services.visit_state import VisitTransitionError
 
 router = APIRouter()
 
 
+def _society_id_uuid(current_user: dict) -> UUID | None:
+    sid = current_user.get("society_id")
+    if not sid:
+        return None
+    try:
+        return UUID(str(sid))
+    except (ValueError, TypeError):
+        return None
+
+
+async def _checkin_and_respond(
+    request: Request,
+    db: AsyncSession,
+    current_user: dict,
+    current_user_id: UUID,
+    visit_id: UUID,
+    action: str,
+    message: str,
+    rejected_status: int,
+    require_approved: bool = False,
+) -> CheckInResponse:
+    """
+    Shared write path for /otp, /qr and /by-visit: one joined load of visit, visitor, host and building,
+    one conditional UPDATE, then consent log + host notification + audit entry in a single flush.
+    """
+    visit = await load_visit_for_checkin(db, visit_id)
+    if not visit:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Visit not found")
+    if current_user.get("society_id") and visit.host and str(visit.host.society_id) != current_user.get("society_id"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Visit does not belong to your society")
+    if require_approved:
+        status_val = visit.status.value if hasattr(visit.status, "value") else str(visit.status)
+        if status_val != "approved":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Visit must be approved by resident before check-in. Current status: " + status_val,
+            )
+    audit_entry = build_admin_audit_entry(
+        current_user_id, current_user,
+        action, request.url.path, request.method,
+        {"visit_id": str(visit.id)},
+    )
+    try:
+        visit = await checkin_visit(db, visit, audit_entry=audit_entry)
+    except VisitTransitionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=rejected_status, detail=str(e))
+    host = visit.host
+    return CheckInResponse(
+        visit_id=visit.id,
+        status="checked_in",
+        checkin_time=visit.actual_arrival or datetime.utcnow(),
+        message=message,
+        visitor_name=visit.visitor.full_name if visit.visitor else None,
+        visitor_phone=visit.visitor.phone if visit.visitor else None,
+        purpose=visit.purpose,
+        host_name=host.full_name if host else None,
+        host_flat_number=host.flat_number if host else None,
+        building_name=host.building.name if host and host.building else None,
+    )
+
+
+def _verify_qr_offline(qr_code: str, current_user: dict) -> None:
+    """
+    Reject forged, expired, wrong-society or garbage QR codes before any DB access.
+    Signed tokens are checked by HMAC; legacy VMS- codes only pass a shape check and fall through to the lookup.
+    """
+    if is_pass_token(qr_code):
+        try:
+            claims = verify_pass_token(qr_code)
+        except PassTokenError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        if current_user.get("society_id") and str(claims.society_id) != current_user.get("society_id"):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Visit does not belong to your society")
+    elif not accepts_legacy_code(qr_code):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invalid or expired QR code")
+
+
+def _require_consent(data: CheckInRequest) -> None:
+    if not data.consent_given:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Consent required: Please agree to data collection (DPDP Act 2023)",
+        )
+
+
 @router.post("/otp")
 async def checkin_otp(
     request: Request,
@@ -30,45 +120,16 @@ async def checkin_otp(
     if not data.otp:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OTP required")
 
-    visit = await get_visit_by_otp(db, data.otp)
-    if not visit:
+    # OTPs are unique per society: resolve within the guard's society from the JWT
+    gate_pass = await find_pass_by_otp(db, data.otp, _society_id_uuid(current_user))
+    if not gate_pass:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invalid or expired OTP")
-    await db.refresh(visit, ["host"])
-    if current_user.get("society_id") and visit.host and str(visit.host.society_id) != current_user.get("society_id"):
+    if current_user.get("society_id") and str(gate_pass.society_id) != current_user.get("society_id"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Visit does not belong to your society")
-
-    if not data.consent_given:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Consent required: Please agree to data collection (DPDP Act 2023)",
-        )
-    try:
-        visit = await checkin_visit(db, visit)
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
-    await log_admin_action(
-        db, current_user_id, current_user,
-        "checkin_otp", request.url.path, request.method,
-        {"visit_id": str(visit.id)},
-    )
-    await db.refresh(visit, ["visitor", "host"])
-    building_name = None
-    try:
-        if visit.host and getattr(visit.host, "building", None):
-            building_name = getattr(visit.host.building, "name", None)
-    except Exception:
-        building_name = None
-    return CheckInResponse(
-        visit_id=visit.id,
-        status="checked_in",
-        checkin_time=visit.actual_arrival or datetime.utcnow(),
-        message="Check-in successful",
-        visitor_name=getattr(visit.visitor, "full_name", None) if visit.visitor else None,
-        visitor_phone=getattr(visit.visitor, "phone", None) if visit.visitor else None,
-        purpose=getattr(visit, "purpose", None),
-        host_name=getattr(visit.host, "full_name", None) if visit.host else None,
-        host_flat_number=getattr(visit.host, "flat_number", None) if visit.host else None,
-        building_name=building_name,
+    _require_consent(data)
+    return await _checkin_and_respond(
+        request, db, current_user, current_user_id, gate_pass.visit_id,
+        "checkin_otp", "Check-in successful", status.HTTP_403_FORBIDDEN,
     )
 
 
@@ -84,45 +145,16 @@ async def checkin_qr(
     if not data.qr_code:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="QR code required")
 
-    visit = await get_visit_by_qr(db, data.qr_code)
-    if not visit:
+    _verify_qr_offline(data.qr_code, current_user)
+    gate_pass = await find_pass_by_qr(db, data.qr_code)
+    if not gate_pass:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invalid or expired QR code")
-    await db.refresh(visit, ["host"])
-    if current_user.get("society_id") and visit.host and str(visit.host.society_id) != current_user.get("society_id"):
+    if current_user.get("society_id") and str(gate_pass.society_id) != current_user.get("society_id"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Visit does not belong to your society")
-
-    if not data.consent_given:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Consent required: Please agree to data collection (DPDP Act 2023)",
-        )
-    try:
-        visit = await checkin_visit(db, visit)
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
-    await log_admin_action(
-        db, current_user_id, current_user,
-        "checkin_qr", request.url.path, request.method,
-        {"visit_id": str(visit.id)},
-    )
-    await db.refresh(visit, ["visitor", "host"])
-    building_name = None
-    try:
-        if visit.host and getattr(visit.host, "building", None):
-            building_name = getattr(visit.host.building, "name", None)
-    except Exception:
-        building_name = None
-    return CheckInResponse(
-        visit_id=visit.id,
-        status="checked_in",
-        checkin_time=visit.actual_arrival or datetime.utcnow(),
-        message="Check-in successful",
-        visitor_name=getattr(visit.visitor, "full_name", None) if visit.visitor else None,
-        visitor_phone=getattr(visit.visitor, "phone", None) if visit.visitor else None,
-        purpose=getattr(visit, "purpose", None),
-        host_name=getattr(visit.host, "full_name", None) if visit.host else None,
-        host_flat_number=getattr(visit.host, "flat_number", None) if visit.host else None,
-        building_name=building_name,
+    _require_consent(data)
+    return await _checkin_and_respond(
+        request, db, current_user, current_user_id, gate_pass.visit_id,
+        "checkin_qr", "Check-in successful", status.HTTP_403_FORBIDDEN,
     )
 
 
@@ -138,32 +170,10 @@ async def checkin_by_visit(
     Check-in by visit ID (no OTP). For walk-ins: after resident approves, guard uses this to allow entry.
     Guard or admin only.
     """
-    visit = await get_visit_by_id(db, data.visit_id)
-    if not visit:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Visit not found")
-    await db.refresh(visit, ["host", "visitor"])
-    if current_user.get("society_id") and visit.host and str(visit.host.society_id) != current_user.get("society_id"):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Visit does not belong to your society")
-    status_val = visit.status.value if hasattr(visit.status, "value") else str(visit.status)
-    if status_val != "approved":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Visit must be approved by resident before check-in. Current status: " + status_val,
-        )
-    try:
-        visit = await checkin_visit(db, visit)
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    await log_admin_action(
-        db, current_user_id, current_user,
-        "checkin_by_visit", request.url.path, request.method,
-        {"visit_id": str(visit.id)},
-    )
-    return CheckInResponse(
-        visit_id=visit.id,
-        status="checked_in",
-        checkin_time=visit.actual_arrival or datetime.utcnow(),
-        message="Check-in successful (no OTP required)",
+    return await _checkin_and_respond(
+        request, db, current_user, current_user_id, data.visit_id,
+        "checkin_by_visit", "Check-in successful (no OTP required)", status.HTTP_400_BAD_REQUEST,
+        require_approved=True,
     )
 
 
@@ -182,7 +192,10 @@ async def checkout(
     if visit.status.value == "checked_out":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Already checked out")
 
-    visit = await checkout_visit(db, visit)
+    try:
+        visit = await checkout_visit(db, visit)
+    except VisitTransitionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     await log_admin_action(
         db, current_user_id, current_user,
         "checkout", request.url.path, request.method,
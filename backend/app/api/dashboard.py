@@ -1,18 +1,34 @@
-"""Dashboard endpoints. RBAC: stats=any auth; my-requests=resident/admin; muster=guard/admin."""
-from fastapi import APIRouter, Depends, Request
+"""Dashboard endpoints. RBAC: stats=any auth; my-requests=resident/admin; muster, occupancy=guard/admin; capacity=admin."""
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+import asyncio
 import io
 import csv
+import json
 from datetime import datetime
+from uuid import UUID
 
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, after_commit
 from app.core.dependencies import get_db, get_current_user, get_current_user_id, get_current_resident_or_admin, get_current_guard_or_admin
+from app.core.dependencies import get_current_admin, get_current_society_id
 from app.core.rbac import log_admin_action
-from app.schemas.dashboard import DashboardStatsResponse
-from app.services.visit_service import get_dashboard_stats, list_visits, get_checked_in_visitors
+from app.models.society import Society
+from app.schemas.dashboard import (
+    DashboardStatsResponse, OccupancyResponse, CapacityUpdate, VisitorPresenceResponse,
+)
+from app.services.presence import presence_registry, record_capacity
+from app.services.presence_journal import presence_journal
+from app.services.visit_service import (
+    get_dashboard_stats, list_visits, iter_muster_rows, MUSTER_FIELDS,
+)
 from app.models.visitor import VisitStatus
 from app.api.visitors import _visit_to_response
 
+logger = structlog.get_logger()
 router = APIRouter()
 
 
@@ -64,38 +80,173 @@ async def get_muster(
 ):
     """
     Emergency muster: list of people currently inside (checked-in). Scoped by society.
-    Guard or admin only. Use ?format=csv to download CSV.
+    Guard or admin only. Use ?format=csv to download CSV, ?format=ndjson for one JSON object per line.
+    Every format reads visits (never a worker's in-memory view, which can lag other workers' check-ins). CSV and
+    NDJSON are streamed as rows are fetched (no row cap); the audit entry is written before the stream starts.
+    Needs the DB; /muster/failsafe falls back to the local presence journal when it is down.
     """
     society_id = _society_id_uuid(current_user)
-    visits = await get_checked_in_visitors(db, society_id=society_id)
+    if format in ("csv", "ndjson"):
+        await log_admin_action(
+            db, current_user_id, current_user,
+            "muster_export", request.url.path, request.method,
+            {"format": format, "streamed": True},
+        )
+        stamp = datetime.utcnow().strftime('%Y%m%d_%H%M')
+        if format == "csv":
+            return StreamingResponse(
+                _stream_muster_csv(society_id),
+                media_type="text/csv",
+                headers={"Content-Disposition": f"attachment; filename=muster_{stamp}.csv"},
+            )
+        return StreamingResponse(
+            _stream_muster_ndjson(society_id),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f"attachment; filename=muster_{stamp}.ndjson"},
+        )
+    data = [row async for row in iter_muster_rows(db, society_id=society_id)]
     await log_admin_action(
         db, current_user_id, current_user,
         "muster_export", request.url.path, request.method,
-        {"format": format, "count": len(visits)},
+        {"format": format, "count": len(data)},
     )
-    data = [
-        {
-            "visitor_name": v.visitor.full_name,
-            "visitor_phone": v.visitor.phone,
-            "host_name": v.host.full_name if v.host else "",
-            "purpose": v.purpose or "",
-            "checkin_time": v.actual_arrival.isoformat() if v.actual_arrival else "",
-        }
-        for v in visits
-    ]
-    if format == "csv":
-        output = io.StringIO()
-        writer = csv.DictWriter(
-            output,
-            fieldnames=["visitor_name", "visitor_phone", "host_name", "purpose", "checkin_time"],
+    return {"count": len(data), "visitors": data}
+
+
+async def _muster_from_db(request: Request, current_user: dict, current_user_id, society_id) -> list[dict]:
+    async with AsyncSessionLocal() as db:
+        data = [row async for row in iter_muster_rows(db, society_id=society_id)]
+        await log_admin_action(
+            db, current_user_id, current_user,
+            "muster_export", request.url.path, request.method,
+            {"format": "failsafe", "source": "database", "count": len(data)},
         )
-        writer.writeheader()
-        writer.writerows(data)
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename=muster_{datetime.utcnow().strftime('%Y%m%d_%H%M')}.csv"
-            },
+        await db.commit()
+    return data
+
+
+@router.get("/muster/failsafe")
+async def get_muster_failsafe(
+    request: Request,
+    current_user: dict = Depends(get_current_guard_or_admin),
+    current_user_id=Depends(get_current_user_id),
+):
+    """
+    Muster for emergencies that must not depend on a healthy DB or pool. Reads checked-in visits with a
+    MUSTER_DB_TIMEOUT_SECONDS budget; on timeout or a DB error answers from the local presence journal instead.
+    "source" says which answered. Guard or admin only.
+    """
+    society_id = _society_id_uuid(current_user)
+    try:
+        data = await asyncio.wait_for(
+            _muster_from_db(request, current_user, current_user_id, society_id),
+            timeout=settings.MUSTER_DB_TIMEOUT_SECONDS,
         )
-    return {"count": len(data), "visitors": data}
+        return {"count": len(data), "visitors": data, "source": "database"}
+    except (asyncio.TimeoutError, SQLAlchemyError, OSError) as e:
+        if not presence_journal.is_open:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Database unavailable and presence journal is disabled",
+            )
+        # Audit row cannot be written without the DB; leave a log line instead
+        logger.warning(
+            "Muster served from presence journal", error=str(e) or type(e).__name__,
+            user_id=str(current_user_id), society_id=str(society_id) if society_id else None,
+        )
+    entries = await asyncio.to_thread(presence_journal.inside, society_id)  # may wait on another worker's flock
+    data = [entry.as_muster_row() for entry in entries]
+    return {"count": len(data), "visitors": data, "source": "journal"}
+
+
+# The request session is closed before a streamed body is sent, so the generators open their own.
+MUSTER_CHUNK_ROWS = 100
+
+
+async def _stream_muster_csv(society_id):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=MUSTER_FIELDS)
+    writer.writeheader()
+    rows = 0
+    async with AsyncSessionLocal() as db:
+        async for row in iter_muster_rows(db, society_id=society_id):
+            writer.writerow(row)
+            rows += 1
+            if rows % MUSTER_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def _stream_muster_ndjson(society_id):
+    lines = []
+    async with AsyncSessionLocal() as db:
+        async for row in iter_muster_rows(db, society_id=society_id):
+            lines.append(json.dumps(row) + "\n")
+            if len(lines) == MUSTER_CHUNK_ROWS:
+                yield "".join(lines)
+                lines.clear()
+    if lines:
+        yield "".join(lines)
+
+
+def _occupancy(society_id) -> OccupancyResponse:
+    inside = presence_registry.occupancy(society_id)
+    capacity = presence_registry.capacity(society_id)
+    return OccupancyResponse(
+        society_id=society_id,
+        inside=inside,
+        capacity=capacity,
+        utilisation=round(inside / capacity, 4) if capacity else None,
+        buildings=[
+            {"building_id": building_id, "inside": count}
+            for building_id, count in presence_registry.building_occupancy(society_id).items()
+        ],
+        recent_events=[
+            {"occupancy": e.occupancy, "capacity": e.capacity, "threshold": e.threshold,
+             "direction": e.direction, "at": e.at}
+            for e in presence_registry.events_for(society_id)
+        ],
+    )
+
+
+@router.get("/occupancy", response_model=OccupancyResponse)
+async def get_occupancy(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_guard_or_admin),
+    society_id=Depends(get_current_society_id),
+):
+    """Live occupancy of your society, per building, with recent capacity threshold events. Guard or admin only."""
+    await presence_registry.ensure_loaded(db)
+    return _occupancy(society_id)
+
+
+@router.put("/occupancy/capacity", response_model=OccupancyResponse)
+async def set_capacity(
+    body: CapacityUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_admin),
+    society_id=Depends(get_current_society_id),
+):
+    """Set (or clear) how many visitors may be inside at once; capacity events fire against it. Admin only."""
+    society = await db.get(Society, society_id)
+    if society is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Society not found")
+    society.max_occupancy = body.max_occupancy
+    await presence_registry.ensure_loaded(db)
+    after_commit(db, lambda: record_capacity(society_id, body.max_occupancy))
+    await db.commit()
+    return _occupancy(society_id)
+
+
+@router.get("/occupancy/visitors/{visitor_id}", response_model=VisitorPresenceResponse)
+async def get_visitor_presence(
+    visitor_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_guard_or_admin),
+    society_id=Depends(get_current_society_id),
+):
+    """Whether this visitor is inside your society right now. Guard or admin only."""
+    await presence_registry.ensure_loaded(db)
+    return VisitorPresenceResponse(visitor_id=visitor_id, inside=presence_registry.is_inside(society_id, visitor_id))
@@ -0,0 +1,77 @@
+"""Guard-device sync endpoints for offline-capable gates. RBAC: guard or admin, scoped to own society."""
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.dependencies import get_db, get_current_guard_or_admin, get_current_user_id, get_current_society_id
+from app.core.rbac import build_admin_audit_entry
+from app.schemas.gate_sync import (
+    GateManifestResponse,
+    GateDeltaResponse,
+    GateSigningKeyResponse,
+    OfflineCheckInBatch,
+    OfflineCheckInBatchResponse,
+)
+from app.services.gate_sync_service import build_manifest, build_delta, public_key, reconcile_offline_checkins
+
+router = APIRouter()
+
+
+@router.get("/signing-key", response_model=GateSigningKeyResponse)
+async def get_signing_key(
+    current_user: dict = Depends(get_current_guard_or_admin),
+    society_id: UUID = Depends(get_current_society_id),
+):
+    """Ed25519 public key for the society's manifests and deltas. Devices pin it when they are provisioned."""
+    return public_key(society_id)
+
+
+@router.get("/manifest", response_model=GateManifestResponse)
+async def get_manifest(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_guard_or_admin),
+    society_id: UUID = Depends(get_current_society_id),
+):
+    """
+    Signed snapshot of the society's currently valid passes (hashed QR, host flat, arrival window).
+    Devices match scans locally and then follow /delta with the returned cursor.
+    """
+    return await build_manifest(db, society_id)
+
+
+@router.get("/delta", response_model=GateDeltaResponse)
+async def get_delta(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_guard_or_admin),
+    society_id: UUID = Depends(get_current_society_id),
+    cursor: str | None = Query(None, description="Cursor from the manifest or previous delta"),
+    limit: int = Query(500, ge=1, le=1000),
+):
+    """Pass changes since cursor (by Visit.updated_at). Repeat while has_more is true."""
+    try:
+        return await build_delta(db, society_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post("/offline-checkins", response_model=OfflineCheckInBatchResponse)
+async def upload_offline_checkins(
+    request: Request,
+    data: OfflineCheckInBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_guard_or_admin),
+    current_user_id: UUID = Depends(get_current_user_id),
+    society_id: UUID = Depends(get_current_society_id),
+):
+    """
+    Upload check-ins queued while offline, each with the scanned/typed code. Each is reconciled against the visit:
+    checked_in, duplicate (already in via another gate/online), or rejected (with reason).
+    """
+    audit_entry = build_admin_audit_entry(
+        current_user_id, current_user,
+        "offline_checkin_sync", request.url.path, request.method,
+        {"received": len(data.checkins)},
+    )
+    return await reconcile_offline_checkins(
+        db, society_id, [c.model_dump() for c in data.checkins], audit_entry=audit_entry
+    )
@@ -43,3 +43,40 @@ async def health_db():
             status_code=503,
             content={"status": "error", "database": "disconnected", "detail": str(e)},
         )
+
+
+@router.get("/health/metrics")
+async def health_metrics():
+    """
+    In-process cache counters for this worker (hit/miss rates of the gate fast paths).
+    """
+    from app.core import notification_ws, outbound
+    from app.core.pass_tokens import token_stats
+    from app.core.tasks import background_tasks
+    from app.core.token_cache import token_cache
+    from app.services.blacklist_cache import blacklist_cache
+    from app.services.notification_retention import retention_progress
+    from app.services.outbox import outbox_workers
+    from app.services.pass_index import pass_index
+    from app.services.presence import presence_registry
+    from app.services.presence_journal import journal_stats
+    from app.services.unread_counts import unread_counts
+    from app.services.visit_counters import counter_mirror
+
+    return JSONResponse(
+        content={
+            "blacklist_cache": blacklist_cache.stats(),
+            "pass_index": pass_index.stats(),
+            "qr_tokens": dict(token_stats),
+            "dashboard_counters": counter_mirror.stats(),
+            "presence": presence_registry.stats(),
+            "presence_journal": journal_stats(),
+            "notification_push": notification_ws.stats(),
+            "unread_counts": unread_counts.stats(),
+            "notification_retention": retention_progress.stats(),
+            "outbox": outbox_workers.stats(),
+            "outbound": outbound.stats(),
+            "auth_tokens": token_cache.stats(),
+            "background_tasks": background_tasks.stats(),
+        }
+    )
@@ -1,14 +1,15 @@
 """Notifications API for host alerts and society notices."""
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
 from fastapi import WebSocket, WebSocketDisconnect
 from pydantic import BaseModel, Field
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import StreamingResponse
 import asyncio
 import json
 from datetime import datetime
+from typing import Optional
 import structlog
 
 from app.core.dependencies import (
@@ -19,13 +20,31 @@ from app.core.dependencies import (
     get_current_society_id,
 )
 from app.core.security import verify_token
-from app.core.notification_ws import register, unregister, broadcast_to_user
-from app.models.notification import Notification
+from app.core.database import AsyncSessionLocal, after_commit
+from app.core.notification_ws import (
+    connections, subscribe, unsubscribe, publish_to_rooms, rooms_from_claims, society_room,
+)
 from app.models.user import User
+from app.services.notification_service import (
+    CATCH_UP_LIMIT,
+    INBOX_PAGE_SIZE,
+    create_society_notice as create_society_notice_row,
+    get_unread_count,
+    list_user_notifications_after,
+    list_user_notifications_page,
+    mark_all_notifications_read,
+    mark_notification_read,
+    notice_to_dict,
+)
+from app.utils.cursor import encode_cursor, decode_cursor
 
 router = APIRouter()
 logger = structlog.get_logger()
 
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+
+
 class SocietyNoticeCreate(BaseModel):
     title: str = Field(..., min_length=1, max_length=255)
     body: str | None = Field(default=None, max_length=2000)
@@ -33,29 +52,46 @@ class SocietyNoticeCreate(BaseModel):
 
 @router.get("/")
 async def list_notifications(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_resident_or_admin),
     user_id: UUID = Depends(get_current_user_id),
     unread_only: bool = Query(False),
+    limit: int = Query(INBOX_PAGE_SIZE, ge=1, le=100),
+    cursor: str | None = Query(None, description="X-Next-Cursor from the previous page"),
+):
+    """
+    List notifications for current user (host), with society notices merged in, newest first. Resident or admin only.
+    Cursor for the next page is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    try:
+        page = await list_user_notifications_page(db, user_id, unread_only=unread_only, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/unread-count")
+async def unread_count(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_resident_or_admin),
+    user_id: UUID = Depends(get_current_user_id),
+):
+    """Unread notifications and society notices for the current user (badge). Served from cache."""
+    return {"unread": await get_unread_count(db, user_id)}
+
+
+@router.post("/read-all")
+async def mark_all_read(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_resident_or_admin),
+    user_id: UUID = Depends(get_current_user_id),
 ):
-    """List notifications for current user (host). Resident or admin only."""
-    q = select(Notification).where(Notification.user_id == user_id).order_by(Notification.created_at.desc())
-    if unread_only:
-        q = q.where(Notification.read == False)
-    result = await db.execute(q)
-    notifications = result.scalars().all()
-    return [
-        {
-            "id": str(n.id),
-            "type": n.type,
-            "title": n.title,
-            "body": n.body,
-            "read": n.read,
-            "extra_data": n.extra_data,
-            "created_at": n.created_at.isoformat(),
-        }
-        for n in notifications
-    ]
+    """Mark every notification and society notice read for the current user. Resident or admin only."""
+    marked = await mark_all_notifications_read(db, user_id)
+    return {"message": "Marked all as read", "marked": marked}
 
 
 @router.patch("/{notification_id}/read")
@@ -65,59 +101,73 @@ async def mark_read(
     current_user: dict = Depends(get_current_resident_or_admin),
     user_id: UUID = Depends(get_current_user_id),
 ):
-    """Mark notification as read. Resident or admin only; only own notifications."""
-    result = await db.execute(
-        select(Notification).where(
-            Notification.id == notification_id,
-            Notification.user_id == user_id,
-        )
-    )
-    n = result.scalar_one_or_none()
-    if not n:
+    """Mark notification (or society notice) as read. Resident or admin only; only own notifications."""
+    if not await mark_notification_read(db, user_id, notification_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found")
-    n.read = True
-    await db.flush()
     return {"message": "Marked as read"}
 
 
+def _sse_notification(payload: dict) -> str:
+    event_id = encode_cursor(datetime.fromisoformat(payload["created_at"]), UUID(payload["id"]))
+    return f"id: {event_id}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+
+
 @router.get("/stream")
 async def stream_notifications(
-    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_resident_or_admin),
     user_id: UUID = Depends(get_current_user_id),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
 ):
     """
-    Server-Sent Events stream for notifications.
-    Uses a simple DB poll loop and emits events when new notifications are created.
+    Server-Sent Events stream for notifications, fed by the in-process publish path (no DB session is held).
+    Each event id is a cursor; a reconnect with Last-Event-ID gets what it missed from one catch-up query, or a
+    `resync` event if more than CATCH_UP_LIMIT are missing (client should refetch the list).
     """
+    # Subscribe before the catch-up query so nothing committed in between is missed (duplicates are skipped)
+    rooms = rooms_from_claims(current_user)
+    queue = subscribe(user_id, rooms)
+    backlog: list[dict] = []
+    if last_event_id:
+        try:
+            after = decode_cursor(last_event_id)
+        except ValueError:
+            after = None
+        if after is not None:
+            try:
+                async with AsyncSessionLocal() as db:
+                    backlog = await list_user_notifications_after(db, user_id, after)
+            except Exception:
+                unsubscribe(user_id, queue, rooms)
+                raise
 
     async def event_gen():
-        last_ts = datetime.utcnow()
-        # Initial hello (lets client confirm connection)
-        yield "event: ready\ndata: {}\n\n"
-        while True:
-            await asyncio.sleep(2)
-            result = await db.execute(
-                select(Notification)
-                .where(Notification.user_id == user_id, Notification.created_at > last_ts)
-                .order_by(Notification.created_at.asc())
-            )
-            rows = result.scalars().all()
-            if rows:
-                last_ts = rows[-1].created_at
-                for n in rows:
-                    payload = {
-                        "id": str(n.id),
-                        "type": n.type,
-                        "title": n.title,
-                        "body": n.body,
-                        "read": n.read,
-                        "extra_data": n.extra_data,
-                        "created_at": n.created_at.isoformat(),
-                    }
-                    yield f"event: notification\ndata: {json.dumps(payload)}\n\n"
-
-    return StreamingResponse(event_gen(), media_type="text/event-stream")
+        try:
+            yield f"retry: {SSE_RETRY_MS}\nevent: ready\ndata: {{}}\n\n"
+            sent = set()
+            for payload in backlog:
+                sent.add(payload["id"])
+                yield _sse_notification(payload)
+            if len(backlog) >= CATCH_UP_LIMIT:
+                yield "event: resync\ndata: {}\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload is None:
+                    return  # fell behind; the client reconnects with Last-Event-ID
+                if payload["id"] in sent:
+                    continue
+                yield _sse_notification(payload)
+        finally:
+            unsubscribe(user_id, queue, rooms)
+
+    return StreamingResponse(
+        event_gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.websocket("/ws")
@@ -128,7 +178,8 @@ async def websocket_notifications(
     """
     WebSocket endpoint for real-time notifications.
     Client connects with ?token=<access_token>. Server pushes JSON messages
-    when new notifications are created for the user.
+    when new notifications are created for the user, and events for the rooms
+    (society, building, role in the society) its token claims put it in.
     """
     await websocket.accept()
     user_id = None
@@ -148,21 +199,20 @@ async def websocket_notifications(
         await websocket.close(code=4008)
         return
 
-    await register(websocket, user_id)
+    conn = connections.register(websocket, user_id, rooms_from_claims(user))
     try:
-        # Send initial connected message
-        await websocket.send_text(json.dumps({"event": "connected", "user_id": str(user_id)}))
+        # All frames go through the connection's queue so its writer task is the only sender
+        conn.send({"event": "connected", "user_id": str(user_id)})
         # Keep connection open; receive loop to detect disconnect
         while True:
             data = await websocket.receive_text()
             # Optional: client can send ping and we pong
-            if data.strip() == "ping":
-                await websocket.send_text(json.dumps({"event": "pong"}))
-    except WebSocketDisconnect:
-        pass
+            if data.strip() == "ping" and not conn.send({"event": "pong"}):
+                connections.evict(conn)
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # RuntimeError: the writer already closed a slow or dead socket
     finally:
-        if user_id is not None:
-            await unregister(websocket, user_id)
+        connections.unregister(conn)
 
 
 @router.post("/society", status_code=status.HTTP_201_CREATED)
@@ -171,43 +221,24 @@ async def create_society_notice(
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_admin),
     society_id: UUID = Depends(get_current_society_id),
+    user_id: UUID = Depends(get_current_user_id),
 ):
     """
-    Create a society-wide notice by inserting a notification row for each active user in the society.
+    Create a society-wide notice: stored once and merged into each member's notifications when they read them.
     Committee only.
     """
-    result = await db.execute(
-        select(User.id).where(User.society_id == society_id, User.is_active == True)  # noqa: E712
+    members = await db.scalar(
+        select(func.count(User.id)).where(User.society_id == society_id, User.is_active == True)  # noqa: E712
     )
-    user_ids = [row[0] for row in result.all()]
-    if not user_ids:
+    if not members:
         return {"message": "No active users in society", "created": 0}
 
-    # Insert one notification per user (simple & reliable; can optimize later)
-    for uid in user_ids:
-        db.add(
-            Notification(
-                user_id=uid,
-                type="society_notice",
-                title=payload.title.strip(),
-                body=(payload.body.strip() if payload.body else None),
-                read=False,
-                extra_data=None,
-            )
-        )
-    await db.flush()
-    await db.flush()
-
-    # Push to all connected WebSocket clients for each user
-    ws_payload = {
-        "event": "notification",
-        "payload": {
-            "type": "society_notice",
-            "title": payload.title.strip(),
-            "body": (payload.body.strip() if payload.body else None),
-        },
-    }
-    for uid in user_ids:
-        asyncio.create_task(broadcast_to_user(uid, ws_payload))
-
-    return {"message": "Notice created", "created": len(user_ids)}
+    title = payload.title.strip()
+    body = payload.body.strip() if payload.body else None
+    notice = await create_society_notice_row(db, society_id, title, body, created_by=user_id)
+
+    # One push to the society room reaches every member with a stream or WebSocket open, once committed
+    pushed = notice_to_dict(notice, read=False)
+    after_commit(db, lambda: publish_to_rooms([society_room(society_id)], pushed))
+
+    return {"message": "Notice created", "id": str(notice.id), "created": members}
@@ -18,6 +18,7 @@ from app.schemas.complaint import (
     ComplaintCommentCreate, ComplaintCommentResponse,
     ComplaintStats,
 )
+from app.utils.pagination import paginate
 
 router = APIRouter()
 
@@ -36,6 +37,8 @@ async def list_society_complaints(
     current_user_id: UUID = Depends(get_current_user_id),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; takes precedence over page"),
+    include_total: bool = Query(True, description="Set false to skip the COUNT (total/total_pages come back null)"),
     search: Optional[str] = None,
     status: Optional[str] = None,
     priority: Optional[str] = None,
@@ -69,12 +72,15 @@ async def list_society_complaints(
         query = query.where(Complaint.category == category)
         count_query = count_query.where(Complaint.category == category)
 
-    total = await db.scalar(count_query)
-
-    offset = (page - 1) * page_size
-    query = query.order_by(desc(Complaint.created_at)).offset(offset).limit(page_size)
-    result = await db.execute(query)
-    complaints = result.scalars().all()
+    try:
+        page_result = await paginate(
+            db, query, Complaint.created_at, Complaint.id, page_size,
+            cursor=cursor, offset=(page - 1) * page_size,
+            count_query=count_query if include_total else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    complaints = page_result.items
 
     # Get user names
     user_ids = set()
@@ -118,10 +124,11 @@ async def list_society_complaints(
 
     return ComplaintListResponse(
         items=items,
-        total=total or 0,
+        total=page_result.total,
         page=page,
         page_size=page_size,
-        total_pages=(total or 0 + page_size - 1) // page_size if total else 0,
+        total_pages=page_result.total_pages(page_size),
+        next_cursor=page_result.next_cursor,
     )
 
 
@@ -1,6 +1,6 @@
 """Visitor & Visit management endpoints. RBAC: resident/admin for invite/approve; guard/admin for walk-in."""
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -23,9 +23,11 @@ from app.services.visit_service import (
     get_resident_by_building_and_flat,
     ensure_user_in_society,
     ensure_building_in_society,
-    list_visits,
+    list_visits_page,
     approve_visit,
 )
+from app.services.visit_state import VisitTransitionError
+from app.services.outbox import enqueue_whatsapp_invite
 from app.models.visitor import Visit
 
 router = APIRouter()
@@ -84,13 +86,8 @@ async def invite_visitor(
             {"visit_id": str(visit.id), "visitor_phone": visit_data.visitor_phone},
         )
 
-        from app.services.waha_service import send_invite_whatsapp
-        await send_invite_whatsapp(
-            visit_data.visitor_phone,
-            visit_data.visitor_name,
-            visit.otp or "",
-            visit.qr_code,
-        )
+        # Sent by the outbox workers once this transaction commits; the request never waits on WAHA
+        enqueue_whatsapp_invite(db, visit.id, visit_data.visitor_phone, visit_data.visitor_name)
 
         return _visit_to_response(visit)
     except ValueError as e:
@@ -176,17 +173,20 @@ async def walkin_visitor(
 
 @router.get("/")
 async def list_visits_api(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_any_role),
     current_user_id: UUID = Depends(get_current_user_id),
     limit: int = Query(50, le=100),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="X-Next-Cursor from the previous page; takes precedence over offset"),
     status: str | None = Query(None),
     host_id: str | None = Query(None, description="Filter by host. Use 'me' for current user's visits."),
 ):
     """
     List visits. Residents see only their own (host_id=me enforced).
     Guard/admin may pass host_id or list all.
+    Cursor for the next page is returned in the X-Next-Cursor header (absent on the last page).
     """
     hid = None
     if host_id == "me":
@@ -208,8 +208,15 @@ async def list_visits_api(
         sid = UUID(society_id) if society_id else None
     except (ValueError, TypeError):
         sid = None
-    visits = await list_visits(db, limit=limit, offset=offset, status=status, host_id=hid, society_id=sid)
-    return [_visit_to_response(v) for v in visits]
+    try:
+        page = await list_visits_page(
+            db, limit=limit, offset=offset, status=status, host_id=hid, society_id=sid, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return [_visit_to_response(v) for v in page.items]
 
 
 @router.patch("/{visit_id}/approve")
@@ -240,6 +247,8 @@ async def approve_visit_api(
             {"visit_id": str(visit_id)},
         )
         return _visit_to_response(visit)
+    except VisitTransitionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
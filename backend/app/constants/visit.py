@@ -3,6 +3,10 @@
 VISIT_STATUSES = ["pending", "approved", "checked_in", "checked_out", "cancelled"]
 OTP_LENGTH = 6
 OTP_EXPIRE_MINUTES = 30
+# Random draws before giving up on a society-unique OTP (10^6 codes; only live passes block a code)
+OTP_ALLOCATION_ATTEMPTS = 20
+# Inserts retried with a fresh OTP when another worker committed the same one first (unique index conflict)
+OTP_INSERT_ATTEMPTS = 3
 QR_PREFIX = "VMS"
 # Time validity: allow check-in within ARRIVAL_WINDOW_MINUTES before/after expected_arrival
 ARRIVAL_WINDOW_MINUTES = 60
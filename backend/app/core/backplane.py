@@ -0,0 +1,212 @@
+"""
+Pub/sub backplane for real-time notifications across workers and hosts.
+notification_ws.publish() hands each committed notification (a frame addressed to user ids and/or rooms) to the
+backplane once; every worker (including the publishing one) receives it and delivers to its own SSE streams and
+WebSockets. NOTIFY_BACKPLANE picks the
+implementation: "local" (in-process, single worker and tests) or "redis" (one Redis pub/sub channel at REDIS_URL).
+Redis pub/sub is at-most-once: a worker that is disconnected misses messages, and its SSE clients recover them
+with Last-Event-ID when they reconnect.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+
+import structlog
+
+logger = structlog.get_logger()
+
+Deliver = Callable[[list[UUID], list[str], dict], None]
+
+OUTGOING_LIMIT = 10_000  # notifications waiting to be sent to Redis before we fall back to local-only delivery
+LATENCY_SAMPLES = 1000
+RECONNECT_MAX_SECONDS = 30.0
+
+
+def _percentile(samples: Iterable[float], pct: float) -> Optional[float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 3)
+
+
+class Backplane:
+    """Fan-out of (user_ids, rooms, frame) to every worker's deliver callback."""
+
+    name = "base"
+
+    def __init__(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+        self._latency_ms: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, user_ids: list[UUID], rooms: list[str], frame: dict, priority: int = 1) -> None:
+        """Send once; never blocks the caller (runs in after-commit hooks). Lower priority values are sent first."""
+        raise NotImplementedError
+
+    def _received(self, user_ids: list[UUID], rooms: list[str], frame: dict, sent_at: float) -> None:
+        self.received += 1
+        self._latency_ms.append((time.time() - sent_at) * 1000)
+        self._deliver(user_ids, rooms, frame)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.name,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+            "latency_p50_ms": _percentile(self._latency_ms, 50),
+            "latency_p99_ms": _percentile(self._latency_ms, 99),
+        }
+
+
+class InProcessBackplane(Backplane):
+    """Single worker: publishing is delivering."""
+
+    name = "local"
+
+    def publish(self, user_ids: list[UUID], rooms: list[str], frame: dict, priority: int = 1) -> None:
+        self.published += 1
+        self._received(user_ids, rooms, frame, time.time())
+
+
+class RedisBackplane(Backplane):
+    """
+    One Redis channel shared by all workers. A sender task drains an outgoing queue in priority order, FIFO within a
+    priority (so a user's notifications of one class arrive in commit order), and a listener task delivers what
+    arrives, reconnecting with backoff.
+    If Redis is unreachable the notification is still delivered to this worker's own connections.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str, deliver: Deliver) -> None:
+        super().__init__(deliver)
+        self.url = url
+        self.channel = channel
+        self.connected = False
+        self.fallbacks = 0
+        self._redis = None
+        self._outgoing: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=OUTGOING_LIMIT)
+        self._sequence = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.url)
+        self._tasks = [
+            asyncio.create_task(self._send_loop()),
+            asyncio.create_task(self._listen_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+        self.connected = False
+
+    def publish(self, user_ids: list[UUID], rooms: list[str], frame: dict, priority: int = 1) -> None:
+        if not self._tasks:
+            self._local(user_ids, rooms, frame)
+            return
+        try:
+            self._outgoing.put_nowait((priority, next(self._sequence), user_ids, rooms, frame, time.time()))
+        except asyncio.QueueFull:
+            self._local(user_ids, rooms, frame)
+
+    def _local(self, user_ids: list[UUID], rooms: list[str], frame: dict) -> None:
+        self.fallbacks += 1
+        self._deliver(user_ids, rooms, frame)
+
+    def encode(self, user_ids: list[UUID], rooms: list[str], frame: dict, sent_at: float) -> str:
+        return json.dumps(
+            {"t": sent_at, "u": [str(u) for u in user_ids], "r": rooms, "f": frame},
+            separators=(",", ":"),
+        )
+
+    def handle(self, raw) -> None:
+        """Deliver one channel message locally; malformed messages are counted and dropped."""
+        try:
+            message = json.loads(raw)
+            user_ids = [UUID(u) for u in message["u"]]
+            rooms = [str(r) for r in message["r"]]
+            frame, sent_at = dict(message["f"]), float(message["t"])
+        except (ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            logger.warning("Malformed backplane message", error=str(e))
+            return
+        self._received(user_ids, rooms, frame, sent_at)
+
+    async def _send_loop(self) -> None:
+        while True:
+            _, _, user_ids, rooms, frame, sent_at = await self._outgoing.get()
+            try:
+                await self._redis.publish(self.channel, self.encode(user_ids, rooms, frame, sent_at))
+                self.published += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Backplane publish failed; delivering locally only", error=str(e))
+                self._local(user_ids, rooms, frame)
+
+    async def _listen_loop(self) -> None:
+        delay = 0.5
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self.connected = True
+                delay = 0.5
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Backplane subscription lost", error=str(e), retry_in=delay)
+            finally:
+                self.connected = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "connected": self.connected,
+            "pending": self._outgoing.qsize(),
+            "local_fallbacks": self.fallbacks,
+        }
+
+
+def create_backplane(kind: str, deliver: Deliver, url: str = "", channel: str = "") -> Backplane:
+    if kind == "redis":
+        return RedisBackplane(url, channel, deliver)
+    if kind in ("", "local"):
+        return InProcessBackplane(deliver)
+    raise ValueError(f"Unknown NOTIFY_BACKPLANE {kind!r} (expected 'local' or 'redis')")
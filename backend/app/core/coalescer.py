@@ -0,0 +1,91 @@
+"""
+Per-user coalescing of notification pushes.
+The first notification for a user in a quiet period is pushed at once; any more that arrive within
+NOTIFY_COALESCE_WINDOW_MS are held and pushed together as one batch when the window closes (or when
+NOTIFY_COALESCE_MAX_BATCH is reached). A burst of check-ins during a party becomes one push per window that carries
+every new notification inline, instead of one push (and one client refetch) each.
+"""
+import asyncio
+from typing import Callable, Optional
+from uuid import UUID
+
+Emit = Callable[[UUID, list[dict]], None]
+
+
+class _Window:
+    __slots__ = ("pending", "timer")
+
+    def __init__(self, timer: asyncio.TimerHandle) -> None:
+        self.pending: list[dict] = []
+        self.timer = timer
+
+
+class Coalescer:
+    def __init__(self, window_seconds: float, max_batch: int, emit: Emit) -> None:
+        self.window_seconds = window_seconds
+        self.max_batch = max(1, max_batch)
+        self._emit = emit
+        self._windows: dict[UUID, _Window] = {}
+        self.received = 0
+        self.pushes = 0
+        self.batches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def push(self, user_id: UUID, notification: dict) -> None:
+        self.received += 1
+        window = self._windows.get(user_id)
+        if window is None:
+            self._send(user_id, [notification])
+            self._open(user_id)
+            return
+        window.pending.append(notification)
+        if len(window.pending) >= self.max_batch:
+            window.timer.cancel()
+            self._close(user_id)
+
+    def _open(self, user_id: UUID) -> None:
+        timer = asyncio.get_running_loop().call_later(self.window_seconds, self._close, user_id)
+        self._windows[user_id] = _Window(timer)
+
+    def _close(self, user_id: UUID) -> None:
+        """Window over: push what accumulated and keep coalescing while the burst lasts; end it once quiet."""
+        window = self._windows.pop(user_id, None)
+        if window is None or not window.pending:
+            return
+        self._send(user_id, window.pending)
+        self._open(user_id)
+
+    def _send(self, user_id: UUID, notifications: list[dict]) -> None:
+        self.pushes += 1
+        if len(notifications) > 1:
+            self.batches += 1
+        self._emit(user_id, notifications)
+
+    def flush(self, user_id: Optional[UUID] = None) -> None:
+        """Push everything held now (shutdown, tests) and end the windows."""
+        for uid in [user_id] if user_id is not None else list(self._windows):
+            window = self._windows.pop(uid, None)
+            if window is None:
+                continue
+            window.timer.cancel()
+            if window.pending:
+                self._send(uid, window.pending)
+
+    def clear(self) -> None:
+        """Drop held notifications without pushing them."""
+        for window in self._windows.values():
+            window.timer.cancel()
+        self._windows.clear()
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": round(self.window_seconds * 1000),
+            "received": self.received,
+            "pushes": self.pushes,
+            "batches": self.batches,
+            "open_windows": len(self._windows),
+            "held": sum(len(w.pending) for w in self._windows.values()),
+        }
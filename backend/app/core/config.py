@@ -9,6 +9,7 @@ from typing import List
 # Resolve paths relative to backend/
 _BASE_DIR = Path(__file__).resolve().parent.parent
 _DEFAULT_DB = _BASE_DIR / "vms.db"
+_DEFAULT_PRESENCE_JOURNAL = _BASE_DIR / "presence.journal"
 _ENV_FILE = _BASE_DIR / ".env"
 
 
@@ -38,6 +39,7 @@ class Settings(BaseSettings):
     KEYCLOAK_REALM: str = "vms"
     KEYCLOAK_CLIENT_ID: str = "vms-backend"
     KEYCLOAK_CLIENT_SECRET: str = ""
+    KEYCLOAK_TIMEOUT_SECONDS: float = 5.0
 
     # JWT
     JWT_ALGORITHM: str = "RS256"
@@ -46,6 +48,42 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_CACHE_TTL: int = 3600
+    # Real-time fan-out across workers: "local" (single worker) or "redis" (pub/sub on REDIS_URL)
+    NOTIFY_BACKPLANE: str = "local"
+    NOTIFY_BACKPLANE_CHANNEL: str = "vms:notifications"
+    WS_SEND_QUEUE_SIZE: int = 64  # Frames buffered per WebSocket; a client that falls this far behind is closed
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0  # A single send stalled longer than this closes the socket
+    WS_HEARTBEAT_SECONDS: float = 25.0  # Heartbeat frame on idle sockets (keeps proxies open, detects dead peers)
+    # Local push fan-out: workers per priority class (gate alerts / other notifications / society notices)
+    PUSH_GATE_WORKERS: int = 2
+    PUSH_TRANSACTIONAL_WORKERS: int = 2
+    PUSH_BULK_WORKERS: int = 1
+    PUSH_QUEUE_SIZE: int = 10_000  # Per class; pushes beyond this are dropped (clients catch up from the list)
+    PUSH_FANOUT_CHUNK: int = 200  # Deliveries between yields to the event loop in a large fan-out
+    NOTIFY_COALESCE_WINDOW_MS: int = 1000  # Per-user notifications within this window go out as one push; 0 = off
+    NOTIFY_COALESCE_MAX_BATCH: int = 20  # Push a held batch early once it reaches this many
+    SHUTDOWN_DRAIN_SECONDS: float = 5.0  # Wait this long for background tasks (socket writers, pushes) at shutdown
+
+    # Notification retention: read notifications older than their type's TTL move to notification_archive
+    NOTIFY_RETENTION_DAYS: int = 90  # Default TTL for read notifications; 0 = keep types without their own TTL
+    NOTIFY_RETENTION_TYPE_DAYS: str = "visitor_arrived:30,walkin_pending:30"  # "type:days,..."; 0 days = keep
+    NOTIFY_RETENTION_INTERVAL_SECONDS: int = 3600  # How often the job looks for expired rows; 0 disables the job
+    NOTIFY_RETENTION_WINDOW_HOURS: str = "1-5"  # IST hours [start, end) the job may run in; "" = any time
+    NOTIFY_RETENTION_BATCH: int = 500  # Rows moved per transaction (bounds how long row locks are held)
+    NOTIFY_RETENTION_PAUSE_MS: int = 200  # Pause between batches so gate traffic is never starved
+
+    # In-process caches
+    BLACKLIST_CACHE_TTL_SECONDS: int = 60  # Backstop for a lost cross-worker invalidation (changes are broadcast)
+    DASHBOARD_COUNTERS_TTL_SECONDS: int = 15  # Re-read society_visit_counters after this (other workers' changes)
+    DASHBOARD_COUNTERS_RECONCILE_SECONDS: int = 300  # Recount from visits to correct drift; 0 disables the job
+    NOTIFY_UNREAD_CACHE_TTL_SECONDS: int = 60  # Recount a user's unread badge after this (other workers' changes)
+    NOTIFY_UNREAD_CACHE_MAX_USERS: int = 50_000  # Least recently read counts beyond this are dropped
+    PRESENCE_REBUILD_SECONDS: int = 60  # Rebuild who-is-inside from visits (other workers' check-ins); 0 = startup only
+    PRESENCE_CAPACITY_THRESHOLDS: str = "80,100"  # % of societies.max_occupancy at which capacity events fire
+    # Local check-in/out journal for the muster when the DB is down; shared by workers on one host; "" disables
+    PRESENCE_JOURNAL_PATH: str = _DEFAULT_PRESENCE_JOURNAL.as_posix()
+    PRESENCE_JOURNAL_COMPACT_BYTES: int = 4 * 1024 * 1024  # Rewrite as a snapshot of who is inside past this size
+    MUSTER_DB_TIMEOUT_SECONDS: float = 2.0  # /dashboard/muster/failsafe serves the journal if the DB takes longer
 
     # MinIO
     MINIO_ENDPOINT: str = "localhost:9000"
@@ -57,6 +95,26 @@ class Settings(BaseSettings):
     # WhatsApp (WAHA) - set WAHA_API_URL e.g. http://localhost:3001/api to enable
     WAHA_API_URL: str = ""
     WAHA_API_KEY: str = ""
+    WAHA_TIMEOUT_SECONDS: float = 10.0
+    WAHA_MAX_CONNECTIONS: int = 20  # Shared pooled client; also caps concurrent sends per worker process
+    # Outbound calls (WAHA, Keycloak): per-target circuit breaker and adaptive concurrency limit
+    OUTBOUND_BREAKER_FAILURES: int = 5  # Consecutive failures that open the circuit (calls then fail at once)
+    OUTBOUND_BREAKER_RESET_SECONDS: float = 30.0  # Open this long before one probe call is let through
+    OUTBOUND_LIMIT_INITIAL: int = 10  # Starting calls-in-flight limit per target; adapts to observed latency
+    OUTBOUND_LIMIT_MIN: int = 1
+    OUTBOUND_LIMIT_MAX: int = 100  # Default ceiling (and connection pool size) for targets that set none
+    OUTBOUND_LATENCY_TOLERANCE: float = 2.0  # A call slower than this x the best recent latency shrinks the limit
+    OUTBOUND_LIMIT_BACKOFF: float = 0.9  # Multiplier applied to the limit on a slow or failed call
+    # Outbox delivery (WhatsApp invites are queued with the visit and sent by these workers)
+    OUTBOX_WORKERS: int = 4  # Concurrent sends per process
+    OUTBOX_CLAIM_BATCH: int = 50  # Rows claimed per query
+    OUTBOX_POLL_SECONDS: float = 5.0  # Look for due rows (retries, other workers' rows) at least this often
+    OUTBOX_LEASE_SECONDS: int = 120  # A claimed row not finished within this is claimable again
+    OUTBOX_MAX_ATTEMPTS: int = 6  # Then the row is dead-lettered (status dead)
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 5.0  # Retry delay doubles per attempt from this, with jitter
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 900.0
+    OUTBOX_RETENTION_DAYS: int = 7  # SENT and dead rows older than this are deleted; 0 keeps them
+    OUTBOX_RETENTION_INTERVAL_SECONDS: int = 3600  # How often the purge runs; 0 disables it
 
     # Frontend base URL for shareable links (QR page, etc.)
     FRONTEND_BASE_URL: str = "http://localhost:3000"
@@ -72,6 +130,15 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "change-me-in-production"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = 300  # Reuse verified access-token claims (capped at exp); 0 = off
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 20_000  # Least recently used tokens beyond this are dropped
+    # QR pass signing keys "kid:secret,kid:secret" (first signs, all verify); empty = derived from SECRET_KEY
+    QR_TOKEN_KEYS: str = ""
+    QR_ACCEPT_LEGACY_CODES: bool = True  # Accept old opaque VMS-XXXXXXXXXXXX codes (turn off once they have expired)
+    # Guard-device sync: base64 secret the per-society Ed25519 manifest keys derive from; empty = from SECRET_KEY
+    GATE_SYNC_SIGNING_KEY: str = ""
+    GATE_SYNC_MAX_SCAN_AGE_MINUTES: int = 60  # Offline scans are judged no earlier than this before upload
+    GATE_SYNC_DELTA_LAG_SECONDS: int = 60  # Deltas re-send changes this recent (longest a visit transaction runs)
 
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = True
@@ -3,10 +3,11 @@ Database configuration and session management.
 Connects to Supabase (or any Postgres) via DATABASE_URL from .env.
 SSL is optional: set DB_USE_SSL=true in .env only if your Supabase host requires it.
 """
-from typing import AsyncGenerator
-from sqlalchemy import text
+from datetime import datetime
+from typing import AsyncGenerator, Callable
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Session, declarative_base
 from sqlalchemy.pool import StaticPool
 import structlog
 
@@ -20,6 +21,7 @@ SOCIETIES_EXTRA_COLUMNS = [
     ("society_type", "VARCHAR(100)"),
     ("registration_year", "VARCHAR(10)"),
     ("documents_note", "VARCHAR(500)"),
+    ("max_occupancy", "INTEGER"),
 ]
 
 # Columns added to users in a later schema (for migration)
@@ -37,6 +39,7 @@ SOCIETIES_EXTRA_PG = [
     ("society_type", "VARCHAR(100)"),
     ("registration_year", "VARCHAR(10)"),
     ("documents_note", "VARCHAR(500)"),
+    ("max_occupancy", "INTEGER"),
 ]
 USERS_EXTRA_PG = [
     ("password_hash", "VARCHAR(255)"),
@@ -99,6 +102,52 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+# --- Post-commit hooks (keep in-process caches in step with committed rows) ---
+_AFTER_COMMIT_KEY = "after_commit_callbacks"
+_AFTER_ROLLBACK_KEY = "after_rollback_callbacks"
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Run callback once the session's current transaction commits.
+    Dropped on rollback, so in-memory state never reflects rows that were not persisted.
+    """
+    db.sync_session.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+
+def after_rollback(db: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Run callback if the session's current transaction rolls back (undo in-process state taken for it).
+    Dropped on commit.
+    """
+    db.sync_session.info.setdefault(_AFTER_ROLLBACK_KEY, []).append(callback)
+
+
+def _run_callbacks(session: Session, key: str, event_name: str) -> None:
+    for callback in session.info.pop(key, []):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"{event_name} callback failed", error=str(e))
+
+
+# Savepoints (begin_nested) commit and roll back too; hooks only follow the outermost transaction.
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_AFTER_ROLLBACK_KEY, None)
+    _run_callbacks(session, _AFTER_COMMIT_KEY, "after_commit")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit_callbacks(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_AFTER_COMMIT_KEY, None)
+    _run_callbacks(session, _AFTER_ROLLBACK_KEY, "after_rollback")
+
+
 def _migrate_societies_columns_sync(connection):
     """Add missing columns to societies table (SQLite). Idempotent."""
     try:
@@ -146,8 +195,90 @@ def _migrate_blacklist_columns_sync(connection):
             logger.debug("Added column to blacklist", column=col_name)
 
 
+# Visits: society_id denormalized from the host so society-scoped queries skip the users join
+VISITS_EXTRA_COLUMNS = [("society_id", "VARCHAR(36)")]  # SQLite
+VISITS_EXTRA_PG = [("society_id", "UUID")]
+VISITS_EXTRA_INDEXES = [
+    ("ix_visits_society_id_otp", "visits (society_id, otp)"),
+    ("ix_visits_society_id_updated_at", "visits (society_id, updated_at)"),
+    ("ix_visits_society_id_status_created_at", "visits (society_id, status, created_at)"),
+    ("ix_visits_society_id_created_at", "visits (society_id, created_at)"),
+]
+# Keyset pagination indexes (newest first, id breaks ties) for the paginated list endpoints
+PAGINATION_INDEXES = [
+    ("ix_societies_created_at_id", "societies (created_at, id)"),
+    ("ix_users_created_at_id", "users (created_at, id)"),
+    ("ix_audit_logs_created_at_id", "audit_logs (created_at, id)"),
+    ("ix_complaints_created_at_id", "complaints (created_at, id)"),
+    ("ix_complaints_society_id_created_at_id", "complaints (society_id, created_at, id)"),
+    ("ix_support_tickets_created_at_id", "support_tickets (created_at, id)"),
+    ("ix_subscriptions_created_at_id", "subscriptions (created_at, id)"),
+    ("ix_payments_created_at_id", "payments (created_at, id)"),
+    ("ix_invoices_created_at_id", "invoices (created_at, id)"),
+    ("ix_notifications_user_id_created_at_id", "notifications (user_id, created_at, id)"),
+    ("ix_notifications_user_id_read_created_at_id", "notifications (user_id, read, created_at, id)"),
+]
+# Notification retention scans oldest read rows first
+RETENTION_INDEXES = [
+    ("ix_notifications_read_created_at", "notifications (read, created_at)"),
+]
+# Expired passes still pending/approved give their OTP back, so the live-OTP unique index only sees usable codes
+_RECLAIM_EXPIRED_OTPS_SQL = (
+    "UPDATE visits SET otp = NULL WHERE otp IS NOT NULL AND status IN ('pending', 'approved') "
+    "AND otp_expires_at <= :now"
+)
+VISITS_SOCIETY_BACKFILL_BATCH = 5000
+# One batch of visits created before visits.society_id existed: copy the host's society
+_BACKFILL_VISITS_SOCIETY_SQL = (
+    "UPDATE visits SET society_id = (SELECT users.society_id FROM users WHERE users.id = visits.host_id) "
+    "WHERE visits.id IN ("
+    "SELECT visits.id FROM visits JOIN users ON users.id = visits.host_id "
+    "WHERE visits.society_id IS NULL AND users.society_id IS NOT NULL LIMIT :batch)"
+)
+
+
+def _migrate_visits_columns_sync(connection):
+    """Add society_id to visits table (SQLite). Idempotent."""
+    try:
+        result = connection.execute(text("PRAGMA table_info(visits)"))
+        rows = result.fetchall()
+    except Exception:
+        return
+    existing = {str(row[1]).lower() for row in rows}
+    for col_name, col_type in VISITS_EXTRA_COLUMNS:
+        if col_name.lower() not in existing:
+            connection.execute(text(f"ALTER TABLE visits ADD COLUMN {col_name} {col_type}"))
+            logger.debug("Added column to visits", column=col_name)
+
+
+def _migrate_visits_indexes_sync(connection):
+    """Create visits/pagination indexes missing on tables created before they were declared. Idempotent (SQLite + PostgreSQL)."""
+    for index_name, target in VISITS_EXTRA_INDEXES + PAGINATION_INDEXES + RETENTION_INDEXES:
+        try:
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {target}"))
+        except Exception as e:
+            logger.debug("index may exist", index=index_name, error=str(e))
+
+
+async def _backfill_visits_society_id(batch_size: int = VISITS_SOCIETY_BACKFILL_BATCH) -> int:
+    """
+    Populate visits.society_id for rows created before the column existed. Idempotent.
+    Each batch commits on its own so a large table is never locked in one long transaction.
+    """
+    total = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(text(_BACKFILL_VISITS_SOCIETY_SQL), {"batch": batch_size})
+        if not result.rowcount:
+            break
+        total += result.rowcount
+    if total:
+        logger.info("Backfilled visits.society_id", rows=total)
+    return total
+
+
 def _migrate_postgres_columns_sync(connection):
-    """Add missing columns to societies, users, and blacklist (PostgreSQL/Supabase). Idempotent."""
+    """Add missing columns to societies, users, blacklist, and visits (PostgreSQL/Supabase). Idempotent."""
     for col_name, col_type in SOCIETIES_EXTRA_PG:
         try:
             connection.execute(text(
@@ -180,6 +311,14 @@ def _migrate_postgres_columns_sync(connection):
             logger.debug("Added column to blacklist (pg)", column=col_name)
         except Exception as e:
             logger.debug("blacklist column may exist", column=col_name, error=str(e))
+    for col_name, col_type in VISITS_EXTRA_PG:
+        try:
+            connection.execute(text(
+                f"ALTER TABLE visits ADD COLUMN IF NOT EXISTS {col_name} {col_type}"
+            ))
+            logger.debug("Added column to visits (pg)", column=col_name)
+        except Exception as e:
+            logger.debug("visits column may exist", column=col_name, error=str(e))
 
 
 async def init_db():
@@ -195,8 +334,30 @@ async def init_db():
             await conn.run_sync(_migrate_societies_columns_sync)
             await conn.run_sync(_migrate_users_columns_sync)
             await conn.run_sync(_migrate_blacklist_columns_sync)
+            await conn.run_sync(_migrate_visits_columns_sync)
         else:
             await conn.run_sync(_migrate_postgres_columns_sync)
+        await conn.run_sync(_migrate_visits_indexes_sync)
+    await _backfill_visits_society_id()
+    await _create_live_otp_unique_index()
+
+
+async def _create_live_otp_unique_index() -> None:
+    """
+    Unique (society_id, otp) over live passes, for databases created before it was declared. Expired OTPs are
+    reclaimed first; if live duplicates from before the index remain, it is retried on the next start.
+    """
+    from app.models.visitor import LIVE_OTP_PREDICATE
+
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(_RECLAIM_EXPIRED_OTPS_SQL), {"now": datetime.utcnow()})
+            await conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_visits_society_id_otp_live "
+                f"ON visits (society_id, otp) WHERE {LIVE_OTP_PREDICATE}"
+            ))
+    except Exception as e:
+        logger.warning("Live OTP unique index not created (duplicate live OTPs?)", error=str(e))
 
 
 async def close_db():
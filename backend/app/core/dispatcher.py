@@ -0,0 +1,173 @@
+"""
+Priority-aware local fan-out for real-time pushes.
+Every push is classified as gate-critical (a visitor waiting at the gate, capacity alerts), transactional (other
+per-user notifications) or bulk (society notices). Each class has its own queue and its own worker budget, so a
+large bulk fan-out never sits in front of a gate alert. Gate and transactional pushes are delivered inline when
+their class has no backlog (no task hop); bulk pushes always go through their workers, which yield to the event
+loop every PUSH_FANOUT_CHUNK deliveries.
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Callable, Iterator, Optional
+from uuid import UUID
+
+import structlog
+
+from app.core.tasks import TaskRegistry
+
+logger = structlog.get_logger()
+
+LATENCY_SAMPLES = 1000
+
+
+class Priority(IntEnum):
+    GATE = 0
+    TRANSACTIONAL = 1
+    BULK = 2
+
+
+GATE_NOTIFICATION_TYPES = frozenset({"walkin_pending"})
+BULK_NOTIFICATION_TYPES = frozenset({"society_notice"})
+GATE_EVENTS = frozenset({"capacity_threshold"})
+
+
+def classify(frame: dict) -> Priority:
+    """Priority of a push frame ({"event": ..., "payload": ...}); deterministic, so every worker agrees."""
+    event = frame.get("event")
+    if event == "notification":
+        kind = (frame.get("payload") or {}).get("type")
+        if kind in GATE_NOTIFICATION_TYPES:
+            return Priority.GATE
+        if kind in BULK_NOTIFICATION_TYPES:
+            return Priority.BULK
+        return Priority.TRANSACTIONAL
+    if event in GATE_EVENTS:
+        return Priority.GATE
+    return Priority.TRANSACTIONAL
+
+
+@dataclass
+class PushJob:
+    priority: Priority
+    user_ids: list[UUID]
+    rooms: list[str]
+    frame: dict
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+# Fan-out for one job: performs deliveries, yielding after every chunk so workers can give way to other tasks
+FanOut = Callable[[PushJob, int], Iterator[None]]
+
+
+class _Lane:
+    def __init__(self, priority: Priority, workers: int, queue_size: int) -> None:
+        self.priority = priority
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.submitted = 0
+        self.delivered = 0
+        self.inline = 0
+        self.dropped = 0
+        self.busy = 0
+        self.latency_ms: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, job: PushJob) -> None:
+        self.delivered += 1
+        self.latency_ms.append((time.perf_counter() - job.enqueued) * 1000)
+
+    def stats(self) -> dict:
+        ordered = sorted(self.latency_ms)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+
+        return {
+            "queue_depth": self.queue.qsize(),
+            "workers": self.workers,
+            "busy": self.busy,
+            "submitted": self.submitted,
+            "delivered": self.delivered,
+            "inline": self.inline,
+            "dropped": self.dropped,
+            "latency_p50_ms": pct(50),
+            "latency_p99_ms": pct(99),
+            "latency_max_ms": round(ordered[-1], 3) if ordered else None,
+        }
+
+
+class PushDispatcher:
+    def __init__(
+        self, tasks: TaskRegistry, fanout: FanOut, workers: dict[Priority, int], queue_size: int, chunk: int
+    ) -> None:
+        self._tasks = tasks
+        self._fanout = fanout
+        self.chunk = max(1, chunk)
+        self._lanes = {p: _Lane(p, workers.get(p, 1), queue_size) for p in Priority}
+        self._workers: list[asyncio.Task] = []
+
+    def submit(self, job: PushJob) -> None:
+        """Deliver now (gate/transactional with no backlog) or queue for the class's workers. Never awaits."""
+        lane = self._lanes[job.priority]
+        lane.submitted += 1
+        if job.priority != Priority.BULK and lane.queue.empty() and not lane.busy:
+            for _ in self._fanout(job, self.chunk):
+                pass
+            lane.inline += 1
+            lane.record(job)
+            return
+        self._ensure_workers()
+        try:
+            lane.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Clients recover missed notifications from the list / Last-Event-ID
+            lane.dropped += 1
+            logger.warning("Push queue full; dropping push", priority=job.priority.name.lower())
+
+    def _ensure_workers(self) -> None:
+        if self._workers:
+            return
+        for lane in self._lanes.values():
+            for i in range(lane.workers):
+                name = f"push-{lane.priority.name.lower()}-{i}"
+                self._workers.append(self._tasks.spawn(self._work(lane), name=name))
+
+    async def _work(self, lane: _Lane) -> None:
+        while True:
+            job = await lane.queue.get()
+            lane.busy += 1
+            try:
+                for _ in self._fanout(job, self.chunk):
+                    await asyncio.sleep(0)
+                lane.record(job)
+            except Exception as e:
+                logger.warning("Push fan-out failed", priority=lane.priority.name.lower(), error=str(e))
+            finally:
+                lane.busy -= 1
+                lane.queue.task_done()
+
+    async def stop(self, timeout: float) -> None:
+        """Finish queued pushes (up to timeout), then stop the workers."""
+        if self._workers:
+            pending = [lane.queue.join() for lane in self._lanes.values()]
+            try:
+                await asyncio.wait_for(asyncio.gather(*pending), timeout)
+            except asyncio.TimeoutError:
+                logger.info("Push queues not drained at shutdown", **{
+                    p.name.lower(): lane.queue.qsize() for p, lane in self._lanes.items()
+                })
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+    def stats(self) -> dict:
+        return {p.name.lower(): lane.stats() for p, lane in self._lanes.items()}
@@ -1,54 +1,430 @@
 """
-WebSocket connection manager for real-time notifications.
-Stores connections per user_id and broadcasts notification payloads to connected clients.
+Real-time notification delivery: WebSocket connections and SSE stream queues per user_id.
+publish() is the single path for a committed notification: it goes out once on the backplane (app.core.backplane)
+and every worker delivers it to its own SSE streams and WebSockets with deliver_local(), with no DB access.
+Besides user ids, a push can target rooms (society, building, role within a society), which connections join from
+their JWT claims when they open; a room push is serialised once and queued for every member. Local fan-out goes
+through the priority dispatcher (app.core.dispatcher), and socket queues send higher-priority frames first, so a
+gate alert is not held behind a bulk notice. Per-user transactional notifications are coalesced (app.core.coalescer):
+a burst becomes one frame whose "items" carries every new notification.
+
+Each WebSocket gets a bounded outbound queue drained by its own writer task, so a slow client only delays itself:
+a socket whose queue fills up, or whose send stalls past WS_SEND_TIMEOUT_SECONDS, is closed (1013) and the client
+reconnects. Idle sockets get a heartbeat frame. Registry changes are plain dict/set updates on the event loop with
+no await in between, so they need no lock.
 """
 import asyncio
+import itertools
 import json
+from typing import Callable, Iterable, Iterator, Optional
 from uuid import UUID
+import structlog
 from starlette.websockets import WebSocket
 
-# In-memory: user_id -> list of WebSocket connections
-_connections: dict[UUID, list[WebSocket]] = {}
-_lock = asyncio.Lock()
+from app.core.backplane import Backplane, InProcessBackplane, create_backplane
+from app.core.coalescer import Coalescer
+from app.core.config import settings
+from app.core.dispatcher import Priority, PushDispatcher, PushJob, classify
+from app.core.roles import ALL_ROLES
+from app.core.tasks import TaskRegistry, background_tasks
+
+logger = structlog.get_logger()
+
+CLOSE_GOING_AWAY = 1001
+CLOSE_SLOW_CONSUMER = 1013  # "try again later"
+HEARTBEAT = json.dumps({"event": "heartbeat"})
+_CLOSE = -1  # sorts ahead of every Priority in a socket queue
+_sequence = itertools.count()  # FIFO within a priority
+
+
+def society_room(society_id) -> str:
+    return f"society:{society_id}"
+
 
+def building_room(building_id) -> str:
+    return f"building:{building_id}"
 
-async def register(websocket: WebSocket, user_id: UUID) -> None:
-    """Register a WebSocket for the given user."""
-    async with _lock:
-        if user_id not in _connections:
-            _connections[user_id] = []
-        _connections[user_id].append(websocket)
 
+def role_room(society_id, role: str) -> str:
+    """Everyone with `role` in one society (e.g. the guards of society X)."""
+    return f"society:{society_id}:role:{role}"
 
-async def unregister(websocket: WebSocket, user_id: UUID) -> None:
-    """Remove a WebSocket for the given user."""
-    async with _lock:
-        if user_id in _connections:
-            _connections[user_id] = [ws for ws in _connections[user_id] if ws != websocket]
-            if not _connections[user_id]:
-                del _connections[user_id]
 
+def _uuid_or_none(value) -> Optional[UUID]:
+    try:
+        return UUID(str(value)) if value else None
+    except ValueError:
+        return None
 
-async def broadcast_to_user(user_id: UUID, payload: dict) -> None:
+
+def rooms_from_claims(claims: dict) -> list[str]:
+    """Rooms a connection joins from its token: its society, each of its VMS roles there, and its building."""
+    rooms = []
+    society_id = _uuid_or_none(claims.get("society_id"))
+    if society_id:
+        rooms.append(society_room(society_id))
+        roles = (claims.get("realm_access") or {}).get("roles") or []
+        rooms.extend(role_room(society_id, role) for role in roles if role in ALL_ROLES)
+    building_id = _uuid_or_none(claims.get("building_id"))
+    if building_id:
+        rooms.append(building_room(building_id))
+    return rooms
+
+
+class Connection:
     """
-    Send a JSON message to all WebSockets connected for this user.
-    Used when a new notification is created for the user.
+    One WebSocket: outbound frames go through its bounded priority queue to its writer task, never straight to send.
     """
-    async with _lock:
-        sockets = list(_connections.get(user_id) or [])
-    if not sockets:
-        return
-    text = json.dumps(payload)
-    dead = []
-    for ws in sockets:
+
+    def __init__(self, websocket: WebSocket, user_id: UUID, queue_size: int, rooms: Iterable[str] = ()) -> None:
+        self.websocket = websocket
+        self.user_id = user_id
+        self.rooms = tuple(rooms)
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=queue_size)
+        self.closed = False
+        self.close_code: Optional[int] = None
+        self.writer: Optional[asyncio.Task] = None
+
+    def offer(self, text: str, priority: Priority = Priority.TRANSACTIONAL) -> bool:
+        """Queue a frame; False if the connection is closed or its queue is full."""
+        if self.closed:
+            return False
         try:
-            await ws.send_text(text)
+            self.queue.put_nowait((priority, next(_sequence), text))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def send(self, payload: dict) -> bool:
+        return self.offer(json.dumps(payload))
+
+    def close(self, code: int) -> None:
+        """Drop pending frames and have the writer close the socket."""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_code = code
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait((_CLOSE, next(_sequence), None))
+
+
+class ConnectionManager:
+    """user_id -> open WebSocket connections on this worker, and room -> member connections."""
+
+    def __init__(
+        self, tasks: TaskRegistry, queue_size: int, send_timeout: float, heartbeat_seconds: float
+    ) -> None:
+        self._tasks = tasks
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.heartbeat_seconds = heartbeat_seconds
+        self._by_user: dict[UUID, set[Connection]] = {}
+        self._rooms: dict[str, set[Connection]] = {}
+        self.frames = 0
+        self.evicted = 0
+        self.send_failures = 0
+
+    def register(self, websocket: WebSocket, user_id: UUID, rooms: Iterable[str] = ()) -> Connection:
+        """Track an accepted WebSocket in its user's set and its rooms, and start its writer."""
+        conn = Connection(websocket, user_id, self.queue_size, rooms)
+        self._by_user.setdefault(user_id, set()).add(conn)
+        for room in conn.rooms:
+            self._rooms.setdefault(room, set()).add(conn)
+        conn.writer = self._tasks.spawn(self._write_loop(conn), name=f"ws-writer:{user_id}")
+        return conn
+
+    def unregister(self, conn: Connection, code: int = CLOSE_GOING_AWAY) -> None:
+        _discard(self._by_user, conn.user_id, conn)
+        for room in conn.rooms:
+            _discard(self._rooms, room, conn)
+        conn.close(code)
+
+    def evict(self, conn: Connection) -> None:
+        """Slow consumer: close it rather than buffer without bound or hold up other sockets."""
+        if not conn.closed:
+            self.evicted += 1
+            self.unregister(conn, CLOSE_SLOW_CONSUMER)
+
+    def is_connected(self, user_id: UUID) -> bool:
+        return user_id in self._by_user
+
+    def room_size(self, room: str) -> int:
+        return len(self._rooms.get(room, ()))
+
+    def targets(self, user_ids: Iterable[UUID] = (), rooms: Iterable[str] = ()) -> set[Connection]:
+        """Connections of these users and members of these rooms (each connection once)."""
+        targets: set[Connection] = set()
+        for user_id in user_ids:
+            targets.update(self._by_user.get(user_id, ()))
+        for room in rooms:
+            targets.update(self._rooms.get(room, ()))
+        return targets
+
+    def deliver(self, conn: Connection, text: str, priority: Priority) -> bool:
+        if conn.offer(text, priority):
+            self.frames += 1
+            return True
+        self.evict(conn)
+        return False
+
+    def send(
+        self,
+        payload: dict,
+        user_ids: Iterable[UUID] = (),
+        rooms: Iterable[str] = (),
+        priority: Priority = Priority.TRANSACTIONAL,
+    ) -> int:
+        """Queue payload, serialised once, on every target connection. Returns frames queued."""
+        targets = self.targets(user_ids, rooms)
+        if not targets:
+            return 0
+        text = json.dumps(payload)
+        return sum(self.deliver(conn, text, priority) for conn in targets)
+
+    async def _write_loop(self, conn: Connection) -> None:
+        ws = conn.websocket
+        try:
+            while True:
+                try:
+                    _, _, text = await asyncio.wait_for(conn.queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    text = HEARTBEAT
+                if text is None:
+                    break
+                await asyncio.wait_for(ws.send_text(text), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
         except Exception:
-            dead.append(ws)
-    if dead:
-        async with _lock:
-            for ws in dead:
-                if user_id in _connections:
-                    _connections[user_id] = [w for w in _connections[user_id] if w != ws]
-            if user_id in _connections and not _connections[user_id]:
-                del _connections[user_id]
+            # Stalled past send_timeout or already gone: the receive loop sees the disconnect and unregisters
+            self.send_failures += 1
+            if not conn.closed:
+                self.evict(conn)
+        try:
+            await asyncio.wait_for(ws.close(code=conn.close_code or CLOSE_GOING_AWAY), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    def close_all(self) -> None:
+        """Shutdown: close every socket (writers finish on their own; drain background_tasks to wait for them)."""
+        for conns in list(self._by_user.values()):
+            for conn in list(conns):
+                self.unregister(conn, CLOSE_GOING_AWAY)
+
+    def stats(self) -> dict:
+        return {
+            "websocket_users": len(self._by_user),
+            "websockets": sum(len(conns) for conns in self._by_user.values()),
+            "websocket_rooms": len(self._rooms),
+            "websocket_frames": self.frames,
+            "websocket_evicted": self.evicted,
+            "websocket_send_failures": self.send_failures,
+        }
+
+
+def _discard(index: dict, key, member) -> None:
+    members = index.get(key)
+    if members is not None:
+        members.discard(member)
+        if not members:
+            del index[key]
+
+
+connections = ConnectionManager(
+    background_tasks,
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    send_timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+    heartbeat_seconds=settings.WS_HEARTBEAT_SECONDS,
+)
+
+
+# SSE: user_id / room -> queues of open /notifications/stream responses
+_streams: dict[UUID, set[asyncio.Queue]] = {}
+_stream_rooms: dict[str, set[asyncio.Queue]] = {}
+STREAM_QUEUE_SIZE = 100
+push_stats = {"published": 0, "stream_overflows": 0}
+
+
+def subscribe(user_id: UUID, rooms: Iterable[str] = ()) -> asyncio.Queue:
+    """Queue that receives every notification published for user_id or its rooms until unsubscribe()."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    _streams.setdefault(user_id, set()).add(queue)
+    for room in rooms:
+        _stream_rooms.setdefault(room, set()).add(queue)
+    return queue
+
+
+def unsubscribe(user_id: UUID, queue: asyncio.Queue, rooms: Iterable[str] = ()) -> None:
+    _discard(_streams, user_id, queue)
+    for room in rooms:
+        _discard(_stream_rooms, room, queue)
+
+
+def _offer(queue: asyncio.Queue, notification: dict) -> None:
+    try:
+        queue.put_nowait(notification)
+    except asyncio.QueueFull:
+        push_stats["stream_overflows"] += 1
+        # Consumer is not keeping up: end its stream (None); the client reconnects with Last-Event-ID and catches up
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+def _notification_frame(notification: dict) -> dict:
+    return {"event": "notification", "payload": notification}
+
+
+def _batch_frame(notifications: list[dict]) -> dict:
+    """Several notifications in one push; payload stays the newest so single-notification clients keep working."""
+    if len(notifications) == 1:
+        return _notification_frame(notifications[0])
+    return {
+        "event": "notification",
+        "payload": notifications[-1],
+        "items": notifications,
+        "ids": [n["id"] for n in notifications],
+    }
+
+
+def _emit_coalesced(user_id: UUID, notifications: list[dict]) -> None:
+    _backplane.publish([user_id], [], _batch_frame(notifications), Priority.TRANSACTIONAL)
+
+
+coalescer = Coalescer(
+    settings.NOTIFY_COALESCE_WINDOW_MS / 1000, settings.NOTIFY_COALESCE_MAX_BATCH, _emit_coalesced
+)
+
+
+def publish(user_id: UUID, notification: dict) -> None:
+    """
+    Deliver a committed notification (notification_to_dict shape) to the user's SSE streams and WebSockets on
+    every worker. Call after commit.
+    """
+    publish_many([user_id], notification)
+
+
+def publish_many(user_ids: Iterable[UUID], notification: dict) -> None:
+    """publish() to several users as one backplane message (transactional ones go through the coalescer)."""
+    push_stats["published"] += 1
+    frame = _notification_frame(notification)
+    priority = classify(frame)
+    if priority == Priority.TRANSACTIONAL and coalescer.enabled:
+        for user_id in user_ids:
+            coalescer.push(user_id, notification)
+        return
+    _backplane.publish(list(user_ids), [], frame, priority)
+
+
+def publish_to_rooms(rooms: Iterable[str], notification: dict) -> None:
+    """publish() to every member of these rooms (e.g. a society notice to society_room(id))."""
+    push_stats["published"] += 1
+    frame = _notification_frame(notification)
+    _backplane.publish([], list(rooms), frame, classify(frame))
+
+
+def publish_event(rooms: Iterable[str], event: str, payload: dict) -> None:
+    """Push a non-notification event (e.g. a capacity alert) to room members' WebSockets (SSE carries notifications)."""
+    push_stats["published"] += 1
+    frame = {"event": event, "payload": payload}
+    _backplane.publish([], list(rooms), frame, classify(frame))
+
+
+def _fanout(job: PushJob, chunk: int) -> Iterator[None]:
+    """Dispatcher fan-out: SSE queues (notifications only) then sockets, yielding after every `chunk` deliveries."""
+    done = 0
+    frame = job.frame
+    if frame.get("event") == "notification":
+        queues: set[asyncio.Queue] = set()
+        for user_id in job.user_ids:
+            queues.update(_streams.get(user_id, ()))
+        for room in job.rooms:
+            queues.update(_stream_rooms.get(room, ()))
+        notifications = frame.get("items") or [frame["payload"]]
+        for queue in queues:
+            for notification in notifications:
+                _offer(queue, notification)
+            done += 1
+            if done % chunk == 0:
+                yield
+    targets = connections.targets(job.user_ids, job.rooms)
+    if targets:
+        text = json.dumps(frame)
+        for conn in targets:
+            connections.deliver(conn, text, job.priority)
+            done += 1
+            if done % chunk == 0:
+                yield
+
+
+dispatcher = PushDispatcher(
+    background_tasks,
+    _fanout,
+    workers={
+        Priority.GATE: settings.PUSH_GATE_WORKERS,
+        Priority.TRANSACTIONAL: settings.PUSH_TRANSACTIONAL_WORKERS,
+        Priority.BULK: settings.PUSH_BULK_WORKERS,
+    },
+    queue_size=settings.PUSH_QUEUE_SIZE,
+    chunk=settings.PUSH_FANOUT_CHUNK,
+)
+
+
+# Worker-to-worker state sync (e.g. presence) rides the same backplane but is never pushed to clients
+_sync_handlers: dict[str, Callable[[dict], None]] = {}
+
+
+def on_sync(event: str, handler: Callable[[dict], None]) -> None:
+    """Call handler(payload) on every worker (the publishing one included) for each publish_sync(event, ...)."""
+    _sync_handlers[event] = handler
+
+
+def publish_sync(event: str, payload: dict) -> None:
+    """Broadcast a JSON-serialisable state change to every worker; sent ahead of notifications."""
+    _backplane.publish([], [], {"event": event, "payload": payload}, Priority.GATE)
+
+
+def deliver_local(user_ids: list[UUID], rooms: list[str], frame: dict) -> None:
+    """Backplane callback: hand the push to this worker's dispatcher (never awaits)."""
+    handler = _sync_handlers.get(frame.get("event"))
+    if handler is not None:
+        try:
+            handler(frame.get("payload") or {})
+        except Exception as e:
+            logger.warning("Backplane sync handler failed", event=frame.get("event"), error=str(e))
+        return
+    dispatcher.submit(PushJob(classify(frame), list(user_ids), list(rooms), frame))
+
+
+_backplane: Backplane = InProcessBackplane(deliver_local)
+
+
+async def start_backplane() -> None:
+    """Switch to the NOTIFY_BACKPLANE configured at startup (until then, and in tests, delivery is in-process)."""
+    global _backplane
+    if settings.NOTIFY_BACKPLANE in ("", "local"):
+        return
+    backplane = create_backplane(
+        settings.NOTIFY_BACKPLANE, deliver_local, settings.REDIS_URL, settings.NOTIFY_BACKPLANE_CHANNEL
+    )
+    await backplane.start()
+    _backplane = backplane
+
+
+async def stop_backplane() -> None:
+    global _backplane
+    coalescer.flush()
+    await _backplane.stop()
+    _backplane = InProcessBackplane(deliver_local)
+    await dispatcher.stop(settings.SHUTDOWN_DRAIN_SECONDS)
+
+
+def stats() -> dict:
+    return {
+        "sse_streams": sum(len(queues) for queues in _streams.values()),
+        **connections.stats(),
+        **push_stats,
+        "backplane": _backplane.stats(),
+        "dispatch": dispatcher.stats(),
+        "coalescing": coalescer.stats(),
+    }
@@ -0,0 +1,244 @@
+"""
+Shared layer for outbound HTTP calls (WAHA, Keycloak).
+Each target gets one pooled httpx client, a circuit breaker and an adaptive concurrency limit:
+- The breaker opens after OUTBOUND_BREAKER_FAILURES consecutive failures (network errors, timeouts, 429/5xx).
+  While open, calls fail at once with OutboundUnavailable instead of waiting out a timeout. After
+  OUTBOUND_BREAKER_RESET_SECONDS a single probe is let through: success closes it, failure re-opens it.
+- The limit caps calls in flight per target. It grows by one per `limit` fast successes (AIMD) and shrinks by
+  OUTBOUND_LIMIT_BACKOFF on a failure or a call slower than OUTBOUND_LATENCY_TOLERANCE x the healthy latency
+  (10th percentile of recent successes), so a slowing dependency gets less concurrency before it times out.
+  Calls over the limit are rejected rather than queued, so callers (and the DB sessions they hold) are never
+  parked behind a sick dependency.
+Breaker state, limits and latency percentiles are exposed in /health/metrics.
+"""
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+LATENCY_SAMPLES = 1000
+BASELINE_WINDOW = 100  # recent successful calls the healthy latency is taken from
+
+
+class OutboundUnavailable(Exception):
+    """Call not attempted: the target's circuit is open or its concurrency limit is reached."""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._probing = False
+        self.state = self.CLOSED
+
+    def abandon(self) -> None:
+        """A call that was let through ended without an outcome (cancelled): free the probe slot."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opens += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, "opens": self.opens}
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit driven by latency relative to the healthy (p10 of recent successes) latency."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, tolerance: float, backoff: float) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self._recent_ms: deque[float] = deque(maxlen=BASELINE_WINDOW)
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    def abandon(self) -> None:
+        self.in_flight -= 1
+
+    def baseline_ms(self) -> Optional[float]:
+        if not self._recent_ms:
+            return None
+        return sorted(self._recent_ms)[len(self._recent_ms) // 10]
+
+    def release(self, latency_ms: float, ok: bool) -> None:
+        self.in_flight -= 1
+        baseline = self.baseline_ms() or latency_ms
+        if ok:
+            self._recent_ms.append(latency_ms)
+        if not ok or latency_ms > baseline * self.tolerance:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "baseline_ms": round(self.baseline_ms(), 3) if self._recent_ms else None,
+        }
+
+
+class OutboundTarget:
+    """One remote dependency: pooled client + breaker + adaptive limit + counters."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str = "",
+        headers: Optional[dict] = None,
+        timeout: float = 10.0,
+        max_connections: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.name = name
+        max_connections = max_connections or settings.OUTBOUND_LIMIT_MAX
+        self.breaker = CircuitBreaker(settings.OUTBOUND_BREAKER_FAILURES, settings.OUTBOUND_BREAKER_RESET_SECONDS)
+        self.limiter = AdaptiveLimit(
+            initial=settings.OUTBOUND_LIMIT_INITIAL,
+            minimum=settings.OUTBOUND_LIMIT_MIN,
+            maximum=max_connections,
+            tolerance=settings.OUTBOUND_LATENCY_TOLERANCE,
+            backoff=settings.OUTBOUND_LIMIT_BACKOFF,
+        )
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+        self.latency_ms: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.calls = 0
+        self.failures = 0
+        self.rejected_open = 0
+        self.rejected_limit = 0
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send one request. Raises OutboundUnavailable without calling out when the breaker is open or the limit is
+        reached; httpx errors propagate. 429 and 5xx responses are returned but count as failures.
+        """
+        if not self.breaker.allow():
+            self.rejected_open += 1
+            raise OutboundUnavailable(f"{self.name}: circuit open")
+        if not self.limiter.try_acquire():
+            self.rejected_limit += 1
+            raise OutboundUnavailable(f"{self.name}: concurrency limit reached ({int(self.limiter.limit)})")
+        self.calls += 1
+        started = time.perf_counter()
+        try:
+            response = await self._client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self._finish(started, ok=False)
+            raise
+        except BaseException:
+            # Cancelled by the caller: says nothing about the target
+            self.limiter.abandon()
+            self.breaker.abandon()
+            raise
+        self._finish(started, ok=response.status_code != 429 and response.status_code < 500)
+        return response
+
+    def _finish(self, started: float, ok: bool) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.latency_ms.append(elapsed_ms)
+        self.limiter.release(elapsed_ms, ok)
+        if ok:
+            self.breaker.record_success()
+            return
+        self.failures += 1
+        was_open = self.breaker.state == CircuitBreaker.OPEN
+        self.breaker.record_failure()
+        if not was_open and self.breaker.state == CircuitBreaker.OPEN:
+            logger.warning("Outbound circuit opened", target=self.name, failures=self.breaker.consecutive_failures)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        ordered = sorted(self.latency_ms)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+
+        return {
+            "breaker": self.breaker.stats(),
+            "concurrency": self.limiter.stats(),
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected_open": self.rejected_open,
+            "rejected_limit": self.rejected_limit,
+            "latency_p50_ms": pct(50),
+            "latency_p99_ms": pct(99),
+        }
+
+
+_targets: dict[str, OutboundTarget] = {}
+
+
+def target(name: str, base_url: str = "", **kwargs) -> OutboundTarget:
+    """The process-wide target for name, created on first use (kwargs as for OutboundTarget)."""
+    existing = _targets.get(name)
+    if existing is None:
+        existing = _targets[name] = OutboundTarget(name, base_url, **kwargs)
+    return existing
+
+
+def stats() -> dict:
+    return {name: t.stats() for name, t in _targets.items()}
+
+
+async def close_all() -> None:
+    for t in list(_targets.values()):
+        await t.aclose()
+    _targets.clear()
@@ -0,0 +1,133 @@
+"""
+Self-verifying QR pass tokens.
+Format: VP1.<kid>.<body>.<sig>, base64url without padding.
+  body = visit_id (16 bytes) | society_id (16 bytes, nil UUID if none) | expires_at (uint32 epoch seconds, UTC)
+  sig  = first 16 bytes of HMAC-SHA256(society key, "VP1.<kid>.<body>")
+The society key is derived from the signing secret named by kid, so a guard scan can be rejected as forged,
+expired or from another society with a few HMACs and no DB round trip.
+Rotation: QR_TOKEN_KEYS lists "kid:secret" pairs; the first signs new passes, all of them verify.
+Legacy VMS-XXXXXXXXXXXX codes are still accepted (DB lookup) while QR_ACCEPT_LEGACY_CODES is on.
+"""
+import base64
+import hashlib
+import hmac
+import re
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
+
+from app.constants.visit import QR_PREFIX
+from app.core.config import settings
+
+TOKEN_VERSION = "VP1"
+_NIL_SOCIETY = UUID(int=0)
+_EPOCH = datetime(1970, 1, 1)
+_BODY = struct.Struct(">16s16sI")
+_SIG_BYTES = 16
+_LEGACY_CODE = re.compile(rf"^{QR_PREFIX}-[0-9A-F]{{12}}$")
+
+# Outcome counters for this worker (exposed on /health/metrics)
+token_stats: dict[str, int] = {
+    "verified": 0,
+    "malformed": 0,
+    "unknown_key": 0,
+    "forged": 0,
+    "expired": 0,
+    "legacy": 0,
+}
+
+
+class PassTokenError(ValueError):
+    """QR token is malformed, signed with an unknown key, forged, or expired."""
+
+
+@dataclass(frozen=True)
+class PassClaims:
+    visit_id: UUID
+    society_id: Optional[UUID]
+    expires_at: datetime
+    kid: str
+
+
+def _signing_keys() -> list[tuple[str, bytes]]:
+    """Configured (kid, secret) pairs, active key first. Falls back to one key derived from SECRET_KEY."""
+    keys = []
+    for entry in settings.QR_TOKEN_KEYS.split(","):
+        kid, sep, secret = entry.strip().partition(":")
+        if sep and kid and secret:
+            keys.append((kid, secret.encode("utf-8")))
+    if not keys:
+        keys.append(("k0", hashlib.sha256(f"qr-pass:{settings.SECRET_KEY}".encode("utf-8")).digest()))
+    return keys
+
+
+def _society_key(secret: bytes, society_id: UUID) -> bytes:
+    return hmac.new(secret, b"qr-pass:" + society_id.bytes, hashlib.sha256).digest()
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode((text + "=" * (-len(text) % 4)).encode("ascii"))
+
+
+def _sign(secret: bytes, society_id: UUID, signed_part: str) -> bytes:
+    return hmac.new(_society_key(secret, society_id), signed_part.encode("ascii"), hashlib.sha256).digest()[:_SIG_BYTES]
+
+
+def issue_pass_token(visit_id: UUID, society_id: Optional[UUID], expires_at: datetime) -> str:
+    """Signed QR token for a pass expiring at expires_at (naive UTC), using the active key."""
+    kid, secret = _signing_keys()[0]
+    society = society_id or _NIL_SOCIETY
+    expires = int((expires_at - _EPOCH).total_seconds())
+    signed_part = f"{TOKEN_VERSION}.{kid}.{_b64(_BODY.pack(visit_id.bytes, society.bytes, expires))}"
+    return f"{signed_part}.{_b64(_sign(secret, society, signed_part))}"
+
+
+def is_pass_token(code: str) -> bool:
+    return code.startswith(TOKEN_VERSION + ".")
+
+
+def accepts_legacy_code(code: str) -> bool:
+    """True if code has the old opaque VMS-XXXXXXXXXXXX shape and legacy codes are still accepted."""
+    if settings.QR_ACCEPT_LEGACY_CODES and _LEGACY_CODE.match(code):
+        token_stats["legacy"] += 1
+        return True
+    return False
+
+
+def verify_pass_token(token: str, now: Optional[datetime] = None) -> PassClaims:
+    """Check signature and expiry without touching the DB. Raises PassTokenError."""
+    try:
+        version, kid, body_b64, sig_b64 = token.split(".")
+        visit_bytes, society_bytes, expires = _BODY.unpack(_unb64(body_b64))
+        sig = _unb64(sig_b64)
+    except (ValueError, struct.error):
+        token_stats["malformed"] += 1
+        raise PassTokenError("Invalid QR code")
+    if version != TOKEN_VERSION:
+        token_stats["malformed"] += 1
+        raise PassTokenError("Invalid QR code")
+    secret = dict(_signing_keys()).get(kid)
+    if secret is None:
+        token_stats["unknown_key"] += 1
+        raise PassTokenError("Invalid QR code")
+    society = UUID(bytes=society_bytes)
+    if not hmac.compare_digest(sig, _sign(secret, society, f"{version}.{kid}.{body_b64}")):
+        token_stats["forged"] += 1
+        raise PassTokenError("Invalid QR code")
+    expires_at = _EPOCH + timedelta(seconds=expires)
+    if expires_at <= (now or datetime.utcnow()):
+        token_stats["expired"] += 1
+        raise PassTokenError("QR code has expired")
+    token_stats["verified"] += 1
+    return PassClaims(
+        visit_id=UUID(bytes=visit_bytes),
+        society_id=None if society == _NIL_SOCIETY else society,
+        expires_at=expires_at,
+        kid=kid,
+    )
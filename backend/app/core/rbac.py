@@ -54,27 +54,44 @@ def require_roles(allowed_roles: List[str]):
 require_committee = require_roles(["chairman", "secretary", "treasurer", "platform_admin"])
 
 
-async def log_admin_action(
-    db: AsyncSession,
+def build_admin_audit_entry(
     user_id: UUID,
     current_user: dict,
     action: str,
     endpoint: str,
     request_method: Optional[str] = None,
     details: Optional[dict] = None,
-) -> None:
+) -> Optional[AuditLog]:
     """
-    Log to audit_logs only when the acting user has admin role.
-    Call after successful sensitive operations.
+    AuditLog row for an admin action, or None for non-admins. Not added to the session:
+    lets hot paths insert it in the same flush as their other rows.
     """
     if not is_admin(current_user):
-        return
-    entry = AuditLog(
+        return None
+    return AuditLog(
         user_id=user_id,
         action=action,
         endpoint=endpoint,
         request_method=request_method,
         details=details or {},
     )
+
+
+async def log_admin_action(
+    db: AsyncSession,
+    user_id: UUID,
+    current_user: dict,
+    action: str,
+    endpoint: str,
+    request_method: Optional[str] = None,
+    details: Optional[dict] = None,
+) -> None:
+    """
+    Log to audit_logs only when the acting user has admin role.
+    Call after successful sensitive operations.
+    """
+    entry = build_admin_audit_entry(user_id, current_user, action, endpoint, request_method, details)
+    if entry is None:
+        return
     db.add(entry)
     await db.flush()
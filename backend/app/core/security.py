@@ -8,17 +8,20 @@ from typing import Dict, Optional, Any, Tuple
 
 from jose import jwt, JWTError
 from jose.constants import ALGORITHMS
-import httpx
 import structlog
 import bcrypt
 
+from app.core import outbound
 from app.core.config import settings
+from app.core.token_cache import token_cache
 
 logger = structlog.get_logger()
 
 # Local JWT issuer so we can distinguish from Keycloak
 LOCAL_JWT_ISSUER = "vms"
 
+_keycloak_public_key: Optional[str] = None
+
 
 def _digest_for_bcrypt(plain: str) -> bytes:
     """Full password → SHA-256 digest (32 bytes). Bcrypt then hashes that; no truncation."""
@@ -97,44 +100,41 @@ def refresh_token_expiry() -> datetime:
 
 async def get_keycloak_public_key() -> str:
     """
-    Fetch Keycloak realm public key for JWT verification.
+    Fetch Keycloak realm public key for JWT verification (cached for the process).
+    Goes through the shared outbound layer, so while Keycloak is down callers fail fast (OutboundUnavailable).
     """
     global _keycloak_public_key
     if _keycloak_public_key:
         return _keycloak_public_key
 
+    keycloak = outbound.target("keycloak", settings.KEYCLOAK_URL, timeout=settings.KEYCLOAK_TIMEOUT_SECONDS)
     try:
-        url = f"{settings.KEYCLOAK_URL}/realms/{settings.KEYCLOAK_REALM}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{url}/.well-known/openid-configuration")
-            response.raise_for_status()
-            config = response.json()
-            jwks_url = config["jwks_uri"]
-
-            jwks_response = await client.get(jwks_url)
-            jwks_response.raise_for_status()
-            jwks = jwks_response.json()
-
-            # Extract public key from JWKS (simplified - use jose for full JWKS support)
-            # For production, use python-jose's JWKS support
-            _keycloak_public_key = jwks["keys"][0]["x5c"][0] if jwks.get("keys") else None
-
-            if not _keycloak_public_key:
-                raise ValueError("Could not extract public key from Keycloak")
-
-            return _keycloak_public_key
+        response = await keycloak.get(f"/realms/{settings.KEYCLOAK_REALM}/.well-known/openid-configuration")
+        response.raise_for_status()
+        jwks_url = response.json()["jwks_uri"]
+
+        jwks_response = await keycloak.get(jwks_url)
+        jwks_response.raise_for_status()
+        jwks = jwks_response.json()
+
+        # Extract public key from JWKS (simplified - use jose for full JWKS support)
+        # For production, use python-jose's JWKS support
+        key = jwks["keys"][0]["x5c"][0] if jwks.get("keys") else None
+        if not key:
+            raise ValueError("Could not extract public key from Keycloak")
+        _keycloak_public_key = key
+        return key
     except Exception as e:
         logger.error("Failed to fetch Keycloak public key", error=str(e))
         raise
 
 
-async def verify_token(token: str) -> Dict[str, Any]:
+def _decode_token(token: str) -> Dict[str, Any]:
     """
-    Verify JWT: if our local issuer (vms), decode with SECRET_KEY; else Keycloak.
+    Decode and normalize a JWT, once: only HS256 tokens are tried against SECRET_KEY, and a token claiming our
+    local issuer (vms) that fails that check is rejected rather than retried the unsigned Keycloak way.
     """
-    try:
-        unverified = jwt.get_unverified_header(token)
-        # Try local JWT first (HS256)
+    if jwt.get_unverified_header(token).get("alg") == "HS256":
         try:
             payload = jwt.decode(
                 token,
@@ -142,6 +142,10 @@ async def verify_token(token: str) -> Dict[str, Any]:
                 algorithms=["HS256"],
                 options={"verify_aud": False},
             )
+        except JWTError:
+            if jwt.get_unverified_claims(token).get("iss") == LOCAL_JWT_ISSUER:
+                raise
+        else:
             if payload.get("iss") == LOCAL_JWT_ISSUER:
                 # Normalize for dependencies: sub, user_id, realm_access.roles, society_id (pass through as-is)
                 if "user_id" not in payload and "sub" in payload:
@@ -150,17 +154,36 @@ async def verify_token(token: str) -> Dict[str, Any]:
                 if "society_id" in payload and payload["society_id"] is not None:
                     payload["society_id"] = str(payload["society_id"])
                 return payload
-        except JWTError:
-            pass
-        # Keycloak / external JWT (existing behavior)
-        payload = jwt.decode(
-            token,
-            key="",
-            options={"verify_signature": False},
-            audience=settings.JWT_AUDIENCE,
-            algorithms=[settings.JWT_ALGORITHM],
-        )
-        return payload
+    # Keycloak / external JWT (existing behavior)
+    return jwt.decode(
+        token,
+        key="",
+        options={"verify_signature": False},
+        audience=settings.JWT_AUDIENCE,
+        algorithms=[settings.JWT_ALGORITHM],
+    )
+
+
+async def verify_token(token: str) -> Dict[str, Any]:
+    """
+    Verify JWT: if our local issuer (vms), decode with SECRET_KEY; else Keycloak.
+    Verified claims are served from token_cache until the token expires (or logout invalidates it).
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    try:
+        payload = _decode_token(token)
     except JWTError as e:
         logger.error("JWT verification failed", error=str(e))
         raise ValueError(f"Invalid token: {str(e)}")
+    token_cache.put(token, payload)
+    return payload
+
+
+def invalidate_token(token: Optional[str] = None, user_id: Optional[str] = None) -> None:
+    """Logout hook: drop a token (and/or every token of a user) from the verification cache."""
+    if token:
+        token_cache.invalidate(token)
+    if user_id:
+        token_cache.invalidate_user(user_id)
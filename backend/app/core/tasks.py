@@ -0,0 +1,56 @@
+"""
+Registry for background tasks started outside a request (socket writers, pushes).
+asyncio only keeps weak references to tasks, so an unreferenced create_task() can be garbage-collected mid-flight
+and its exception is never seen. spawn() keeps a reference until the task finishes, logs failures, and drain()
+lets shutdown wait for (then cancel) whatever is still running.
+"""
+import asyncio
+from typing import Coroutine, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class TaskRegistry:
+    def __init__(self) -> None:
+        self._tasks: set[asyncio.Task] = set()
+        self.started = 0
+        self.failed = 0
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        self.started += 1
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.failed += 1
+            logger.warning("Background task failed", task=task.get_name(), error=str(error))
+
+    async def drain(self, timeout: float) -> None:
+        """Wait up to timeout for running tasks, then cancel the rest."""
+        pending = set(self._tasks)
+        if not pending:
+            return
+        _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.info("Cancelled background tasks at shutdown", count=len(pending))
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def stats(self) -> dict:
+        return {"running": len(self._tasks), "started": self.started, "failed": self.failed}
+
+
+background_tasks = TaskRegistry()
@@ -0,0 +1,128 @@
+"""
+Verified access-token claims, cached per worker.
+get_current_user (and the WebSocket/SSE handshakes) verify the bearer token on every request, sometimes more than
+once per request through chained dependencies. Entries are keyed by the token's SHA-256 digest (the raw token is
+never kept), live at most AUTH_TOKEN_CACHE_TTL_SECONDS and never past the token's own exp, and the cache holds at
+most AUTH_TOKEN_CACHE_MAX_ENTRIES (least recently used evicted). Only successful verifications are cached.
+Callers get a copy of the claims, so mutating the returned dict never leaks into the next request.
+"""
+import copy
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class CachedClaims:
+    claims: dict[str, Any]
+    user_id: Optional[str]
+    expires_at: float  # wall clock, comparable with exp
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """LRU of verified claims by token digest, indexed by user so logout can drop every token of a user."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._ttl = ttl_seconds
+        self._max_entries = max(1, max_entries)
+        self._entries: OrderedDict[str, CachedClaims] = OrderedDict()
+        self._by_user: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+
+    def get(self, token: str) -> Optional[dict[str, Any]]:
+        if not self.enabled:
+            return None
+        digest = token_digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.time() >= entry.expires_at:
+            self._drop(digest)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return copy.deepcopy(entry.claims)
+
+    def put(self, token: str, claims: dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self._ttl
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= time.time():
+            return
+        digest = token_digest(token)
+        self._drop(digest)
+        user_id = claims.get("user_id") or claims.get("sub")
+        user_id = str(user_id) if user_id else None
+        self._entries[digest] = CachedClaims(copy.deepcopy(claims), user_id, expires_at)
+        if user_id:
+            self._by_user.setdefault(user_id, set()).add(digest)
+        while len(self._entries) > self._max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, token: str) -> None:
+        """Forget one token (logout): the next request carrying it is verified from scratch."""
+        if self._drop(token_digest(token)):
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Forget every cached token of a user (logout everywhere, role or account changes)."""
+        for digest in list(self._by_user.get(str(user_id), ())):
+            if self._drop(digest):
+                self.invalidations += 1
+
+    def _drop(self, digest: str) -> bool:
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return False
+        if entry.user_id:
+            digests = self._by_user.get(entry.user_id)
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._by_user[entry.user_id]
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+        self.hits = self.misses = self.expired = self.evictions = self.invalidations = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "users": len(self._by_user),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_TTL_SECONDS, settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
@@ -12,7 +12,7 @@ from starlette.middleware.cors import CORSMiddleware
 import structlog
 
 from app.core.config import settings
-from app.api import auth, visitors, checkin, health, dashboard, residents, blacklist, notifications, societies, buildings, users
+from app.api import auth, visitors, checkin, gate_sync, health, dashboard, residents, blacklist, notifications, societies, buildings, users
 from app.api import admin, admin_subscriptions, admin_complaints, admin_support, admin_settings, society_complaints, society_amenities, society_staff
 
 # Configure structured logging
@@ -185,6 +185,7 @@ app.include_router(health.router, prefix="/api/v1", tags=["health"])
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(visitors.router, prefix="/api/v1/visitors", tags=["visitors"])
 app.include_router(checkin.router, prefix="/api/v1/checkin", tags=["check-in"])
+app.include_router(gate_sync.router, prefix="/api/v1/gate-sync", tags=["gate-sync"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["dashboard"])
 app.include_router(residents.router, prefix="/api/v1/residents", tags=["residents"])
 app.include_router(blacklist.router, prefix="/api/v1/blacklist", tags=["blacklist"])
@@ -221,6 +222,9 @@ async def startup_event():
     """Startup: init DB."""
     import app.models  # noqa: F401 - ensure all models registered
     from app.core.database import init_db, AsyncSessionLocal
+    from app.services.presence_journal import open_journal
+
+    open_journal()  # before the DB, so the failsafe muster works even if the DB never comes up
 
     try:
         await init_db()
@@ -228,10 +232,41 @@ async def startup_event():
     except Exception as e:
         logger.warning("Database init skipped (API will start; DB required for requests)", error=str(e))
 
+    from app.services.visit_counters import start_reconcile_task
+    from app.services.presence import start_rebuild_task
+    from app.services.notification_retention import start_retention_task
+    from app.services.outbox import start_outbox_workers
+    from app.core.notification_ws import start_backplane
+    start_reconcile_task()
+    start_rebuild_task()
+    start_retention_task()
+    start_outbox_workers()
+    try:
+        await start_backplane()
+    except Exception as e:
+        logger.warning("Notification backplane unavailable; pushes stay on this worker", error=str(e))
+
     logger.info("Starting VMS API", version="1.0.0")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event handler."""
+    from app.services.visit_counters import stop_reconcile_task
+    from app.services.presence import stop_rebuild_task
+    from app.services.notification_retention import stop_retention_task
+    from app.services.outbox import stop_outbox_workers
+    from app.core.notification_ws import stop_backplane, connections
+    from app.core.tasks import background_tasks
+    await stop_reconcile_task()
+    await stop_rebuild_task()
+    await stop_retention_task()
+    await stop_outbox_workers()
+    from app.core import outbound
+    await outbound.close_all()
+    await stop_backplane()
+    connections.close_all()
+    await background_tasks.drain(settings.SHUTDOWN_DRAIN_SECONDS)
+    from app.services.presence_journal import close_journal
+    close_journal()
     logger.info("Shutting down VMS API")
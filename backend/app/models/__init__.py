@@ -4,9 +4,10 @@ Database models.
 from app.models.society import Society, Building, Amenity, MaintenanceStaff
 from app.models.user import User
 from app.models.refresh_token import RefreshToken
-from app.models.visitor import Visitor, Visit, ConsentLog, Blacklist
-from app.models.notification import Notification
+from app.models.visitor import Visitor, Visit, ConsentLog, Blacklist, SocietyVisitCounters
+from app.models.notification import Notification, NotificationArchive, SocietyNotice, SocietyNoticeRead
 from app.models.audit import AuditLog
+from app.models.outbox import OutboxMessage, OutboxStatus
 from app.models.subscription import SubscriptionPlan, Subscription, Payment, Invoice
 from app.models.complaint import Complaint, ComplaintComment
 from app.models.support import SupportTicket, TicketMessage
@@ -23,8 +24,14 @@ __all__ = [
     "Visit",
     "ConsentLog",
     "Blacklist",
+    "SocietyVisitCounters",
     "Notification",
+    "NotificationArchive",
+    "SocietyNotice",
+    "SocietyNoticeRead",
     "AuditLog",
+    "OutboxMessage",
+    "OutboxStatus",
     # Subscription & Billing
     "SubscriptionPlan",
     "Subscription",
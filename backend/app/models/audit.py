@@ -1,7 +1,7 @@
 """
 Audit log for admin and sensitive actions (RBAC / OWASP compliance).
 """
-from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy import Column, String, DateTime, JSON, Index
 from datetime import datetime
 import uuid
 
@@ -14,6 +14,10 @@ class AuditLog(Base):
     Immutable audit log: user_id, action, endpoint, timestamp, details.
     """
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     user_id = Column(GUID(), nullable=False, index=True)
@@ -1,7 +1,7 @@
 """
 Complaint model for tracking issues across societies.
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Integer, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -42,6 +42,11 @@ class Complaint(Base):
     Complaints filed by residents or society admins.
     """
     __tablename__ = "complaints"
+    __table_args__ = (
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_complaints_created_at_id", "created_at", "id"),
+        Index("ix_complaints_society_id_created_at_id", "society_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     society_id = Column(GUID(), ForeignKey("societies.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -1,5 +1,5 @@
-"""Notification model for host alerts."""
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text
+"""Notification models: per-user host alerts, and society notices stored once with a per-user read set."""
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Index
 from datetime import datetime
 import uuid
 
@@ -11,6 +11,13 @@ class Notification(Base):
     """In-app notification for hosts (e.g. visitor arrived)."""
 
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Inbox pages (all / unread only) and the unread count seek within one user's rows
+        Index("ix_notifications_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_notifications_user_id_read_created_at_id", "user_id", "read", "created_at", "id"),
+        # Retention: oldest read rows first, across users
+        Index("ix_notifications_read_created_at", "read", "created_at"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     user_id = Column(GUID(), ForeignKey("users.id"), nullable=False, index=True)
@@ -20,3 +27,53 @@ class Notification(Base):
     read = Column(Boolean, default=False, nullable=False)
     extra_data = Column(Text, nullable=True)  # JSON: visit_id, visitor_name, etc.
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class NotificationArchive(Base):
+    """
+    Read notifications moved out of `notifications` by the retention job. Kept compact: no read flag (always read)
+    and one index, for looking up a user's history.
+    """
+
+    __tablename__ = "notification_archive"
+    __table_args__ = (
+        Index("ix_notification_archive_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id = Column(GUID(), primary_key=True)  # the notification's id
+    user_id = Column(GUID(), nullable=False)
+    type = Column(String(50), nullable=False)
+    title = Column(String(255), nullable=False)
+    body = Column(Text, nullable=True)
+    extra_data = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SocietyNotice(Base):
+    """
+    Society-wide notice, stored once. Members see notices created since they joined, merged into their
+    notification list at read time; reads are recorded in society_notice_reads.
+    """
+
+    __tablename__ = "society_notices"
+    __table_args__ = (
+        Index("ix_society_notices_society_id_created_at", "society_id", "created_at"),
+    )
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    society_id = Column(GUID(), ForeignKey("societies.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String(255), nullable=False)
+    body = Column(Text, nullable=True)
+    created_by = Column(GUID(), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SocietyNoticeRead(Base):
+    """One row per (notice, user) that has been read; absence means unread."""
+
+    __tablename__ = "society_notice_reads"
+
+    notice_id = Column(GUID(), ForeignKey("society_notices.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    read_at = Column(DateTime, default=datetime.utcnow, nullable=False)
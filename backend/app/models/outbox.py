@@ -0,0 +1,40 @@
+"""
+Outbox for outbound messages (WhatsApp invites). A row is written in the same transaction as the change that
+causes it, so a committed visit always has its invite queued; workers deliver rows after commit.
+"""
+from datetime import datetime
+import enum
+import uuid
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from app.core.database import Base
+from app.core.db_types import GUID
+
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"  # waiting for its next_attempt_at
+    SENDING = "sending"  # claimed by a worker until lease_until
+    SENT = "sent"
+    DEAD = "dead"  # gave up (attempts exhausted or rejected); last_error says why
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        # Workers claim due rows oldest first
+        Index("ix_outbox_messages_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    channel = Column(String(20), nullable=False)  # whatsapp, whatsapp_invite
+    payload = Column(Text, nullable=False)  # JSON; invites hold the contact only, the pass is read at send time
+    status = Column(String(20), nullable=False, default=OutboxStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    claim_id = Column(GUID(), nullable=True)  # which claim holds the row while SENDING
+    lease_until = Column(DateTime, nullable=True)  # a SENDING row past this is claimable again (worker died)
+    last_error = Column(Text, nullable=True)
+    visit_id = Column(GUID(), nullable=True)  # for tracing; no FK so archived visits never block the outbox
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
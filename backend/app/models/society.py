@@ -1,7 +1,7 @@
 """
 Society and Building models for multi-society support.
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -15,6 +15,10 @@ class Society(Base):
     Society (housing society / apartment complex).
     """
     __tablename__ = "societies"
+    __table_args__ = (
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_societies_created_at_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False, index=True)
@@ -31,6 +35,7 @@ class Society(Base):
     society_type = Column(String(100), nullable=True)  # e.g. Cooperative Housing, AOA
     registration_year = Column(String(10), nullable=True)
     documents_note = Column(String(500), nullable=True)  # e.g. "Documents submitted for verification"
+    max_occupancy = Column(Integer, nullable=True)  # visitors inside at once; drives capacity events (presence)
     plan = Column(String(50), nullable=True, default="basic")
     status = Column(String(50), nullable=True, default="active")
     is_active = Column(Boolean, default=True, nullable=False)
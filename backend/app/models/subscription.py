@@ -1,7 +1,7 @@
 """
 Subscription and billing models for SaaS platform.
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Numeric, Text, Enum
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, Numeric, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -63,6 +63,10 @@ class Subscription(Base):
     Active subscription linking a society to a plan.
     """
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_subscriptions_created_at_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     society_id = Column(GUID(), ForeignKey("societies.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -89,6 +93,10 @@ class Payment(Base):
     Payment records for subscriptions.
     """
     __tablename__ = "payments"
+    __table_args__ = (
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_payments_created_at_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     subscription_id = Column(GUID(), ForeignKey("subscriptions.id", ondelete="SET NULL"), nullable=True, index=True)
@@ -116,6 +124,10 @@ class Invoice(Base):
     Invoices generated for payments.
     """
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_invoices_created_at_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     invoice_number = Column(String(50), unique=True, nullable=False, index=True)
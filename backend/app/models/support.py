@@ -1,7 +1,7 @@
 """
 Support ticket model for platform-level support.
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Index
 from datetime import datetime
 import uuid
 import enum
@@ -39,6 +39,10 @@ class SupportTicket(Base):
     Support tickets from societies/users to platform admin.
     """
     __tablename__ = "support_tickets"
+    __table_args__ = (
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_support_tickets_created_at_id", "created_at", "id"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     ticket_number = Column(String(50), unique=True, nullable=False, index=True)
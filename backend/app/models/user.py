@@ -21,6 +21,8 @@ class User(Base):
     __table_args__ = (
         # Fast "list users by society" + "order by created_at" (admin list, residents page)
         Index("ix_users_society_id_created_at", "society_id", "created_at"),
+        # Keyset pagination (app.utils.pagination): newest first, id breaks ties
+        Index("ix_users_created_at_id", "created_at", "id"),
     )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
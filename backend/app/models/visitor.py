@@ -1,7 +1,8 @@
 """
 Visitor and Visit models.
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, JSON, TypeDecorator
+from sqlalchemy import Column, String, Boolean, Date, DateTime, ForeignKey, Integer, Text, JSON, TypeDecorator, Index
+from sqlalchemy import text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -66,15 +67,36 @@ class Visitor(Base):
         return f"<Visitor(id={self.id}, phone={self.phone}, name={self.full_name})>"
 
 
+# Rows whose OTP must be unique per society (pending/approved passes); the partial unique index enforces it
+LIVE_OTP_PREDICATE = "status IN ('pending', 'approved') AND otp IS NOT NULL"
+
+
 class Visit(Base):
     """
     Visit record (one visitor can have multiple visits).
+    society_id is the host's society at creation (denormalized so society-scoped queries need no users join);
+    OTPs are unique per society among live passes.
     """
     __tablename__ = "visits"
+    __table_args__ = (
+        # Gate OTP lookup is always scoped by the guard's society
+        Index("ix_visits_society_id_otp", "society_id", "otp"),
+        # ...and no two live passes of a society share one, across workers and concurrent transactions
+        Index(
+            "uq_visits_society_id_otp_live", "society_id", "otp", unique=True,
+            sqlite_where=text(LIVE_OTP_PREDICATE), postgresql_where=text(LIVE_OTP_PREDICATE),
+        ),
+        # Guard-device delta sync: changes per society ordered by updated_at
+        Index("ix_visits_society_id_updated_at", "society_id", "updated_at"),
+        # Society-scoped lists, muster and counts (status filter and/or created_at order/range)
+        Index("ix_visits_society_id_status_created_at", "society_id", "status", "created_at"),
+        Index("ix_visits_society_id_created_at", "society_id", "created_at"),
+    )
 
     id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     visitor_id = Column(GUID(), ForeignKey("visitors.id"), nullable=False, index=True)
     host_id = Column(GUID(), ForeignKey("users.id"), nullable=False, index=True)
+    society_id = Column(GUID(), ForeignKey("societies.id", ondelete="SET NULL"), nullable=True)
     status = Column(VisitStatusType(), default=VisitStatus.PENDING, nullable=False, index=True)
     
     # Visit details
@@ -151,3 +173,21 @@ class Blacklist(Base):
 
     def __repr__(self):
         return f"<Blacklist(id={self.id}, visitor_id={self.visitor_id}, is_active={self.is_active})>"
+
+
+class SocietyVisitCounters(Base):
+    """
+    Dashboard counters per society, maintained by visit transitions and corrected by a periodic reconcile.
+    visitors_today counts distinct visitors with a visit created on `day` (UTC); a row from an earlier day reads as 0.
+    """
+    __tablename__ = "society_visit_counters"
+
+    society_id = Column(GUID(), ForeignKey("societies.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, nullable=False)
+    visitors_today = Column(Integer, default=0, nullable=False)
+    pending = Column(Integer, default=0, nullable=False)
+    checked_in = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SocietyVisitCounters(society_id={self.society_id}, pending={self.pending}, checked_in={self.checked_in})>"
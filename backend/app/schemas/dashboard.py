@@ -1,5 +1,9 @@
 """Dashboard schemas."""
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
 
 
 class DashboardStatsResponse(BaseModel):
@@ -7,3 +11,35 @@ class DashboardStatsResponse(BaseModel):
     visitors_today: int
     pending_approvals: int
     checked_in: int
+
+
+class BuildingOccupancy(BaseModel):
+    building_id: Optional[UUID] = None
+    inside: int
+
+
+class CapacityEventResponse(BaseModel):
+    occupancy: int
+    capacity: int
+    threshold: int
+    direction: str
+    at: datetime
+
+
+class OccupancyResponse(BaseModel):
+    """Who is inside right now, from the presence registry."""
+    society_id: UUID
+    inside: int
+    capacity: Optional[int] = None
+    utilisation: Optional[float] = None  # inside / capacity, when capacity is set
+    buildings: list[BuildingOccupancy]
+    recent_events: list[CapacityEventResponse]
+
+
+class CapacityUpdate(BaseModel):
+    max_occupancy: Optional[int] = Field(None, ge=1)  # None clears the limit
+
+
+class VisitorPresenceResponse(BaseModel):
+    visitor_id: UUID
+    inside: bool
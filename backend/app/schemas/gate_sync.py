@@ -0,0 +1,87 @@
+"""
+Pydantic schemas for guard-device sync (offline gate).
+"""
+from datetime import datetime
+from typing import Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class ManifestPass(BaseModel):
+    """
+    One currently valid pass. qr_hash is an HMAC digest; the device hashes what it scans with code_salt.
+    OTPs are never published (has_otp only): an OTP typed in offline is verified by the server on upload.
+    """
+    visit_id: UUID
+    qr_hash: Optional[str] = None
+    has_otp: bool = False
+    status: str
+    host_flat_number: Optional[str] = None
+    building_name: Optional[str] = None
+    arrival_from: Optional[datetime] = None
+    arrival_until: Optional[datetime] = None
+    expires_at: datetime
+
+
+class GateManifestResponse(BaseModel):
+    """
+    Full snapshot of the society's valid passes. cursor seeds the next delta sync.
+    signature: Ed25519 (base64url) over the canonical JSON of every other field, key key_id from /signing-key.
+    """
+    society_id: UUID
+    generated_at: datetime
+    code_salt: str
+    key_id: str
+    cursor: Optional[str] = None
+    passes: list[ManifestPass]
+    signature: str
+
+
+class GateDeltaResponse(BaseModel):
+    """
+    Changes since a cursor: passes to add/replace and visit ids to drop from the local manifest.
+    Recent changes are sent again on the next pull, so apply both idempotently (removing an unknown id is a no-op).
+    """
+    society_id: UUID
+    generated_at: datetime
+    cursor: Optional[str] = None
+    has_more: bool
+    upserts: list[ManifestPass]
+    removals: list[UUID]
+    signature: str
+
+
+class GateSigningKeyResponse(BaseModel):
+    """Public key devices pin to verify manifest and delta signatures."""
+    society_id: UUID
+    algorithm: Literal["Ed25519"]
+    key_id: str
+    public_key: str  # raw 32-byte key, base64url
+
+
+class OfflineCheckIn(BaseModel):
+    """A check-in the device recorded while offline, with the code it scanned (QR) or had typed in (OTP)."""
+    visit_id: UUID
+    scanned_at: datetime
+    method: Literal["otp", "qr"]
+    code: str = Field(..., min_length=1, max_length=255)
+    consent_given: bool = Field(..., description="DPDP: Visitor must explicitly consent to data collection")
+
+
+class OfflineCheckInBatch(BaseModel):
+    """Queued offline check-ins uploaded in one request."""
+    checkins: list[OfflineCheckIn] = Field(..., min_length=1, max_length=500)
+
+
+class OfflineCheckInResult(BaseModel):
+    visit_id: UUID
+    result: Literal["checked_in", "duplicate", "rejected"]
+    detail: Optional[str] = None
+
+
+class OfflineCheckInBatchResponse(BaseModel):
+    checked_in: int
+    duplicates: int
+    rejected: int
+    results: list[OfflineCheckInResult]
@@ -153,10 +153,11 @@ class AuditLogResponse(BaseModel):
 class AuditLogListResponse(BaseModel):
     """Schema for paginated audit log list."""
     items: List[AuditLogResponse]
-    total: int
+    total: Optional[int] = None  # None when requested with include_total=false
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
 
 
 # ============== Activity Logs ==============
@@ -206,10 +207,11 @@ class GlobalUserResponse(BaseModel):
 class GlobalUserListResponse(BaseModel):
     """Schema for paginated global user list."""
     items: List[GlobalUserResponse]
-    total: int
+    total: Optional[int] = None  # None when requested with include_total=false
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
 
 
 class GlobalUserUpdate(BaseModel):
@@ -282,7 +284,8 @@ class AssignAdminRequest(BaseModel):
 class SocietyListResponse(BaseModel):
     """Schema for paginated society list."""
     items: List[SocietyDetailResponse]
-    total: int
+    total: Optional[int] = None  # None when requested with include_total=false
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
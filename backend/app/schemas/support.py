@@ -81,10 +81,11 @@ class SupportTicketResponse(BaseModel):
 class SupportTicketListResponse(BaseModel):
     """Schema for paginated ticket list."""
     items: List[SupportTicketResponse]
-    total: int
+    total: Optional[int] = None  # None when requested with include_total=false
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
 
 
 class SupportStats(BaseModel):
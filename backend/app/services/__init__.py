@@ -5,6 +5,8 @@ from app.services.visit_service import (
     get_visit_by_id,
     get_visit_by_otp,
     get_visit_by_qr,
+    find_pass_by_otp,
+    find_pass_by_qr,
     checkin_visit,
     checkout_visit,
     get_dashboard_stats,
@@ -17,6 +19,8 @@ __all__ = [
     "get_visit_by_id",
     "get_visit_by_otp",
     "get_visit_by_qr",
+    "find_pass_by_otp",
+    "find_pass_by_qr",
     "checkin_visit",
     "checkout_visit",
     "get_dashboard_stats",
@@ -0,0 +1,119 @@
+"""
+In-process per-society blacklist membership cache.
+Each society gets a Bloom filter plus an exact set of blacklisted visitor ids (including legacy global rows,
+society_id IS NULL). Nearly every gate check is a "no", which the Bloom filter answers without touching the DB.
+Entries are rebuilt on demand with one query and invalidated by add/remove on every worker (broadcast over the
+notification backplane by blacklist_service); a TTL bounds staleness if a broadcast is lost.
+"""
+import hashlib
+import math
+import time
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.visitor import Blacklist
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over UUIDs (double hashing of one blake2b digest)."""
+
+    def __init__(self, expected_items: int, false_positive_rate: float = 0.01):
+        n = max(expected_items, 1)
+        self.size = max(64, int(-n * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / n * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: UUID) -> Iterable[int]:
+        digest = hashlib.blake2b(item.bytes, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: UUID) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: UUID) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class SocietyBlacklist:
+    """Blacklisted visitor ids for one society: Bloom filter in front of the exact set."""
+
+    def __init__(self, visitor_ids: set[UUID], built_at: float):
+        self.visitor_ids = visitor_ids
+        self.bloom = BloomFilter(len(visitor_ids))
+        for vid in visitor_ids:
+            self.bloom.add(vid)
+        self.built_at = built_at
+
+
+class BlacklistCache:
+    """Per-society blacklist structures with hit/miss counters."""
+
+    def __init__(self, ttl_seconds: int):
+        self._ttl = ttl_seconds
+        self._societies: dict[UUID, SocietyBlacklist] = {}
+        self.hits = 0  # answered without a DB round trip
+        self.misses = 0  # entry missing or stale: rebuilt from the DB
+        self.bloom_negatives = 0
+        self.bloom_false_positives = 0
+
+    async def _load(self, db: AsyncSession, society_id: UUID) -> SocietyBlacklist:
+        result = await db.execute(
+            select(Blacklist.visitor_id).where(
+                and_(
+                    or_(Blacklist.society_id == society_id, Blacklist.society_id.is_(None)),
+                    Blacklist.is_active == True,
+                )
+            )
+        )
+        entry = SocietyBlacklist({row[0] for row in result.all()}, time.monotonic())
+        self._societies[society_id] = entry
+        return entry
+
+    def _fresh(self, society_id: UUID) -> Optional[SocietyBlacklist]:
+        entry = self._societies.get(society_id)
+        if entry is None or time.monotonic() - entry.built_at > self._ttl:
+            return None
+        return entry
+
+    async def contains(self, db: AsyncSession, society_id: UUID, visitor_id: UUID) -> bool:
+        entry = self._fresh(society_id)
+        if entry is None:
+            self.misses += 1
+            entry = await self._load(db, society_id)
+        else:
+            self.hits += 1
+        if visitor_id not in entry.bloom:
+            self.bloom_negatives += 1
+            return False
+        if visitor_id in entry.visitor_ids:
+            return True
+        self.bloom_false_positives += 1
+        return False
+
+    def invalidate(self, society_id: Optional[UUID] = None) -> None:
+        """Drop one society's entry, or every entry (legacy global rows affect all societies)."""
+        if society_id is None:
+            self._societies.clear()
+        else:
+            self._societies.pop(society_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "societies": len(self._societies),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "bloom_negatives": self.bloom_negatives,
+            "bloom_false_positives": self.bloom_false_positives,
+        }
+
+
+blacklist_cache = BlacklistCache(ttl_seconds=settings.BLACKLIST_CACHE_TTL_SECONDS)
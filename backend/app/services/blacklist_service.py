@@ -5,7 +5,10 @@ from uuid import UUID
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.database import after_commit
+from app.core.notification_ws import on_sync, publish_sync
 from app.models.visitor import Visitor, Blacklist
+from app.services.blacklist_cache import blacklist_cache
 
 
 async def is_visitor_blacklisted_for_society(
@@ -13,7 +16,45 @@ async def is_visitor_blacklisted_for_society(
     visitor_id: UUID,
     society_id: UUID,
 ) -> bool:
-    """True if visitor is blacklisted for this society. Per-society blacklist."""
+    """
+    True if visitor is blacklisted for this society (or by a legacy global row).
+    Served from the in-process blacklist cache; the common "not blacklisted" answer needs no DB round trip.
+    """
+    return await blacklist_cache.contains(db, society_id, visitor_id)
+
+
+BLACKLIST_SYNC_EVENT = "blacklist_invalidate"
+
+
+def _broadcast_invalidation(society_id: Optional[UUID]) -> None:
+    """Drop the entry here and tell every other worker to drop theirs (the TTL covers a lost message)."""
+    blacklist_cache.invalidate(society_id)
+    publish_sync(BLACKLIST_SYNC_EVENT, {"society_id": str(society_id) if society_id else None})
+
+
+def _apply_invalidation(payload: dict) -> None:
+    society_id = payload.get("society_id")
+    blacklist_cache.invalidate(UUID(society_id) if society_id else None)
+
+
+on_sync(BLACKLIST_SYNC_EVENT, _apply_invalidation)
+
+
+def _invalidate_blacklist_cache(db: AsyncSession, society_id: UUID) -> None:
+    """
+    Drop the society's cached blacklist now (this session rebuilds it) and, once the change commits, on every
+    worker, so a visitor blacklisted at one gate is refused at the next gate within the backplane's latency.
+    """
+    blacklist_cache.invalidate(society_id)
+    after_commit(db, lambda: _broadcast_invalidation(society_id))
+
+
+async def _is_blacklisted_in_db(
+    db: AsyncSession,
+    visitor_id: UUID,
+    society_id: UUID,
+) -> bool:
+    """Uncached check used on blacklist writes."""
     result = await db.execute(
         select(Blacklist).where(
             and_(
@@ -52,7 +93,7 @@ async def add_to_blacklist(
         raise ValueError("Visitor not found")
 
     # Already blacklisted in this society?
-    if await is_visitor_blacklisted_for_society(db, visitor_id, society_id):
+    if await _is_blacklisted_in_db(db, visitor_id, society_id):
         raise ValueError("Visitor is already blacklisted in this society")
 
     bl = Blacklist(
@@ -64,6 +105,7 @@ async def add_to_blacklist(
     )
     db.add(bl)
     await db.flush()
+    _invalidate_blacklist_cache(db, society_id)
     # Keep Visitor.is_blacklisted for backward compat / "ever blacklisted anywhere" display
     visitor.is_blacklisted = True
     await db.flush()
@@ -94,6 +136,7 @@ async def remove_from_blacklist(
     for bl in rows:
         bl.is_active = False
     await db.flush()
+    _invalidate_blacklist_cache(db, society_id)
     # If no other society has this visitor blacklisted, clear the global flag
     other = await db.execute(
         select(Blacklist).where(
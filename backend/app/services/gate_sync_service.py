@@ -0,0 +1,329 @@
+"""
+Guard-device sync: signed pass manifests, cursor-based deltas, and bulk reconciliation of offline check-ins.
+Passes carry HMAC digests of QR codes (never the codes), so a device can match scans locally. OTPs are not
+published at all: six digits hash too cheaply to keep secret from anyone holding the manifest, so an OTP entered
+offline is recorded on the device and verified here on upload.
+Manifests and deltas are signed with a per-society Ed25519 key; devices verify them with the public key from
+/gate-sync/signing-key (pinned at provisioning), over the canonical JSON of the response without "signature".
+updated_at is stamped at flush, not commit, so a change can become visible after later-stamped ones. Cursors
+therefore never move past now - GATE_SYNC_DELTA_LAG_SECONDS: the next pull re-reads that window, and devices apply
+upserts and removals idempotently.
+"""
+import base64
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.constants.visit import ARRIVAL_WINDOW_MINUTES
+from app.core.config import settings
+from app.models.audit import AuditLog
+from app.models.user import User
+from app.models.visitor import Visit, VisitStatus
+from app.services.pass_index import LIVE_PASS_STATUSES
+from app.services.visit_service import checkin_visit
+from app.services.visit_state import VisitTransitionError
+from app.utils.cursor import encode_cursor, decode_cursor
+
+DELTA_PAGE_SIZE = 500
+NIL_ID = UUID(int=0)  # cursor id at the lag horizon: the next pull re-reads every row stamped from there on
+SIGNATURE_ALGORITHM = "Ed25519"
+SCAN_CLOCK_SKEW = timedelta(minutes=2)  # device clocks ahead of ours by up to this are not clamped
+
+
+def _master_secret() -> bytes:
+    """GATE_SYNC_SIGNING_KEY (base64 secret) or, when unset, one derived from SECRET_KEY."""
+    if settings.GATE_SYNC_SIGNING_KEY:
+        return base64.b64decode(settings.GATE_SYNC_SIGNING_KEY)
+    return hashlib.sha256(f"gate-sync:{settings.SECRET_KEY}".encode("utf-8")).digest()
+
+
+def _society_key(society_id: UUID, purpose: str) -> bytes:
+    return hmac.new(_master_secret(), f"gate-sync:{purpose}:{society_id}".encode("utf-8"), hashlib.sha256).digest()
+
+
+def _signing_key(society_id: UUID) -> Ed25519PrivateKey:
+    return Ed25519PrivateKey.from_private_bytes(_society_key(society_id, "manifest"))
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode((text + "=" * (-len(text) % 4)).encode("ascii"))
+
+
+def public_key(society_id: UUID) -> dict:
+    """What a device needs to verify this society's manifests: raw Ed25519 public key, base64url."""
+    raw = _signing_key(society_id).public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return {
+        "society_id": society_id,
+        "algorithm": SIGNATURE_ALGORITHM,
+        "key_id": hashlib.sha256(raw).hexdigest()[:16],
+        "public_key": _b64(raw),
+    }
+
+
+def code_salt(society_id: UUID) -> str:
+    """Per-society salt the device uses to hash scanned QR codes before matching the manifest."""
+    return _society_key(society_id, "code-salt").hex()
+
+
+def hash_code(society_id: UUID, kind: str, code: str) -> str:
+    """HMAC-SHA256(code_salt, '<kind>:<code>') as hex; kind is 'qr'."""
+    return hmac.new(
+        bytes.fromhex(code_salt(society_id)), f"{kind}:{code}".encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def canonical_json(payload: dict) -> bytes:
+    """Signed bytes: JSON with sorted keys, no whitespace, ISO datetimes (what the API returns, re-serialized)."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def sign_payload(society_id: UUID, payload: dict) -> str:
+    """Ed25519 signature over canonical_json(payload), base64url."""
+    return _b64(_signing_key(society_id).sign(canonical_json(payload)))
+
+
+def verify_payload(public_key_b64: str, payload: dict, signature: str) -> bool:
+    """Device-side check: needs only the published public key, the payload as received and its signature."""
+    try:
+        Ed25519PublicKey.from_public_bytes(_unb64(public_key_b64)).verify(_unb64(signature), canonical_json(payload))
+    except (InvalidSignature, ValueError):
+        return False
+    return True
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _is_live(visit: Visit, now: datetime) -> bool:
+    return (
+        visit.status in LIVE_PASS_STATUSES
+        and visit.otp_expires_at is not None
+        and visit.otp_expires_at > now
+        and bool(visit.otp or visit.qr_code)
+    )
+
+
+def _manifest_pass(society_id: UUID, visit: Visit) -> dict:
+    arrival_from = arrival_until = None
+    if visit.expected_arrival:
+        window = timedelta(minutes=ARRIVAL_WINDOW_MINUTES)
+        arrival_from = visit.expected_arrival - window
+        arrival_until = visit.expected_arrival + window
+    host = visit.host
+    return {
+        "visit_id": visit.id,
+        "qr_hash": hash_code(society_id, "qr", visit.qr_code) if visit.qr_code else None,
+        "has_otp": bool(visit.otp),
+        "status": visit.status.value,
+        "host_flat_number": host.flat_number if host else None,
+        "building_name": host.building.name if host and host.building else None,
+        "arrival_from": arrival_from,
+        "arrival_until": arrival_until,
+        "expires_at": visit.otp_expires_at,
+    }
+
+
+def _sync_horizon(now: datetime) -> datetime:
+    """Rows stamped before this have committed (transactions are shorter than the lag), so cursors may pass it."""
+    return now - timedelta(seconds=settings.GATE_SYNC_DELTA_LAG_SECONDS)
+
+
+def _capped(position: tuple[datetime, UUID], horizon: datetime) -> tuple[datetime, UUID]:
+    return (horizon, NIL_ID) if position[0] > horizon else position
+
+
+def _visits_with_host():
+    return select(Visit).options(joinedload(Visit.host).joinedload(User.building))
+
+
+async def build_manifest(db: AsyncSession, society_id: UUID) -> dict:
+    """Snapshot of every currently valid pass in the society plus a cursor for subsequent deltas."""
+    now = datetime.utcnow()
+    result = await db.execute(
+        _visits_with_host().where(
+            and_(
+                Visit.society_id == society_id,
+                Visit.status.in_(LIVE_PASS_STATUSES),
+                Visit.otp_expires_at > now,
+            )
+        )
+    )
+    visits = [v for v in result.unique().scalars().all() if _is_live(v, now)]
+    # Cursor = newest change in the society (capped at the lag horizon), so the first delta returns what changed
+    # after this snapshot plus the recent window again
+    latest = await db.execute(
+        select(Visit.updated_at, Visit.id)
+        .where(Visit.society_id == society_id)
+        .order_by(Visit.updated_at.desc(), Visit.id.desc())
+        .limit(1)
+    )
+    row = latest.first()
+    payload = {
+        "society_id": society_id,
+        "generated_at": now,
+        "code_salt": code_salt(society_id),
+        "key_id": public_key(society_id)["key_id"],
+        "cursor": encode_cursor(*_capped((row.updated_at, row.id), _sync_horizon(now))) if row else None,
+        "passes": [_manifest_pass(society_id, v) for v in visits],
+    }
+    payload["signature"] = sign_payload(society_id, payload)
+    return payload
+
+
+async def build_delta(
+    db: AsyncSession,
+    society_id: UUID,
+    cursor: Optional[str],
+    limit: int = DELTA_PAGE_SIZE,
+) -> dict:
+    """
+    Visits changed after `cursor` (keyset on updated_at, id), oldest first.
+    Live passes are upserts; anything else (checked in/out, expired, cancelled) is a removal.
+    The returned cursor stops at the lag horizon, so changes from the last GATE_SYNC_DELTA_LAG_SECONDS come again
+    on the next pull (with any that committed late). It never moves backwards, and a full page lying entirely past
+    the horizon advances to its last row, so a burst larger than a page cannot stall paging.
+    Raises ValueError on a malformed cursor.
+    """
+    now = datetime.utcnow()
+    horizon = _sync_horizon(now)
+    q = _visits_with_host().where(Visit.society_id == society_id)
+    after: Optional[tuple[datetime, UUID]] = None
+    if cursor:
+        after_ts, after_id = after = decode_cursor(cursor)
+        q = q.where(
+            or_(
+                Visit.updated_at > after_ts,
+                and_(Visit.updated_at == after_ts, Visit.id > after_id),
+            )
+        )
+    result = await db.execute(q.order_by(Visit.updated_at.asc(), Visit.id.asc()).limit(limit + 1))
+    visits = list(result.unique().scalars().all())
+    has_more = len(visits) > limit
+    visits = visits[:limit]
+    upserts, removals = [], []
+    for v in visits:
+        if _is_live(v, now):
+            upserts.append(_manifest_pass(society_id, v))
+        else:
+            removals.append(v.id)
+    next_cursor = cursor
+    if visits:
+        position = (visits[-1].updated_at, visits[-1].id)
+        if not (has_more and visits[0].updated_at > horizon):  # else capping would hand out this page again
+            position = max(_capped(position, horizon), after) if after else _capped(position, horizon)
+        next_cursor = encode_cursor(*position)
+    payload = {
+        "society_id": society_id,
+        "generated_at": now,
+        "cursor": next_cursor,
+        "has_more": has_more,
+        "upserts": upserts,
+        "removals": removals,
+    }
+    payload["signature"] = sign_payload(society_id, payload)
+    return payload
+
+
+def _clamp_scanned_at(scanned_at: datetime, now: datetime) -> datetime:
+    """
+    Device clocks are not trusted: a scan is judged no earlier than GATE_SYNC_MAX_SCAN_AGE_MINUTES before upload
+    (so backdating cannot revive an expired pass) and no later than now.
+    """
+    earliest = now - timedelta(minutes=settings.GATE_SYNC_MAX_SCAN_AGE_MINUTES)
+    if scanned_at > now + SCAN_CLOCK_SKEW:
+        return now
+    return min(max(scanned_at, earliest), now)
+
+
+def _code_matches(visit: Visit, method: str, code: str) -> bool:
+    expected = visit.otp if method == "otp" else visit.qr_code
+    return bool(expected) and hmac.compare_digest(expected.encode("utf-8"), code.strip().encode("utf-8"))
+
+
+async def reconcile_offline_checkins(
+    db: AsyncSession,
+    society_id: UUID,
+    checkins: list[dict],
+    audit_entry: Optional[AuditLog] = None,
+) -> dict:
+    """
+    Apply check-ins queued on a guard device while offline. All visits are loaded in one query; each
+    check-in is a conditional UPDATE, so a pass already checked in online (or by another gate) is a duplicate.
+    Each upload carries the code the device scanned or had typed in, checked against the visit for its method.
+    Validity (expiry, arrival window) is judged at scanned_at, clamped to a window before upload time.
+    """
+    now = datetime.utcnow()
+    checkins = [{**c, "scanned_at": _clamp_scanned_at(_as_naive_utc(c["scanned_at"]), now)} for c in checkins]
+    ids = {c["visit_id"] for c in checkins}
+    result = await db.execute(
+        select(Visit)
+        .options(joinedload(Visit.visitor), joinedload(Visit.host))
+        .where(Visit.id.in_(ids), Visit.society_id == society_id)
+    )
+    visits = {v.id: v for v in result.unique().scalars().all()}
+    results = []
+    for item in sorted(checkins, key=lambda c: c["scanned_at"]):
+        visit_id = item["visit_id"]
+        scanned_at = item["scanned_at"]
+        visit = visits.get(visit_id)
+        if visit is None:
+            results.append({"visit_id": visit_id, "result": "rejected", "detail": "Visit not found in your society"})
+            continue
+        if not _code_matches(visit, item["method"], item["code"]):
+            results.append({"visit_id": visit_id, "result": "rejected", "detail": "Code does not match this pass"})
+            continue
+        if not item["consent_given"]:
+            results.append({"visit_id": visit_id, "result": "rejected", "detail": "Consent not recorded"})
+            continue
+        if visit.status in (VisitStatus.CHECKED_IN, VisitStatus.CHECKED_OUT):
+            results.append({"visit_id": visit_id, "result": "duplicate", "detail": f"Already {visit.status.value}"})
+            continue
+        if visit.status not in LIVE_PASS_STATUSES:
+            results.append({"visit_id": visit_id, "result": "rejected", "detail": f"Visit is {visit.status.value}"})
+            continue
+        if visit.otp_expires_at is None or visit.otp_expires_at <= scanned_at:
+            results.append({"visit_id": visit_id, "result": "rejected", "detail": "Pass had expired at scan time"})
+            continue
+        try:
+            await checkin_visit(db, visit, arrived_at=scanned_at)
+        except VisitTransitionError:
+            results.append({"visit_id": visit_id, "result": "duplicate", "detail": "Checked in by another gate"})
+            continue
+        except ValueError as e:
+            results.append({"visit_id": visit_id, "result": "rejected", "detail": str(e)})
+            continue
+        results.append({"visit_id": visit_id, "result": "checked_in", "detail": None})
+    if audit_entry is not None:
+        audit_entry.details = {
+            **(audit_entry.details or {}),
+            "checked_in": sum(r["result"] == "checked_in" for r in results),
+            "rejected": sum(r["result"] == "rejected" for r in results),
+            "received": len(checkins),
+        }
+        db.add(audit_entry)
+        await db.flush()
+    return {
+        "checked_in": sum(r["result"] == "checked_in" for r in results),
+        "duplicates": sum(r["result"] == "duplicate" for r in results),
+        "rejected": sum(r["result"] == "rejected" for r in results),
+        "results": results,
+    }
@@ -0,0 +1,236 @@
+"""
+Notification retention: read notifications older than their type's TTL move to notification_archive.
+Rows move in batches of NOTIFY_RETENTION_BATCH, each its own short transaction (pick the oldest expired ids with
+SKIP LOCKED, INSERT ... SELECT them into the archive, DELETE them), with a pause between batches. The job only starts
+inside NOTIFY_RETENTION_WINDOW_HOURS (IST) and stops between batches once the window closes, so it never holds locks
+while the gates are busy. Unread notifications are never moved. Progress is exposed in /health/metrics.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import pytz
+import structlog
+from sqlalchemy import DateTime, delete, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.notification import Notification, NotificationArchive
+
+logger = structlog.get_logger()
+
+IST = pytz.timezone("Asia/Kolkata")
+ARCHIVE_COLUMNS = ["id", "user_id", "type", "title", "body", "extra_data", "created_at", "archived_at"]
+
+
+@dataclass(frozen=True)
+class RetentionRule:
+    type: Optional[str]  # None: every type without a rule of its own
+    days: int  # 0 = keep forever
+
+
+def retention_rules() -> list[RetentionRule]:
+    """Per-type rules from NOTIFY_RETENTION_TYPE_DAYS, then the default rule (NOTIFY_RETENTION_DAYS)."""
+    rules = []
+    for part in settings.NOTIFY_RETENTION_TYPE_DAYS.split(","):
+        kind, _, days = part.strip().partition(":")
+        if kind.strip() and days.strip().isdigit():
+            rules.append(RetentionRule(kind.strip(), int(days)))
+    rules.append(RetentionRule(None, settings.NOTIFY_RETENTION_DAYS))
+    return rules
+
+
+def in_window(now: Optional[datetime] = None) -> bool:
+    """True inside NOTIFY_RETENTION_WINDOW_HOURS ("start-end" IST hours, may wrap midnight); always if unset."""
+    start, sep, end = settings.NOTIFY_RETENTION_WINDOW_HOURS.partition("-")
+    if not sep or not start.strip().isdigit() or not end.strip().isdigit():
+        return True
+    start_hour, end_hour = int(start) % 24, int(end) % 24
+    hour = (now or datetime.now(IST)).hour
+    if start_hour <= end_hour:
+        return start_hour <= hour < end_hour
+    return hour >= start_hour or hour < end_hour
+
+
+class RetentionProgress:
+    """Counters for the retention job: totals, the current (or last) run, and batch timings."""
+
+    def __init__(self) -> None:
+        self.running = False
+        self.current_rule: Optional[str] = None
+        self.runs = 0
+        self.run_archived = 0  # rows moved by the current run, or the last one when idle
+        self.archived_total = 0
+        self.batches = 0
+        self.last_batch_ms: Optional[float] = None
+        self.max_batch_ms = 0.0
+        self.skipped_outside_window = 0
+        self.stopped_by_window = 0
+        self.errors = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_seconds: Optional[float] = None
+
+    def start(self) -> None:
+        self.running = True
+        self.runs += 1
+        self.run_archived = 0
+        self.last_run_at = datetime.utcnow()
+
+    def record_batch(self, moved: int, elapsed_ms: float) -> None:
+        self.batches += 1
+        self.run_archived += moved
+        self.archived_total += moved
+        self.last_batch_ms = round(elapsed_ms, 3)
+        self.max_batch_ms = max(self.max_batch_ms, self.last_batch_ms)
+
+    def finish(self, elapsed_seconds: float) -> None:
+        self.running = False
+        self.current_rule = None
+        self.last_run_seconds = round(elapsed_seconds, 3)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "current_rule": self.current_rule,
+            "runs": self.runs,
+            "run_archived": self.run_archived,
+            "archived_total": self.archived_total,
+            "batches": self.batches,
+            "last_batch_ms": self.last_batch_ms,
+            "max_batch_ms": self.max_batch_ms,
+            "skipped_outside_window": self.skipped_outside_window,
+            "stopped_by_window": self.stopped_by_window,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+
+retention_progress = RetentionProgress()
+
+
+async def archive_batch(
+    db: AsyncSession, rule: RetentionRule, own_rules: list[str], cutoff: datetime, limit: int
+) -> int:
+    """
+    Move up to limit read notifications created before cutoff that fall under rule, oldest first, in db's
+    transaction (the caller commits). own_rules: types with their own rule, which the default rule skips.
+    Rows another worker is moving are skipped (SKIP LOCKED on PostgreSQL). Returns the number moved.
+    """
+    q = select(Notification.id).where(
+        Notification.read == True,  # noqa: E712
+        Notification.created_at < cutoff,
+    )
+    if rule.type is not None:
+        q = q.where(Notification.type == rule.type)
+    elif own_rules:
+        q = q.where(Notification.type.notin_(own_rules))
+    result = await db.execute(
+        q.order_by(Notification.created_at).limit(limit).with_for_update(skip_locked=True)
+    )
+    ids = result.scalars().all()
+    if not ids:
+        return 0
+    rows = select(
+        Notification.id,
+        Notification.user_id,
+        Notification.type,
+        Notification.title,
+        Notification.body,
+        Notification.extra_data,
+        Notification.created_at,
+        literal(datetime.utcnow(), DateTime),
+    ).where(Notification.id.in_(ids))
+    await db.execute(insert(NotificationArchive).from_select(ARCHIVE_COLUMNS, rows))
+    await db.execute(
+        delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    return len(ids)
+
+
+async def run_retention(
+    session_factory,
+    rules: Optional[list[RetentionRule]] = None,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    window: Callable[[], bool] = in_window,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    One retention pass over every rule; returns rows moved. Does nothing outside the window, and stops early
+    (leaving the rest for the next pass) if the window closes mid-run.
+    """
+    rules = retention_rules() if rules is None else rules
+    batch_size = batch_size or settings.NOTIFY_RETENTION_BATCH
+    pause = settings.NOTIFY_RETENTION_PAUSE_MS / 1000 if pause_seconds is None else pause_seconds
+    now = now or datetime.utcnow()
+    if not window():
+        retention_progress.skipped_outside_window += 1
+        return 0
+    own_rules = [rule.type for rule in rules if rule.type is not None]
+    moved = 0
+    started = time.monotonic()
+    retention_progress.start()
+    try:
+        for rule in rules:
+            if rule.days <= 0:
+                continue
+            retention_progress.current_rule = rule.type or "*"
+            cutoff = now - timedelta(days=rule.days)
+            while True:
+                batch_started = time.perf_counter()
+                async with session_factory() as db:
+                    count = await archive_batch(db, rule, own_rules, cutoff, batch_size)
+                    await db.commit()
+                if count:
+                    retention_progress.record_batch(count, (time.perf_counter() - batch_started) * 1000)
+                    moved += count
+                if count < batch_size:
+                    break
+                if not window():
+                    retention_progress.stopped_by_window += 1
+                    return moved
+                await asyncio.sleep(pause)
+    finally:
+        retention_progress.finish(time.monotonic() - started)
+    return moved
+
+
+_retention_task: Optional[asyncio.Task] = None
+
+
+async def _retention_loop(interval: int) -> None:
+    from app.core.database import AsyncSessionLocal
+
+    while True:
+        try:
+            moved = await run_retention(AsyncSessionLocal)
+            if moved:
+                logger.info("Notifications archived", rows=moved)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            retention_progress.errors += 1
+            logger.warning("Notification retention failed", error=str(e))
+        await asyncio.sleep(interval)
+
+
+def start_retention_task() -> None:
+    """Run the retention job now and then every NOTIFY_RETENTION_INTERVAL_SECONDS (no-op when set to 0)."""
+    global _retention_task
+    interval = settings.NOTIFY_RETENTION_INTERVAL_SECONDS
+    if interval > 0 and _retention_task is None:
+        _retention_task = asyncio.create_task(_retention_loop(interval))
+
+
+async def stop_retention_task() -> None:
+    global _retention_task
+    if _retention_task is not None:
+        _retention_task.cancel()
+        try:
+            await _retention_task
+        except asyncio.CancelledError:
+            pass
+        _retention_task = None
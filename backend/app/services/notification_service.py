@@ -0,0 +1,296 @@
+"""
+Notification reads and society notices.
+A society notice is one society_notices row whatever the society's size; members see it merged with their personal
+notifications at read time, and marking it read adds one (notice, user) row to society_notice_reads.
+The inbox is read a page at a time (keyset on created_at, id) and the unread badge comes from unread_counts.
+"""
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import (
+    DateTime, String, Text, and_, case, cast, func, insert, literal, null, or_, select, union_all, update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import after_commit
+from app.models.notification import Notification, SocietyNotice, SocietyNoticeRead
+from app.models.user import User
+from app.services.unread_counts import unread_counts
+from app.utils.cursor import encode_cursor
+from app.utils.pagination import Page, keyset_after
+
+SOCIETY_NOTICE_TYPE = "society_notice"
+CATCH_UP_LIMIT = 200  # SSE resume backlog; beyond this the client is told to refetch the list
+INBOX_PAGE_SIZE = 50
+
+
+def notification_to_dict(n: Notification) -> dict:
+    """API / push shape of a personal notification (also what SSE and WebSocket clients receive)."""
+    return {
+        "id": str(n.id),
+        "type": n.type,
+        "title": n.title,
+        "body": n.body,
+        "read": n.read,
+        "extra_data": n.extra_data,
+        "created_at": n.created_at.isoformat(),
+    }
+
+
+def notice_to_dict(notice: SocietyNotice, read: bool) -> dict:
+    return {
+        "id": str(notice.id),
+        "type": SOCIETY_NOTICE_TYPE,
+        "title": notice.title,
+        "body": notice.body,
+        "read": read,
+        "extra_data": None,
+        "created_at": notice.created_at.isoformat(),
+    }
+
+
+async def create_society_notice(
+    db: AsyncSession, society_id: UUID, title: str, body: Optional[str], created_by: Optional[UUID] = None
+) -> SocietyNotice:
+    """Store a notice once for the whole society (one INSERT)."""
+    notice = SocietyNotice(society_id=society_id, title=title, body=body, created_by=created_by)
+    db.add(notice)
+    await db.flush()
+    after_commit(db, lambda: unread_counts.apply_society(society_id, 1))
+    return notice
+
+
+async def _membership(db: AsyncSession, user_id: UUID) -> Optional[tuple[UUID, datetime]]:
+    """(society_id, joined_at) for a user in a society; notices from before they joined are not theirs."""
+    row = (await db.execute(select(User.society_id, User.created_at).where(User.id == user_id))).first()
+    if row is None or row.society_id is None:
+        return None
+    return row.society_id, row.created_at
+
+
+def _notices_for(user_id: UUID, society_id: UUID, joined_at: datetime):
+    return (
+        select(SocietyNotice, SocietyNoticeRead.read_at)
+        .outerjoin(
+            SocietyNoticeRead,
+            and_(SocietyNoticeRead.notice_id == SocietyNotice.id, SocietyNoticeRead.user_id == user_id),
+        )
+        .where(SocietyNotice.society_id == society_id, SocietyNotice.created_at >= joined_at)
+    )
+
+
+def _personal_rows(user_id: UUID):
+    return select(
+        Notification.id,
+        Notification.type,
+        Notification.title,
+        Notification.body,
+        Notification.read,
+        Notification.extra_data,
+        Notification.created_at,
+    ).where(Notification.user_id == user_id)
+
+
+def _notice_rows(user_id: UUID):
+    """Society notices for user_id in the same columns as _personal_rows (membership resolved in SQL)."""
+    return (
+        select(
+            SocietyNotice.id,
+            literal(SOCIETY_NOTICE_TYPE, String).label("type"),
+            SocietyNotice.title,
+            SocietyNotice.body,
+            case((SocietyNoticeRead.user_id.is_(None), False), else_=True).label("read"),
+            cast(null(), Text).label("extra_data"),
+            SocietyNotice.created_at,
+        )
+        .join(
+            User,
+            and_(
+                User.id == user_id,
+                User.society_id == SocietyNotice.society_id,
+                SocietyNotice.created_at >= User.created_at,
+            ),
+        )
+        .outerjoin(
+            SocietyNoticeRead,
+            and_(SocietyNoticeRead.notice_id == SocietyNotice.id, SocietyNoticeRead.user_id == user_id),
+        )
+    )
+
+
+def _row_to_dict(row) -> dict:
+    return {
+        "id": str(row.id),
+        "type": row.type,
+        "title": row.title,
+        "body": row.body,
+        "read": bool(row.read),
+        "extra_data": row.extra_data,
+        "created_at": row.created_at.isoformat(),
+    }
+
+
+async def list_user_notifications_page(
+    db: AsyncSession,
+    user_id: UUID,
+    unread_only: bool = False,
+    limit: int = INBOX_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    One page of personal notifications and society notices for user_id, newest first, in one statement.
+    Each source seeks from the cursor through its own index and stops at limit + 1 rows before the merge, so a
+    page costs the same however long the inbox is. Raises ValueError on a malformed cursor.
+    """
+    personal, notices = _personal_rows(user_id), _notice_rows(user_id)
+    if unread_only:
+        personal = personal.where(Notification.read == False)  # noqa: E712
+        notices = notices.where(SocietyNoticeRead.user_id.is_(None))
+    if cursor:
+        personal = keyset_after(personal, Notification.created_at, Notification.id, cursor)
+        notices = keyset_after(notices, SocietyNotice.created_at, SocietyNotice.id, cursor)
+    sides = [
+        personal.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit + 1).subquery(),
+        notices.order_by(SocietyNotice.created_at.desc(), SocietyNotice.id.desc()).limit(limit + 1).subquery(),
+    ]
+    merged = union_all(*(select(side) for side in sides)).subquery()
+    result = await db.execute(
+        select(merged).order_by(merged.c.created_at.desc(), merged.c.id.desc()).limit(limit + 1)
+    )
+    rows = result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return Page(items=[_row_to_dict(row) for row in rows], next_cursor=next_cursor)
+
+
+async def list_user_notifications_after(
+    db: AsyncSession, user_id: UUID, after: tuple[datetime, UUID], limit: int = CATCH_UP_LIMIT
+) -> list[dict]:
+    """
+    Notifications and society notices after position `after` (created_at, id), oldest first, in one statement
+    (UNION ALL of both sources; society membership resolved in SQL). Used for SSE Last-Event-ID catch-up.
+    """
+    after_ts, after_id = after
+    personal = _personal_rows(user_id).where(
+        Notification.created_at >= after_ts,
+        or_(Notification.created_at > after_ts, Notification.id > after_id),
+    )
+    notices = _notice_rows(user_id).where(
+        SocietyNotice.created_at >= after_ts,
+        or_(SocietyNotice.created_at > after_ts, SocietyNotice.id > after_id),
+    )
+    merged = union_all(personal, notices).subquery()
+    result = await db.execute(select(merged).order_by(merged.c.created_at, merged.c.id).limit(limit))
+    return [_row_to_dict(row) for row in result.all()]
+
+
+async def count_unread(db: AsyncSession, user_id: UUID) -> tuple[Optional[UUID], int]:
+    """(society_id, unread count) for user_id from the DB in one statement; (None, 0) for an unknown user."""
+    personal = (
+        select(func.count())
+        .select_from(Notification)
+        .where(Notification.user_id == user_id, Notification.read == False)  # noqa: E712
+    )
+    notices = (
+        select(func.count(SocietyNotice.id))
+        .outerjoin(
+            SocietyNoticeRead,
+            and_(SocietyNoticeRead.notice_id == SocietyNotice.id, SocietyNoticeRead.user_id == user_id),
+        )
+        .where(
+            SocietyNotice.society_id == User.society_id,
+            SocietyNotice.created_at >= User.created_at,
+            SocietyNoticeRead.user_id.is_(None),
+        )
+    )
+    row = (
+        await db.execute(
+            select(User.society_id, personal.scalar_subquery(), notices.scalar_subquery().correlate(User))
+            .where(User.id == user_id)
+        )
+    ).first()
+    if row is None:
+        return None, 0
+    return row[0], (row[1] or 0) + (row[2] or 0)
+
+
+async def get_unread_count(db: AsyncSession, user_id: UUID) -> int:
+    """Unread badge for user_id: cache, else one counting statement."""
+    count = unread_counts.get(user_id)
+    if count is not None:
+        unread_counts.hits += 1
+        return count
+    unread_counts.misses += 1
+    society_id, count = await count_unread(db, user_id)
+    return unread_counts.set(user_id, society_id, count)
+
+
+def record_new_notification(db: AsyncSession, user_id: UUID) -> None:
+    """Count a just-added unread notification in user_id's cached badge once the transaction commits."""
+    after_commit(db, lambda: unread_counts.apply(user_id, 1))
+
+
+async def mark_notification_read(db: AsyncSession, user_id: UUID, notification_id: UUID) -> bool:
+    """Mark a personal notification or a society notice read for user_id. False if it is not theirs."""
+    result = await db.execute(
+        select(Notification).where(Notification.id == notification_id, Notification.user_id == user_id)
+    )
+    n = result.scalar_one_or_none()
+    if n is not None:
+        if not n.read:
+            n.read = True
+            await db.flush()
+            after_commit(db, lambda: unread_counts.apply(user_id, -1))
+        return True
+
+    membership = await _membership(db, user_id)
+    if membership is None:
+        return False
+    found = await db.execute(
+        _notices_for(user_id, *membership).where(SocietyNotice.id == notification_id)
+    )
+    row = found.first()
+    if row is None:
+        return False
+    if row.read_at is None:
+        try:
+            async with db.begin_nested():
+                db.add(SocietyNoticeRead(notice_id=notification_id, user_id=user_id))
+        except IntegrityError:
+            pass  # marked read concurrently (double tap / second device)
+        else:
+            after_commit(db, lambda: unread_counts.apply(user_id, -1))
+    return True
+
+
+async def mark_all_notifications_read(db: AsyncSession, user_id: UUID) -> int:
+    """
+    Mark everything in user_id's inbox read: one UPDATE over their unread personal notifications and one
+    INSERT ... SELECT of read rows for their unread society notices. Returns how many were marked.
+    """
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.read == False)  # noqa: E712
+        .values(read=True)
+        .execution_options(synchronize_session=False)
+    )
+    marked = result.rowcount or 0
+    unread_notices = (
+        _notice_rows(user_id)
+        .where(SocietyNoticeRead.user_id.is_(None))
+        .with_only_columns(SocietyNotice.id, User.id, literal(datetime.utcnow(), DateTime))
+    )
+    try:
+        async with db.begin_nested():
+            result = await db.execute(
+                insert(SocietyNoticeRead).from_select(["notice_id", "user_id", "read_at"], unread_notices)
+            )
+            marked += result.rowcount or 0
+    except IntegrityError:
+        pass  # a notice was marked read concurrently; the personal UPDATE still stands
+    after_commit(db, lambda: unread_counts.reset(user_id))
+    return marked
@@ -0,0 +1,429 @@
+"""
+Transactional outbox for outbound messages (WhatsApp invites).
+enqueue() adds a row in the caller's transaction and wakes this process's workers once it commits, so a request
+never waits on the remote service. OutboxWorkers claims due rows in short transactions (SKIP LOCKED on PostgreSQL,
+and a per-claim id so two claimers never both own a row), sends them on OUTBOX_WORKERS concurrent senders, and
+records each outcome: sent, retried after an exponential backoff with jitter, or dead-lettered (status dead) once
+OUTBOX_MAX_ATTEMPTS is reached or the server rejects the message outright. While the target's circuit is open
+(app.core.outbound) rows are deferred without using up attempts, so an outage does not dead-letter invites.
+A worker that dies mid-send leaves a SENDING row whose lease expires, after which any worker claims it again.
+Invite rows hold only the contact and the visit id: the OTP and QR link are read from the visit when the message is
+sent, so pass credentials are never stored here. SENT and dead rows are purged after OUTBOX_RETENTION_DAYS.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from uuid import UUID, uuid4
+
+import structlog
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, after_commit
+from app.core.tasks import TaskRegistry, background_tasks
+from app.models.outbox import OutboxMessage, OutboxStatus
+from app.models.visitor import Visit, VisitStatus
+from app.services.waha_service import DeliveryError, invite_message, waha_client, waha_enabled
+
+logger = structlog.get_logger()
+
+WHATSAPP = "whatsapp"
+WHATSAPP_INVITE = "whatsapp_invite"  # rendered from the visit at send time
+LATENCY_SAMPLES = 1000
+PURGE_BATCH = 500
+INVITE_STATUSES = (VisitStatus.PENDING, VisitStatus.APPROVED)  # the pass can still be used
+
+Sender = Callable[[dict], Awaitable[None]]
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry number `attempts`: doubling from OUTBOX_BACKOFF_BASE_SECONDS, capped, 50-100% jitter."""
+    delay = settings.OUTBOX_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return min(delay, settings.OUTBOX_BACKOFF_MAX_SECONDS) * random.uniform(0.5, 1.0)
+
+
+@dataclass
+class ClaimedMessage:
+    id: UUID
+    claim_id: UUID
+    channel: str
+    payload: dict
+    attempts: int  # including this one
+
+
+class OutboxWorkers:
+    """One claimer plus `workers` senders per process, fed through an in-memory queue of claimed rows."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        senders: dict[str, Sender],
+        tasks: TaskRegistry,
+        workers: int,
+        batch: int,
+        poll_seconds: float,
+        lease_seconds: int,
+        max_attempts: int,
+    ) -> None:
+        self._session_factory = session_factory
+        self._senders = senders
+        self._tasks = tasks
+        self.workers = max(1, workers)
+        self.batch = max(1, batch)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._queue: asyncio.Queue[ClaimedMessage] = asyncio.Queue()
+        self._wake = asyncio.Event()
+        self._claimer: Optional[asyncio.Task] = None
+        self._sender_tasks: list[asyncio.Task] = []
+        self.in_flight = 0
+        self.claimed = 0
+        self.sent = 0
+        self.retried = 0
+        self.deferred = 0  # not attempted: the target's circuit was open
+        self.dead = 0
+        self.errors = 0  # claim/record failures (rows are recovered by lease expiry)
+        self.purged = 0
+        self.latency_ms: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    @property
+    def running(self) -> bool:
+        return self._claimer is not None
+
+    def wake(self) -> None:
+        """Rows were committed: claim now instead of at the next poll."""
+        self._wake.set()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._claimer = self._tasks.spawn(self._claim_loop(), name="outbox-claimer")
+        self._sender_tasks = [
+            self._tasks.spawn(self._send_loop(), name=f"outbox-sender-{i}") for i in range(self.workers)
+        ]
+
+    async def _claim_loop(self) -> None:
+        while True:
+            self._wake.clear()
+            room = self.batch - self._queue.qsize()
+            if room > 0:
+                try:
+                    await self.claim(room)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning("Outbox claim failed", error=str(e))
+            # Woken by commits and by senders draining the queue; the poll picks up retries and other workers' rows
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self, limit: int) -> int:
+        """Claim up to limit due rows (oldest first) and queue them for the senders. Returns how many."""
+        now = datetime.utcnow()
+        claim_id = uuid4()
+        due = or_(
+            and_(OutboxMessage.status == OutboxStatus.PENDING.value, OutboxMessage.next_attempt_at <= now),
+            and_(OutboxMessage.status == OutboxStatus.SENDING.value, OutboxMessage.lease_until < now),
+        )
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(OutboxMessage.id)
+                .where(due)
+                .order_by(OutboxMessage.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                return 0
+            await db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids), due)
+                .values(
+                    status=OutboxStatus.SENDING.value,
+                    claim_id=claim_id,
+                    lease_until=now + timedelta(seconds=self.lease_seconds),
+                    attempts=OutboxMessage.attempts + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            rows = (
+                await db.execute(
+                    select(OutboxMessage.id, OutboxMessage.channel, OutboxMessage.payload, OutboxMessage.attempts)
+                    .where(OutboxMessage.claim_id == claim_id)
+                )
+            ).all()
+            await db.commit()
+        for row in rows:
+            self._queue.put_nowait(ClaimedMessage(row.id, claim_id, row.channel, json.loads(row.payload), row.attempts))
+        self.claimed += len(rows)
+        return len(rows)
+
+    async def _send_loop(self) -> None:
+        while True:
+            message = await self._queue.get()
+            if self._queue.qsize() <= self.batch // 2:
+                self._wake.set()
+            self.in_flight += 1
+            try:
+                await self.deliver(message)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Outbox delivery could not be recorded", id=str(message.id), error=str(e))
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    async def deliver(self, message: ClaimedMessage) -> None:
+        """Send one claimed message and record the outcome."""
+        started = time.perf_counter()
+        error: Optional[str] = None
+        retryable, attempted = True, True
+        sender = self._senders.get(message.channel)
+        try:
+            if sender is None:
+                raise DeliveryError(f"No sender for channel {message.channel}", retryable=False)
+            await sender(message.payload)
+        except DeliveryError as e:
+            error, retryable, attempted = str(e), e.retryable, e.attempted
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if attempted:
+            self.latency_ms.append((time.perf_counter() - started) * 1000)
+        await self._record(message, error, retryable, attempted)
+
+    async def _record(self, message: ClaimedMessage, error: Optional[str], retryable: bool, attempted: bool) -> None:
+        now = datetime.utcnow()
+        values: dict = {"claim_id": None, "lease_until": None, "last_error": error}
+        if error is None:
+            values.update(status=OutboxStatus.SENT.value, sent_at=now)
+        elif not attempted:
+            # Target known to be down (circuit open): try again later without using up an attempt
+            values.update(
+                status=OutboxStatus.PENDING.value,
+                attempts=OutboxMessage.attempts - 1,
+                next_attempt_at=now + timedelta(seconds=backoff_seconds(1)),
+            )
+        elif retryable and message.attempts < self.max_attempts:
+            values.update(
+                status=OutboxStatus.PENDING.value,
+                next_attempt_at=now + timedelta(seconds=backoff_seconds(message.attempts)),
+            )
+        else:
+            values.update(status=OutboxStatus.DEAD.value)
+        async with self._session_factory() as db:
+            # Only while this claim still owns the row (an expired lease may have handed it to another worker)
+            await db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message.id, OutboxMessage.claim_id == message.claim_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if error is None:
+            self.sent += 1
+        elif not attempted:
+            self.deferred += 1
+        elif values["status"] == OutboxStatus.PENDING.value:
+            self.retried += 1
+            logger.info("Outbox send failed; will retry", id=str(message.id), attempts=message.attempts, error=error)
+        else:
+            self.dead += 1
+            logger.warning("Outbox message dead-lettered", id=str(message.id), attempts=message.attempts, error=error)
+
+    async def stop(self, timeout: float) -> None:
+        """Stop claiming, let queued sends finish (up to timeout), then release what never started."""
+        if not self.running:
+            return
+        self._claimer.cancel()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in [self._claimer, *self._sender_tasks]:
+            task.cancel()
+        await asyncio.gather(self._claimer, *self._sender_tasks, return_exceptions=True)
+        self._claimer, self._sender_tasks = None, []
+        unsent = []
+        while not self._queue.empty():
+            unsent.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if unsent:
+            await self._release(unsent)
+
+    async def _release(self, messages: list[ClaimedMessage]) -> None:
+        """Hand never-started claims back (the attempt is not counted)."""
+        try:
+            async with self._session_factory() as db:
+                for message in messages:
+                    await db.execute(
+                        update(OutboxMessage)
+                        .where(OutboxMessage.id == message.id, OutboxMessage.claim_id == message.claim_id)
+                        .values(
+                            status=OutboxStatus.PENDING.value,
+                            claim_id=None,
+                            lease_until=None,
+                            attempts=OutboxMessage.attempts - 1,
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.warning("Outbox claims not released at shutdown; leases will expire", error=str(e))
+
+    async def purge(self, retention_days: int, now: Optional[datetime] = None) -> int:
+        """
+        Delete SENT and dead rows older than retention_days, PURGE_BATCH per transaction. Returns rows deleted.
+        Age is next_attempt_at (the last time the row was due), so the status/next_attempt_at index serves it.
+        """
+        if retention_days <= 0:
+            return 0
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        done = (OutboxStatus.SENT.value, OutboxStatus.DEAD.value)
+        deleted = 0
+        while True:
+            async with self._session_factory() as db:
+                ids = (
+                    await db.execute(
+                        select(OutboxMessage.id)
+                        .where(OutboxMessage.status.in_(done), OutboxMessage.next_attempt_at < cutoff)
+                        .limit(PURGE_BATCH)
+                        .with_for_update(skip_locked=True)
+                    )
+                ).scalars().all()
+                if ids:
+                    await db.execute(
+                        delete(OutboxMessage)
+                        .where(OutboxMessage.id.in_(ids))
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            deleted += len(ids)
+            self.purged += len(ids)
+            if len(ids) < PURGE_BATCH:
+                return deleted
+
+    def stats(self) -> dict:
+        ordered = sorted(self.latency_ms)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "in_flight": self.in_flight,
+            "claimed": self.claimed,
+            "sent": self.sent,
+            "retried": self.retried,
+            "deferred": self.deferred,
+            "dead": self.dead,
+            "errors": self.errors,
+            "purged": self.purged,
+            "send_p50_ms": pct(50),
+            "send_p99_ms": pct(99),
+        }
+
+
+def invite_sender(session_factory: Callable[[], AsyncSession], send_text: Sender) -> Sender:
+    """Sender for invite rows: renders the invite from the visit's current pass, then sends it with send_text."""
+
+    async def send(payload: dict) -> None:
+        async with session_factory() as db:
+            visit = (
+                await db.execute(
+                    select(Visit.status, Visit.otp, Visit.qr_code).where(Visit.id == UUID(payload["visit_id"]))
+                )
+            ).one_or_none()
+        if visit is None or visit.status not in INVITE_STATUSES:
+            status = visit.status.value if visit is not None else "missing"
+            raise DeliveryError(f"Visit {status}; invite not sent", retryable=False)
+        await send_text(invite_message(payload["phone"], payload["visitor_name"], visit.otp or "", visit.qr_code))
+
+    return send
+
+
+outbox_workers = OutboxWorkers(
+    session_factory=AsyncSessionLocal,
+    senders={WHATSAPP: waha_client.send_text, WHATSAPP_INVITE: invite_sender(AsyncSessionLocal, waha_client.send_text)},
+    tasks=background_tasks,
+    workers=settings.OUTBOX_WORKERS,
+    batch=settings.OUTBOX_CLAIM_BATCH,
+    poll_seconds=settings.OUTBOX_POLL_SECONDS,
+    lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+)
+
+
+def enqueue(db: AsyncSession, channel: str, payload: dict, visit_id: Optional[UUID] = None) -> OutboxMessage:
+    """Queue a message in db's transaction; this process's workers are woken once it commits."""
+    message = OutboxMessage(channel=channel, payload=json.dumps(payload), visit_id=visit_id)
+    db.add(message)
+    after_commit(db, outbox_workers.wake)
+    return message
+
+
+def enqueue_whatsapp_invite(
+    db: AsyncSession, visit_id: UUID, phone: str, visitor_name: str
+) -> Optional[OutboxMessage]:
+    """
+    Queue the visitor's WhatsApp invite with the visit (None when WAHA is not configured). The OTP and QR link
+    are read from the visit when it is sent.
+    """
+    if not waha_enabled():
+        return None
+    payload = {"visit_id": str(visit_id), "phone": phone, "visitor_name": visitor_name}
+    return enqueue(db, WHATSAPP_INVITE, payload, visit_id=visit_id)
+
+
+_purge_task: Optional[asyncio.Task] = None
+
+
+async def _purge_loop(interval: int) -> None:
+    while True:
+        try:
+            deleted = await outbox_workers.purge(settings.OUTBOX_RETENTION_DAYS)
+            if deleted:
+                logger.info("Outbox rows purged", rows=deleted)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outbox_workers.errors += 1
+            logger.warning("Outbox purge failed", error=str(e))
+        await asyncio.sleep(interval)
+
+
+def start_outbox_workers() -> None:
+    """
+    Start this process's outbox workers (no-op while no channel is configured, i.e. WAHA_API_URL unset) and the
+    purge of finished rows (every OUTBOX_RETENTION_INTERVAL_SECONDS; 0 disables it).
+    """
+    global _purge_task
+    if waha_enabled():
+        outbox_workers.start()
+    interval = settings.OUTBOX_RETENTION_INTERVAL_SECONDS
+    if interval > 0 and settings.OUTBOX_RETENTION_DAYS > 0 and _purge_task is None:
+        _purge_task = asyncio.create_task(_purge_loop(interval))
+
+
+async def stop_outbox_workers() -> None:
+    global _purge_task
+    if _purge_task is not None:
+        _purge_task.cancel()
+        try:
+            await _purge_task
+        except asyncio.CancelledError:
+            pass
+        _purge_task = None
+    await outbox_workers.stop(settings.SHUTDOWN_DRAIN_SECONDS)
@@ -0,0 +1,234 @@
+"""
+Process-local index of live visitor passes (OTP / QR -> compact record).
+Guard scans resolve here instead of filtering the visits table; expired passes are evicted by a timer wheel.
+Loaded lazily on first scan; kept in sync by visit_service after each commit.
+OTPs are only unique within a society, so the OTP map is keyed by (society_id, otp).
+"""
+import asyncio
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Hashable, Optional
+from uuid import UUID
+
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.visitor import Visit, VisitStatus
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Statuses for which an OTP/QR pass can still be scanned at the gate
+LIVE_PASS_STATUSES = (VisitStatus.PENDING, VisitStatus.APPROVED)
+
+
+@dataclass(frozen=True)
+class PassRecord:
+    """Compact view of a scannable visit: enough for the gate to decide without loading the Visit."""
+    visit_id: UUID
+    host_id: UUID
+    society_id: Optional[UUID]
+    status: VisitStatus
+    expires_at: datetime
+    otp: Optional[str] = None
+    qr_code: Optional[str] = None
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: O(1) schedule/cancel, expiry work proportional to elapsed ticks.
+    Keys whose deadline is more than one rotation away stay in their slot until due.
+    """
+
+    def __init__(self, tick_seconds: int = 30, size: int = 128):
+        self._tick_seconds = tick_seconds
+        self._size = size
+        self._slots: list[dict[Hashable, int]] = [{} for _ in range(size)]
+        self._slot_of: dict[Hashable, int] = {}
+        self._current: Optional[int] = None
+
+    def _tick(self, when: datetime) -> int:
+        return int((when - _EPOCH).total_seconds()) // self._tick_seconds
+
+    def schedule(self, key: Hashable, when: datetime) -> None:
+        """(Re)schedule key to expire at `when` (naive UTC)."""
+        self.cancel(key)
+        deadline = self._tick(when) + 1  # fire on the first tick strictly after `when`
+        slot = deadline % self._size
+        self._slots[slot][key] = deadline
+        self._slot_of[key] = slot
+
+    def cancel(self, key: Hashable) -> None:
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self._slots[slot].pop(key, None)
+
+    def advance(self, now: datetime) -> list[Hashable]:
+        """Move the wheel to `now` and return keys whose deadline has passed."""
+        now_tick = self._tick(now)
+        if self._current is None:
+            self._current = now_tick - 1
+        if now_tick <= self._current:
+            return []
+        expired: list[Hashable] = []
+        # A gap longer than one rotation only needs one pass over every slot
+        start = max(self._current + 1, now_tick - self._size + 1)
+        for t in range(start, now_tick + 1):
+            slot = self._slots[t % self._size]
+            due = [k for k, deadline in slot.items() if deadline <= now_tick]
+            for k in due:
+                del slot[k]
+                del self._slot_of[k]
+            expired.extend(due)
+        self._current = now_tick
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+
+class PassIndex:
+    """Expiring hash maps (society, OTP) -> PassRecord and QR -> PassRecord for live (pending/approved) passes."""
+
+    def __init__(self) -> None:
+        self._by_visit: dict[UUID, PassRecord] = {}
+        self._by_otp: dict[tuple[Optional[UUID], str], PassRecord] = {}
+        self._by_qr: dict[str, PassRecord] = {}
+        # OTPs handed out by allocate_otp but not yet committed: (society_id, otp) -> hold-until
+        self._reserved: dict[tuple[Optional[UUID], str], datetime] = {}
+        self._wheel = TimerWheel()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Load every live pass with one column-only query the first time the index is used."""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            now = datetime.utcnow()
+            result = await db.execute(
+                select(
+                    Visit.id,
+                    Visit.host_id,
+                    Visit.society_id,
+                    Visit.status,
+                    Visit.otp_expires_at,
+                    Visit.otp,
+                    Visit.qr_code,
+                )
+                .where(
+                    and_(
+                        Visit.otp_expires_at > now,
+                        Visit.status.in_(LIVE_PASS_STATUSES),
+                    )
+                )
+            )
+            for row in result.all():
+                self.put(PassRecord(
+                    visit_id=row.id,
+                    host_id=row.host_id,
+                    society_id=row.society_id,
+                    status=row.status,
+                    expires_at=row.otp_expires_at,
+                    otp=row.otp,
+                    qr_code=row.qr_code,
+                ))
+            self._loaded = True
+
+    def put(self, record: PassRecord) -> None:
+        """Insert or replace the pass for record.visit_id."""
+        self.discard(record.visit_id)
+        if record.status not in LIVE_PASS_STATUSES or not (record.otp or record.qr_code):
+            return
+        self._by_visit[record.visit_id] = record
+        if record.otp:
+            key = (record.society_id, record.otp)
+            self._by_otp[key] = record
+            self._reserved.pop(key, None)
+        if record.qr_code:
+            self._by_qr[record.qr_code] = record
+        self._wheel.schedule(record.visit_id, record.expires_at)
+
+    def set_status(self, visit_id: UUID, status: VisitStatus) -> None:
+        """Update a pass after a state transition; passes leaving pending/approved are dropped."""
+        record = self._by_visit.get(visit_id)
+        if record is not None:
+            self.put(replace(record, status=status))
+
+    def discard(self, visit_id: UUID) -> None:
+        record = self._by_visit.pop(visit_id, None)
+        if record is None:
+            return
+        key = (record.society_id, record.otp)
+        if record.otp and self._by_otp.get(key) is record:
+            del self._by_otp[key]
+        if record.qr_code and self._by_qr.get(record.qr_code) is record:
+            del self._by_qr[record.qr_code]
+        self._wheel.cancel(visit_id)
+
+    def _evict_expired(self, now: datetime) -> None:
+        for visit_id in self._wheel.advance(now):
+            self.discard(visit_id)
+
+    def _lookup(self, table: dict, code) -> Optional[PassRecord]:
+        now = datetime.utcnow()
+        self._evict_expired(now)
+        record = table.get(code)
+        if record is None or record.expires_at <= now:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def lookup_otp(self, society_id: Optional[UUID], otp: str) -> Optional[PassRecord]:
+        return self._lookup(self._by_otp, (society_id, otp))
+
+    def lookup_qr(self, qr_code: str) -> Optional[PassRecord]:
+        return self._lookup(self._by_qr, qr_code)
+
+    def otp_in_use(self, society_id: Optional[UUID], otp: str) -> bool:
+        """True if a live pass or an uncommitted reservation in this society holds the OTP."""
+        now = datetime.utcnow()
+        key = (society_id, otp)
+        held_until = self._reserved.get(key)
+        if held_until is not None:
+            if held_until > now:
+                return True
+            del self._reserved[key]
+        record = self._by_otp.get(key)
+        return record is not None and record.expires_at > now
+
+    def reserve_otp(self, society_id: Optional[UUID], otp: str, until: datetime) -> None:
+        """Hold an OTP for a pass being created so concurrent allocations in this process skip it."""
+        self._reserved[(society_id, otp)] = until
+
+    def release_otp(self, society_id: Optional[UUID], otp: str) -> None:
+        """The pass an OTP was reserved for was rolled back: the code is free again."""
+        self._reserved.pop((society_id, otp), None)
+
+    def clear(self) -> None:
+        """Drop everything; next use reloads from the DB."""
+        self._by_visit.clear()
+        self._by_otp.clear()
+        self._by_qr.clear()
+        self._reserved.clear()
+        self._wheel = TimerWheel()
+        self._loaded = False
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "passes": len(self._by_visit),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+pass_index = PassIndex()
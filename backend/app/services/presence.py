@@ -0,0 +1,443 @@
+"""
+Per-worker presence registry: who is inside each society right now, by building.
+checkin_visit / checkout_visit record changes after commit (record_check_in / record_check_out): the local registry
+is updated and the change is broadcast to every other worker over the notification backplane, so occupancy and
+"is this visitor inside" are dict reads over the whole society. It is also rebuilt from checked-in visits at
+startup and every PRESENCE_REBUILD_SECONDS, which repairs anything the (at-most-once) backplane lost. The
+emergency muster list is not served from here; it reads visits.
+Crossing a PRESENCE_CAPACITY_THRESHOLDS percentage of societies.max_occupancy (either way) emits a CapacityEvent to
+registered listeners, only on the worker that committed the change: it is logged and pushed to the society's guards
+and committee. Other workers apply the change silently.
+"""
+import asyncio
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+from uuid import UUID
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.notification_ws import on_sync, publish_event, publish_sync, role_room
+from app.core.roles import ROLE_GUARD, SOCIETY_ADMIN_ROLES
+from app.models.society import Society
+from app.models.user import User
+from app.models.visitor import Visit, Visitor, VisitStatus
+
+logger = structlog.get_logger()
+
+RECENT_EVENTS = 100
+PRESENCE_SYNC_EVENT = "presence_sync"
+WORKER_ID = uuid.uuid4().hex  # tells this worker's own broadcasts apart when they come back
+
+
+@dataclass(frozen=True)
+class PresenceEntry:
+    """One checked-in visit: enough for occupancy and the muster list without loading the Visit."""
+    visit_id: UUID
+    visitor_id: UUID
+    society_id: UUID
+    building_id: Optional[UUID]
+    visitor_name: str
+    visitor_phone: str
+    host_name: str
+    purpose: str
+    checked_in_at: Optional[datetime]
+
+    def as_sync(self) -> dict:
+        return {
+            "visit_id": str(self.visit_id),
+            "visitor_id": str(self.visitor_id),
+            "society_id": str(self.society_id),
+            "building_id": str(self.building_id) if self.building_id else None,
+            "visitor_name": self.visitor_name,
+            "visitor_phone": self.visitor_phone,
+            "host_name": self.host_name,
+            "purpose": self.purpose,
+            "checked_in_at": self.checked_in_at.isoformat() if self.checked_in_at else None,
+        }
+
+    @classmethod
+    def from_sync(cls, data: dict) -> "PresenceEntry":
+        return cls(
+            visit_id=UUID(data["visit_id"]),
+            visitor_id=UUID(data["visitor_id"]),
+            society_id=UUID(data["society_id"]),
+            building_id=UUID(data["building_id"]) if data.get("building_id") else None,
+            visitor_name=data["visitor_name"],
+            visitor_phone=data["visitor_phone"],
+            host_name=data["host_name"],
+            purpose=data["purpose"],
+            checked_in_at=datetime.fromisoformat(data["checked_in_at"]) if data.get("checked_in_at") else None,
+        )
+
+    def as_muster_row(self) -> dict:
+        return {
+            "visitor_name": self.visitor_name,
+            "visitor_phone": self.visitor_phone,
+            "host_name": self.host_name,
+            "purpose": self.purpose,
+            "checkin_time": self.checked_in_at.isoformat() if self.checked_in_at else "",
+        }
+
+
+@dataclass(frozen=True)
+class CapacityEvent:
+    society_id: UUID
+    occupancy: int
+    capacity: int
+    threshold: int  # percent crossed
+    direction: str  # "above" or "below"
+    at: datetime = field(default_factory=datetime.utcnow)
+
+    def as_dict(self) -> dict:
+        return {
+            "event": "capacity_threshold",
+            "society_id": str(self.society_id),
+            "occupancy": self.occupancy,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "direction": self.direction,
+            "at": self.at.isoformat(),
+        }
+
+
+def _thresholds() -> list[int]:
+    values = []
+    for part in settings.PRESENCE_CAPACITY_THRESHOLDS.split(","):
+        part = part.strip()
+        if part.isdigit() and int(part) > 0:
+            values.append(int(part))
+    return sorted(set(values))
+
+
+class PresenceRegistry:
+    """society -> checked-in visits (check-in order), with per-building and per-visitor counts."""
+
+    def __init__(self) -> None:
+        self._by_visit: dict[UUID, PresenceEntry] = {}
+        self._by_society: dict[UUID, dict[UUID, PresenceEntry]] = {}
+        self._by_building: dict[tuple[UUID, Optional[UUID]], int] = {}
+        self._visitors: dict[tuple[UUID, UUID], int] = {}
+        self._capacity: dict[UUID, int] = {}
+        self._levels: dict[UUID, int] = {}  # highest threshold currently reached per society
+        self._listeners: list[Callable[[CapacityEvent], None]] = []
+        self._replay: Optional[list[tuple[str, object]]] = None  # changes committed while a rebuild query runs
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self.recent_events: deque[CapacityEvent] = deque(maxlen=RECENT_EVENTS)
+        self.rebuilds = 0
+        self.events = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    # --- reads (O(1) except muster, which is O(people inside)) ---
+
+    def occupancy(self, society_id: UUID) -> int:
+        return len(self._by_society.get(society_id, ()))
+
+    def building_occupancy(self, society_id: UUID) -> dict[Optional[UUID], int]:
+        return {b: n for (s, b), n in self._by_building.items() if s == society_id}
+
+    def capacity(self, society_id: UUID) -> Optional[int]:
+        return self._capacity.get(society_id)
+
+    def is_inside(self, society_id: UUID, visitor_id: UUID) -> bool:
+        return self._visitors.get((society_id, visitor_id), 0) > 0
+
+    def muster(self, society_id: UUID) -> list[PresenceEntry]:
+        """Everyone inside, most recent check-in first."""
+        return list(reversed(self._by_society.get(society_id, {}).values()))
+
+    def entries(self) -> list[PresenceEntry]:
+        return list(self._by_visit.values())
+
+    def events_for(self, society_id: UUID) -> list[CapacityEvent]:
+        return [e for e in self.recent_events if e.society_id == society_id]
+
+    # --- writes (called after commit) ---
+
+    def check_in(self, entry: PresenceEntry, announce: bool = True) -> None:
+        """announce=False for changes another worker committed (and announces): levels follow without events."""
+        if self._replay is not None:
+            self._replay.append(("in", entry))
+        self._add(entry)
+        self._evaluate(entry.society_id, announce)
+
+    def check_out(self, visit_id: UUID, announce: bool = True) -> None:
+        if self._replay is not None:
+            self._replay.append(("out", visit_id))
+        entry = self._remove(visit_id)
+        if entry is not None:
+            self._evaluate(entry.society_id, announce)
+
+    def set_capacity(self, society_id: UUID, capacity: Optional[int], announce: bool = True) -> None:
+        if capacity:
+            self._capacity[society_id] = capacity
+        else:
+            self._capacity.pop(society_id, None)
+        self._evaluate(society_id, announce)
+
+    def subscribe(self, listener: Callable[[CapacityEvent], None]) -> None:
+        """Call listener(event) on every capacity threshold crossing (from the committing request's task)."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _add(self, entry: PresenceEntry) -> None:
+        self._remove(entry.visit_id)
+        self._by_visit[entry.visit_id] = entry
+        self._by_society.setdefault(entry.society_id, {})[entry.visit_id] = entry
+        key = (entry.society_id, entry.building_id)
+        self._by_building[key] = self._by_building.get(key, 0) + 1
+        vkey = (entry.society_id, entry.visitor_id)
+        self._visitors[vkey] = self._visitors.get(vkey, 0) + 1
+
+    def _remove(self, visit_id: UUID) -> Optional[PresenceEntry]:
+        entry = self._by_visit.pop(visit_id, None)
+        if entry is None:
+            return None
+        inside = self._by_society.get(entry.society_id)
+        if inside is not None:
+            inside.pop(visit_id, None)
+            if not inside:
+                del self._by_society[entry.society_id]
+        for table, key in (
+            (self._by_building, (entry.society_id, entry.building_id)),
+            (self._visitors, (entry.society_id, entry.visitor_id)),
+        ):
+            remaining = table.get(key, 0) - 1
+            if remaining > 0:
+                table[key] = remaining
+            else:
+                table.pop(key, None)
+        return entry
+
+    def _level(self, society_id: UUID) -> int:
+        capacity = self._capacity.get(society_id)
+        if not capacity:
+            return 0
+        occupancy = self.occupancy(society_id)
+        reached = [t for t in _thresholds() if occupancy * 100 >= t * capacity]
+        return reached[-1] if reached else 0
+
+    def _evaluate(self, society_id: UUID, announce: bool = True) -> None:
+        """
+        Record one event per threshold crossed since the last change (up to the new level, or down from the old);
+        listeners hear about it only when announce is set.
+        """
+        old = self._levels.get(society_id, 0)
+        new = self._level(society_id)
+        if new == old:
+            return
+        self._levels[society_id] = new
+        if new > old:
+            crossed = [t for t in _thresholds() if old < t <= new]
+            direction = "above"
+        else:
+            crossed = [t for t in reversed(_thresholds()) if new < t <= old]
+            direction = "below"
+        for threshold in crossed:
+            event = CapacityEvent(
+                society_id=society_id,
+                occupancy=self.occupancy(society_id),
+                capacity=self._capacity.get(society_id, 0),
+                threshold=threshold,
+                direction=direction,
+            )
+            self.events += 1
+            self.recent_events.append(event)
+            if not announce:
+                continue
+            for listener in list(self._listeners):
+                try:
+                    listener(event)
+                except Exception as e:
+                    logger.warning("Capacity event listener failed", error=str(e))
+
+    # --- rebuild ---
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """
+        Replace the registry with every checked-in visit (one joined column query) and society capacities.
+        Check-ins/outs committed while the query runs are replayed on top. Levels are reset without events,
+        so a restart does not re-announce thresholds that were already crossed.
+        """
+        async with self._load_lock:
+            self._replay = []
+            try:
+                rows = (await db.execute(
+                    select(
+                        Visit.id,
+                        Visit.visitor_id,
+                        Visit.society_id,
+                        User.building_id,
+                        Visitor.full_name.label("visitor_name"),
+                        Visitor.phone,
+                        User.full_name.label("host_name"),
+                        Visit.purpose,
+                        Visit.actual_arrival,
+                    )
+                    .join(Visitor, Visit.visitor_id == Visitor.id)
+                    .outerjoin(User, Visit.host_id == User.id)
+                    .where(Visit.status == VisitStatus.CHECKED_IN, Visit.society_id.is_not(None))
+                    .order_by(Visit.actual_arrival)
+                )).all()
+                capacities = (await db.execute(
+                    select(Society.id, Society.max_occupancy).where(Society.max_occupancy > 0)
+                )).all()
+            except Exception:
+                self._replay = None
+                raise
+            replay, self._replay = self._replay, None
+            self._by_visit.clear()
+            self._by_society.clear()
+            self._by_building.clear()
+            self._visitors.clear()
+            self._capacity = {row.id: row.max_occupancy for row in capacities}
+            for row in rows:
+                self._add(PresenceEntry(
+                    visit_id=row.id,
+                    visitor_id=row.visitor_id,
+                    society_id=row.society_id,
+                    building_id=row.building_id,
+                    visitor_name=row.visitor_name,
+                    visitor_phone=row.phone,
+                    host_name=row.host_name or "",
+                    purpose=row.purpose or "",
+                    checked_in_at=row.actual_arrival,
+                ))
+            for op, arg in replay:
+                if op == "in":
+                    self._add(arg)
+                else:
+                    self._remove(arg)
+            self._levels = {sid: self._level(sid) for sid in self._capacity}
+            self._loaded = True
+            self.rebuilds += 1
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self._loaded:
+            await self.rebuild(db)
+
+    def clear(self) -> None:
+        """Drop everything; next use rebuilds from the DB. Listeners stay subscribed."""
+        self._by_visit.clear()
+        self._by_society.clear()
+        self._by_building.clear()
+        self._visitors.clear()
+        self._capacity.clear()
+        self._levels.clear()
+        self.recent_events.clear()
+        self._loaded = False
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "inside": len(self._by_visit),
+            "societies": len(self._by_society),
+            "rebuilds": self.rebuilds,
+            "capacity_events": self.events,
+        }
+
+
+presence_registry = PresenceRegistry()
+
+
+def _log_capacity_event(event: CapacityEvent) -> None:
+    details = event.as_dict()
+    details.pop("event")  # structlog's own positional argument
+    logger.warning("Society occupancy threshold crossed", **details)
+
+
+def _push_capacity_event(event: CapacityEvent) -> None:
+    """Tell the society's guards and committee (their role rooms) as it happens."""
+    rooms = [role_room(event.society_id, role) for role in (ROLE_GUARD, *SOCIETY_ADMIN_ROLES)]
+    publish_event(rooms, "capacity_threshold", event.as_dict())
+
+
+presence_registry.subscribe(_log_capacity_event)
+presence_registry.subscribe(_push_capacity_event)
+
+
+# --- cross-worker sync (call these after commit instead of the registry methods) ---
+
+def record_check_in(entry: PresenceEntry) -> None:
+    presence_registry.check_in(entry)
+    publish_sync(PRESENCE_SYNC_EVENT, {"origin": WORKER_ID, "op": "in", "entry": entry.as_sync()})
+
+
+def record_check_out(visit_id: UUID) -> None:
+    presence_registry.check_out(visit_id)
+    publish_sync(PRESENCE_SYNC_EVENT, {"origin": WORKER_ID, "op": "out", "visit_id": str(visit_id)})
+
+
+def record_capacity(society_id: UUID, capacity: Optional[int]) -> None:
+    presence_registry.set_capacity(society_id, capacity)
+    publish_sync(
+        PRESENCE_SYNC_EVENT,
+        {"origin": WORKER_ID, "op": "capacity", "society_id": str(society_id), "capacity": capacity},
+    )
+
+
+def apply_sync(payload: dict) -> None:
+    """Backplane handler: apply another worker's committed change (our own were applied when recorded)."""
+    if payload.get("origin") == WORKER_ID:
+        return
+    op = payload.get("op")
+    if op == "in":
+        presence_registry.check_in(PresenceEntry.from_sync(payload["entry"]), announce=False)
+    elif op == "out":
+        presence_registry.check_out(UUID(payload["visit_id"]), announce=False)
+    elif op == "capacity":
+        presence_registry.set_capacity(UUID(payload["society_id"]), payload.get("capacity"), announce=False)
+
+
+on_sync(PRESENCE_SYNC_EVENT, apply_sync)
+
+
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+async def _rebuild_loop(interval: int) -> None:
+    from app.core.database import AsyncSessionLocal
+    from app.services.presence_journal import presence_journal
+
+    while True:
+        try:
+            since = await asyncio.to_thread(presence_journal.position) if presence_journal.is_open else None
+            async with AsyncSessionLocal() as db:
+                await presence_registry.rebuild(db)
+            if since is not None:
+                # The DB is authoritative: re-snapshot the journal (also its periodic compaction), off the loop
+                await asyncio.to_thread(presence_journal.snapshot, presence_registry.entries(), since)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Presence rebuild failed", error=str(e))
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+
+
+def start_rebuild_task() -> None:
+    """Build the registry (and re-snapshot the journal) now and then every PRESENCE_REBUILD_SECONDS (once if 0)."""
+    global _rebuild_task
+    if _rebuild_task is None:
+        _rebuild_task = asyncio.create_task(_rebuild_loop(settings.PRESENCE_REBUILD_SECONDS))
+
+
+async def stop_rebuild_task() -> None:
+    global _rebuild_task
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
+        try:
+            await _rebuild_task
+        except asyncio.CancelledError:
+            pass
+        _rebuild_task = None
@@ -0,0 +1,465 @@
+"""
+Local append-only presence journal, so the muster can be served when the database is down or slow.
+Every committed check-in / check-out is appended to a memory-mapped file next to the app; workers on the same
+host share it (appends are serialised with flock). When the file passes PRESENCE_JOURNAL_COMPACT_BYTES it is
+rewritten as a snapshot of who is inside, and the presence rebuild re-snapshots it from the DB, so replay only
+ever reads roughly one record per person inside plus recent traffic.
+
+Layout (big-endian):
+  header, 64 bytes: magic "VPJ1" | version u16 | flags u16 | end offset u64 | generation u64
+  record:           op u8 (1 in, 2 out) | payload length u16 | visit_id 16B | society_id 16B | payload
+The check-in payload is the compact JSON of the PresenceEntry display fields; it is only decoded for the muster.
+A compaction sets FLAG_SUPERSEDED in the old file before replacing it, so other workers reopen.
+Commit hooks never touch the file: journal_check_in/out queue the append for one writer thread per process, which
+applies them in commit order and calls sync() (msync of the mapping) each time its queue drains, so a host or power
+loss costs at most the appends still queued. Compaction fsyncs the new file and its directory before the swap.
+flock, msync and compaction block that thread, not the event loop.
+"""
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+from uuid import UUID
+
+import structlog
+
+from app.core.config import settings
+from app.services.presence import PresenceEntry
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking; run a single worker there
+    fcntl = None
+
+logger = structlog.get_logger()
+
+MAGIC = b"VPJ1"
+VERSION = 1
+FLAG_SUPERSEDED = 1
+_HEADER = struct.Struct(">4sHHQQ")
+HEADER_SIZE = 64
+_RECORD = struct.Struct(">BH16s16s")
+OP_IN = 1
+OP_OUT = 2
+GROW_BYTES = 1024 * 1024
+WRITE_QUEUE_SIZE = 10_000  # appends waiting for the writer thread; past this they are dropped (the rebuild resyncs)
+NO_SOCIETY = UUID(int=0)  # check-outs match on visit_id only
+
+
+def _encode_entry(entry: PresenceEntry) -> bytes:
+    return json.dumps(
+        [
+            str(entry.visitor_id),
+            str(entry.building_id) if entry.building_id else None,
+            entry.visitor_name,
+            entry.visitor_phone,
+            entry.host_name,
+            entry.purpose,
+            entry.checked_in_at.isoformat() if entry.checked_in_at else None,
+        ],
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _decode_entry(visit_id: bytes, society_id: bytes, payload: bytes) -> PresenceEntry:
+    visitor_id, building_id, name, phone, host_name, purpose, checked_in_at = json.loads(payload)
+    return PresenceEntry(
+        visit_id=UUID(bytes=visit_id),
+        visitor_id=UUID(visitor_id),
+        society_id=UUID(bytes=society_id),
+        building_id=UUID(building_id) if building_id else None,
+        visitor_name=name,
+        visitor_phone=phone,
+        host_name=host_name,
+        purpose=purpose,
+        checked_in_at=datetime.fromisoformat(checked_in_at) if checked_in_at else None,
+    )
+
+
+def _fsync_directory(path: str) -> None:
+    """Make a rename durable (POSIX; a no-op where directories cannot be opened)."""
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class PresenceJournal:
+    """Memory-mapped journal plus the replayed set of visits inside (visit_id bytes -> (society bytes, payload))."""
+
+    def __init__(self, path: str, compact_bytes: int) -> None:
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._generation = 0
+        self._offset = HEADER_SIZE  # how far this process has replayed
+        self._snapshot_end = HEADER_SIZE  # end of the last compaction's snapshot (appends since then are "garbage")
+        self._live: dict[bytes, tuple[bytes, bytes]] = {}
+        # flock is per open file, so it does not exclude threads of this process (writer thread vs readers)
+        self._thread_lock = threading.RLock()
+        self.appends = 0
+        self._synced_size = 0  # file size at the last sync(); growth also needs the inode synced
+        self.syncs = 0
+        self.compactions = 0
+        self.replay_ms: Optional[float] = None
+        self.errors = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._mm is not None
+
+    # --- file handling ---
+
+    def open(self) -> None:
+        """Open (creating if needed) and replay the journal."""
+        if self.is_open:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open_file()
+        with self._locked(exclusive=True):
+            if len(self._mm) < HEADER_SIZE or not any(self._mm[:HEADER_SIZE]):
+                if len(self._mm) < GROW_BYTES:
+                    os.ftruncate(self._fd, GROW_BYTES)
+                    self._map()
+                _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, 0, HEADER_SIZE, 0)
+            magic, version, _, _, _ = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                self.close()
+                raise ValueError(f"{self.path} is not a presence journal")
+            self._replay_from_start()
+
+    def close(self) -> None:
+        with self._thread_lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _open_file(self) -> None:
+        self.close()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._map()
+
+    def _map(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        size = os.fstat(self._fd).st_size
+        if size == 0:  # mmap cannot map an empty file
+            os.ftruncate(self._fd, GROW_BYTES)
+            size = GROW_BYTES
+        self._mm = mmap.mmap(self._fd, size)
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        """
+        Hold the cross-process lock on the current journal file. If another worker compacted it (old file marked
+        superseded), switch to the new file first and replay it from the start.
+        """
+        with self._thread_lock:
+            with self._flocked(exclusive):
+                yield
+
+    @contextmanager
+    def _flocked(self, exclusive: bool) -> Iterator[None]:
+        while True:
+            fd = self._fd
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            flags = _HEADER.unpack_from(self._mm, 0)[2] if len(self._mm) >= HEADER_SIZE else 0
+            if not flags & FLAG_SUPERSEDED:
+                break
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._open_file()
+            self._live.clear()
+            self._offset = self._snapshot_end = HEADER_SIZE
+        try:
+            yield
+        finally:
+            # Our own compaction closes the locked fd, which already released the lock
+            if fcntl is not None and fd == self._fd:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _header(self) -> tuple[int, int, int]:
+        _, _, flags, end, generation = _HEADER.unpack_from(self._mm, 0)
+        return flags, end, generation
+
+    # --- replay ---
+
+    def _replay_from_start(self) -> None:
+        started = time.perf_counter()
+        self._live.clear()
+        self._offset = self._snapshot_end = HEADER_SIZE
+        self._catch_up()
+        self.replay_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def _catch_up(self) -> None:
+        """Apply records other workers appended since our last read. Caller holds the lock."""
+        _, end, generation = self._header()
+        if end > len(self._mm):
+            self._map()
+        self._offset = self._apply(self._live, self._offset, end)
+        self._generation = generation
+
+    def _apply(self, live: dict[bytes, tuple[bytes, bytes]], pos: int, end: int) -> int:
+        mm, size = self._mm, _RECORD.size
+        while pos < end:
+            op, length, visit_id, society_id = _RECORD.unpack_from(mm, pos)
+            pos += size
+            if op == OP_IN:
+                live[visit_id] = (society_id, mm[pos:pos + length])
+            else:
+                live.pop(visit_id, None)
+            pos += length
+        return pos
+
+    # --- writes ---
+
+    def _append(self, op: int, visit_id: UUID, society_id: UUID, payload: bytes = b"") -> None:
+        record = _RECORD.pack(op, len(payload), visit_id.bytes, society_id.bytes) + payload
+        with self._locked(exclusive=True):
+            self._catch_up()
+            end = self._offset
+            if end + len(record) > len(self._mm):
+                grow = max(GROW_BYTES, len(record))
+                os.ftruncate(self._fd, len(self._mm) + grow)
+                self._map()
+            self._mm[end:end + len(record)] = record
+            _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, 0, end + len(record), self._generation)
+            self._catch_up()
+            self.appends += 1
+            if self._offset - self._snapshot_end > self.compact_bytes:
+                self._compact_locked(self._live)
+
+    def sync(self) -> None:
+        """Write appended records and the header to disk (the mapping alone survives a process crash, not a host one)."""
+        with self._thread_lock:
+            if self._mm is None:
+                return
+            self._mm.flush()
+            size = len(self._mm)
+            if size != self._synced_size:
+                os.fsync(self._fd)
+                self._synced_size = size
+            self.syncs += 1
+
+    def check_in(self, entry: PresenceEntry) -> None:
+        self._append(OP_IN, entry.visit_id, entry.society_id, _encode_entry(entry))
+
+    def check_out(self, visit_id: UUID, society_id: UUID) -> None:
+        self._append(OP_OUT, visit_id, society_id)
+
+    def position(self) -> tuple[int, int]:
+        """(generation, offset) to pass to snapshot(): records appended after it are kept."""
+        with self._locked(exclusive=False):
+            self._catch_up()
+            return self._generation, self._offset
+
+    def snapshot(self, entries: list[PresenceEntry], since: Optional[tuple[int, int]] = None) -> None:
+        """
+        Replace the journal with `entries` (e.g. checked-in visits just read from the DB). Records appended after
+        `since` are applied on top, so check-ins committed while the DB was being read are not lost.
+        """
+        live = {e.visit_id.bytes: (e.society_id.bytes, _encode_entry(e)) for e in entries}
+        with self._locked(exclusive=True):
+            self._catch_up()
+            if since is not None and since[0] == self._generation:
+                self._apply(live, since[1], self._offset)
+            self._compact_locked(live)
+
+    def _compact_locked(self, live: dict[bytes, tuple[bytes, bytes]]) -> None:
+        """Write live as a fresh journal, fsync it, mark this file superseded and swap. Caller holds the lock."""
+        generation = self._generation + 1
+        body = b"".join(
+            _RECORD.pack(OP_IN, len(payload), visit_id, society_id) + payload
+            for visit_id, (society_id, payload) in live.items()
+        )
+        end = HEADER_SIZE + len(body)
+        size = max(GROW_BYTES, end + GROW_BYTES)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, end, generation).ljust(HEADER_SIZE, b"\0"))
+            f.write(body)
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_directory(self.path)
+        _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, FLAG_SUPERSEDED, self._offset, self._generation)
+        self._mm.flush()
+        old_fd = self._fd
+        self._mm.close()
+        self._mm = None
+        self._fd = os.open(self.path, os.O_RDWR, 0o600)
+        self._map()
+        self._synced_size = len(self._mm)
+        os.close(old_fd)  # releases our lock on the old file; waiters see FLAG_SUPERSEDED and reopen
+        self._live = dict(live)
+        self._offset = self._snapshot_end = end
+        self._generation = generation
+        self.compactions += 1
+
+    # --- reads ---
+
+    def inside(self, society_id: Optional[UUID] = None) -> list[PresenceEntry]:
+        """Everyone inside (one society, or all), most recent check-in first."""
+        with self._locked(exclusive=False):
+            self._catch_up()
+            items = list(self._live.items())
+        wanted = society_id.bytes if society_id else None
+        entries = [
+            _decode_entry(visit_id, sid, payload)
+            for visit_id, (sid, payload) in items
+            if wanted is None or sid == wanted
+        ]
+        entries.sort(key=lambda e: e.checked_in_at or datetime.min, reverse=True)
+        return entries
+
+    def stats(self) -> dict:
+        return {
+            "open": self.is_open,
+            "inside": len(self._live),
+            "bytes": self._offset,
+            "generation": self._generation,
+            "appends": self.appends,
+            "syncs": self.syncs,
+            "compactions": self.compactions,
+            "replay_ms": self.replay_ms,
+            "errors": self.errors,
+        }
+
+
+class JournalWriter:
+    """
+    One daemon thread applying queued journal writes in submission (= commit) order; on_drain runs whenever the
+    queue empties after writes, so a burst of appends shares one sync.
+    """
+
+    def __init__(self, maxsize: int = WRITE_QUEUE_SIZE, on_drain: Optional[Callable[[], None]] = None) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._on_drain = on_drain
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, write: Callable[[], None]) -> None:
+        """Queue a write without blocking; started on first use."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(write)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="presence-journal", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            write = self._queue.get()
+            try:
+                if write is None:
+                    return
+                write()
+                if self._on_drain is not None and self._queue.empty():
+                    self._on_drain()
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until everything queued so far is written (tests, shutdown)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write what is queued (up to timeout), then end the thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Presence journal writer did not drain", queued=self._queue.qsize())
+            return
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "dropped": self.dropped}
+
+
+presence_journal = PresenceJournal(settings.PRESENCE_JOURNAL_PATH, settings.PRESENCE_JOURNAL_COMPACT_BYTES)
+
+
+def open_journal() -> None:
+    """Open and replay the journal at startup (no DB needed). Failures disable it rather than the app."""
+    if not settings.PRESENCE_JOURNAL_PATH:
+        return
+    try:
+        presence_journal.open()
+        logger.info("Presence journal replayed", **presence_journal.stats())
+    except Exception as e:
+        logger.warning("Presence journal unavailable", path=settings.PRESENCE_JOURNAL_PATH, error=str(e))
+
+
+def close_journal() -> None:
+    """Shutdown: write the queued appends, then close the file."""
+    journal_writer.stop()
+    presence_journal.close()
+
+
+def journal_stats() -> dict:
+    return {**presence_journal.stats(), **journal_writer.stats()}
+
+
+def _write(journal: PresenceJournal, append: Callable, *args) -> None:
+    """Runs on the writer thread."""
+    try:
+        append(*args)
+    except Exception as e:
+        journal.errors += 1
+        logger.warning("Presence journal append failed", error=str(e))
+
+
+def sync_journal() -> None:
+    """Runs on the writer thread once its queue drains."""
+    if presence_journal.is_open:
+        _write(presence_journal, presence_journal.sync)
+
+
+journal_writer = JournalWriter(on_drain=sync_journal)
+
+
+def journal_check_in(entry: PresenceEntry) -> None:
+    """Commit hook: queue the append; never blocks the event loop."""
+    if presence_journal.is_open:
+        journal = presence_journal
+        journal_writer.submit(lambda: _write(journal, journal.check_in, entry))
+
+
+def journal_check_out(visit_id: UUID, society_id: Optional[UUID]) -> None:
+    """Commit hook: queue the append. Check-outs match on visit_id, so a missing society is still recorded."""
+    if presence_journal.is_open:
+        journal = presence_journal
+        journal_writer.submit(lambda: _write(journal, journal.check_out, visit_id, society_id or NO_SOCIETY))
@@ -0,0 +1,103 @@
+"""
+Per-user unread notification counts (personal notifications plus unread society notices).
+The bell badge is read on every app launch, so it is served from an in-process cache instead of counting the
+inbox. A miss is one statement over the (user_id, read, created_at) index and the notice read set; after that,
+inserts, mark_read, mark-all-read and new society notices adjust the cached count after commit. A TTL bounds
+drift from other workers' changes, and the cache holds at most max_users entries (least recently used evicted).
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from app.core.config import settings
+
+
+@dataclass
+class UnreadEntry:
+    count: int
+    society_id: Optional[UUID]
+    loaded_at: float
+
+
+class UnreadCountCache:
+    """Unread counts by user, indexed by society so a new notice bumps every cached member."""
+
+    def __init__(self, ttl_seconds: int, max_users: int):
+        self._ttl = ttl_seconds
+        self._max_users = max(1, max_users)
+        self._users: OrderedDict[UUID, UnreadEntry] = OrderedDict()
+        self._by_society: dict[UUID, set[UUID]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: UUID) -> Optional[int]:
+        entry = self._users.get(user_id)
+        if entry is None or time.monotonic() - entry.loaded_at > self._ttl:
+            return None
+        self._users.move_to_end(user_id)
+        return entry.count
+
+    def set(self, user_id: UUID, society_id: Optional[UUID], count: int) -> int:
+        self._drop(user_id)
+        self._users[user_id] = UnreadEntry(max(count, 0), society_id, time.monotonic())
+        if society_id is not None:
+            self._by_society.setdefault(society_id, set()).add(user_id)
+        while len(self._users) > self._max_users:
+            self._drop(next(iter(self._users)))
+            self.evictions += 1
+        return max(count, 0)
+
+    def apply(self, user_id: UUID, delta: int) -> None:
+        """Apply a committed change to a cached count (absent entries are simply loaded on next read)."""
+        entry = self._users.get(user_id)
+        if entry is not None:
+            entry.count = max(entry.count + delta, 0)
+
+    def apply_society(self, society_id: UUID, delta: int) -> None:
+        """A society notice was created: every cached member has one more unread."""
+        for user_id in self._by_society.get(society_id, ()):
+            self.apply(user_id, delta)
+
+    def reset(self, user_id: UUID) -> None:
+        """Everything was marked read."""
+        entry = self._users.get(user_id)
+        if entry is not None:
+            entry.count = 0
+
+    def _drop(self, user_id: UUID) -> None:
+        entry = self._users.pop(user_id, None)
+        if entry is None or entry.society_id is None:
+            return
+        members = self._by_society.get(entry.society_id)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self._by_society[entry.society_id]
+
+    def invalidate(self, user_id: Optional[UUID] = None) -> None:
+        if user_id is None:
+            self._users.clear()
+            self._by_society.clear()
+        else:
+            self._drop(user_id)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> dict:
+        reads = self.hits + self.misses
+        return {
+            "users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / reads, 4) if reads else None,
+            "evictions": self.evictions,
+        }
+
+
+unread_counts = UnreadCountCache(
+    ttl_seconds=settings.NOTIFY_UNREAD_CACHE_TTL_SECONDS, max_users=settings.NOTIFY_UNREAD_CACHE_MAX_USERS
+)
@@ -0,0 +1,337 @@
+"""
+Per-society dashboard counters (visitors today, pending approvals, checked in).
+Visit creation and every state transition adjust the society_visit_counters row in the same transaction, and an
+in-process mirror after commit, so /dashboard/stats is a dict read. The mirror re-reads the row after a short TTL
+to pick up other workers' changes; a periodic reconcile recounts from visits and overwrites any drift.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time
+from typing import Optional
+from uuid import UUID
+
+import structlog
+from sqlalchemy import select, update, case, and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import after_commit
+from app.models.society import Society
+from app.models.visitor import SocietyVisitCounters, Visit, VisitStatus
+
+logger = structlog.get_logger()
+
+# Statuses with a counter column
+STATUS_COLUMNS = {
+    VisitStatus.PENDING: "pending",
+    VisitStatus.CHECKED_IN: "checked_in",
+}
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+@dataclass
+class CounterSnapshot:
+    day: date
+    visitors_today: int
+    pending: int
+    checked_in: int
+    loaded_at: float
+
+    def as_stats(self) -> dict:
+        return {
+            "visitors_today": self.visitors_today if self.day == _today() else 0,
+            "pending_approvals": max(self.pending, 0),
+            "checked_in": max(self.checked_in, 0),
+        }
+
+
+class VisitCounterMirror:
+    """In-process copy of society_visit_counters rows, with hit/miss and reconcile counters."""
+
+    def __init__(self, ttl_seconds: int):
+        self._ttl = ttl_seconds
+        self._societies: dict[UUID, CounterSnapshot] = {}
+        self.hits = 0
+        self.misses = 0
+        self.reconciles = 0
+        self.drift_corrections = 0  # rows the last reconciles found out of step
+
+    def get(self, society_id: UUID) -> Optional[CounterSnapshot]:
+        entry = self._societies.get(society_id)
+        if entry is None or time.monotonic() - entry.loaded_at > self._ttl:
+            return None
+        return entry
+
+    def set(self, society_id: UUID, day: date, visitors_today: int, pending: int, checked_in: int) -> CounterSnapshot:
+        entry = CounterSnapshot(day, visitors_today, pending, checked_in, time.monotonic())
+        self._societies[society_id] = entry
+        return entry
+
+    def apply(self, society_id: UUID, deltas: dict[str, int], new_visitor_day: Optional[date] = None) -> None:
+        """Apply a committed change to a cached entry (absent entries are simply loaded on next read)."""
+        entry = self._societies.get(society_id)
+        if entry is None:
+            return
+        for column, delta in deltas.items():
+            setattr(entry, column, getattr(entry, column) + delta)
+        if new_visitor_day is not None:
+            entry.visitors_today = entry.visitors_today + 1 if entry.day == new_visitor_day else 1
+            entry.day = new_visitor_day
+
+    def invalidate(self, society_id: Optional[UUID] = None) -> None:
+        if society_id is None:
+            self._societies.clear()
+        else:
+            self._societies.pop(society_id, None)
+
+    def stats(self) -> dict:
+        reads = self.hits + self.misses
+        return {
+            "societies": len(self._societies),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / reads, 4) if reads else None,
+            "reconciles": self.reconciles,
+            "drift_corrections": self.drift_corrections,
+        }
+
+
+counter_mirror = VisitCounterMirror(ttl_seconds=settings.DASHBOARD_COUNTERS_TTL_SECONDS)
+
+
+async def _apply(
+    db: AsyncSession,
+    society_id: Optional[UUID],
+    deltas: dict[str, int],
+    new_visitor: bool = False,
+) -> None:
+    """One UPDATE of the society's counter row; the mirror follows after commit."""
+    if society_id is None or not (deltas or new_visitor):
+        return
+    values = {column: getattr(SocietyVisitCounters, column) + delta for column, delta in deltas.items()}
+    today = _today()
+    if new_visitor:
+        values["visitors_today"] = case(
+            (SocietyVisitCounters.day == today, SocietyVisitCounters.visitors_today + 1),
+            else_=1,
+        )
+        values["day"] = today
+    result = await db.execute(
+        update(SocietyVisitCounters)
+        .where(SocietyVisitCounters.society_id == society_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        after_commit(db, lambda: counter_mirror.apply(society_id, deltas, today if new_visitor else None))
+    else:
+        # No row yet (society created since the last reconcile): reads recount until the reconcile adds it
+        after_commit(db, lambda: counter_mirror.invalidate(society_id))
+
+
+async def record_transition(
+    db: AsyncSession, society_id: Optional[UUID], old: VisitStatus, new: VisitStatus
+) -> None:
+    """Move one visit between status counters (called by transition_visit)."""
+    deltas: dict[str, int] = {}
+    if old in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[old]] = -1
+    if new in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[new]] = deltas.get(STATUS_COLUMNS[new], 0) + 1
+    await _apply(db, society_id, deltas)
+
+
+async def record_new_visit(db: AsyncSession, visit: Visit) -> None:
+    """Count a just-flushed visit: its status, and the visitor if this is their first visit today in the society."""
+    if visit.society_id is None:
+        return
+    today_start = datetime.combine(_today(), dt_time.min)
+    earlier = await db.execute(
+        select(Visit.id)
+        .where(
+            and_(
+                Visit.visitor_id == visit.visitor_id,
+                Visit.society_id == visit.society_id,
+                Visit.created_at >= today_start,
+                Visit.id != visit.id,
+            )
+        )
+        .limit(1)
+    )
+    deltas = {STATUS_COLUMNS[visit.status]: 1} if visit.status in STATUS_COLUMNS else {}
+    await _apply(db, visit.society_id, deltas, new_visitor=earlier.first() is None)
+
+
+async def count_visits(db: AsyncSession, society_id: Optional[UUID] = None) -> dict:
+    """Recount dashboard figures from visits (one society, or platform-wide when society_id is None)."""
+    today_start = datetime.combine(_today(), dt_time.min)
+    vt_q = select(func.count(func.distinct(Visit.visitor_id))).where(Visit.created_at >= today_start)
+    st_q = (
+        select(Visit.status, func.count(Visit.id))
+        .where(Visit.status.in_(tuple(STATUS_COLUMNS)))
+        .group_by(Visit.status)
+    )
+    if society_id:
+        vt_q = vt_q.where(Visit.society_id == society_id)
+        st_q = st_q.where(Visit.society_id == society_id)
+    vt = (await db.execute(vt_q)).scalar() or 0
+    by_status = {row[0]: row[1] for row in (await db.execute(st_q)).all()}
+    return {
+        "visitors_today": vt,
+        "pending_approvals": by_status.get(VisitStatus.PENDING, 0),
+        "checked_in": by_status.get(VisitStatus.CHECKED_IN, 0),
+    }
+
+
+async def get_society_stats(db: AsyncSession, society_id: UUID) -> dict:
+    """Dashboard stats for a society: mirror, else the counter row (one PK read), else a recount."""
+    entry = counter_mirror.get(society_id)
+    if entry is not None:
+        counter_mirror.hits += 1
+        return entry.as_stats()
+    counter_mirror.misses += 1
+    row = await db.get(SocietyVisitCounters, society_id, populate_existing=True)
+    if row is not None:
+        return counter_mirror.set(society_id, row.day, row.visitors_today, row.pending, row.checked_in).as_stats()
+    stats = await count_visits(db, society_id)
+    counter_mirror.set(society_id, _today(), stats["visitors_today"], stats["pending_approvals"], stats["checked_in"])
+    return stats
+
+
+async def _grouped_counts(db: AsyncSession, today: date) -> dict[UUID, tuple[int, int, int]]:
+    """(visitors_today, pending, checked_in) for every society with visits, from two grouped queries."""
+    today_start = datetime.combine(today, dt_time.min)
+    by_status = await db.execute(
+        select(Visit.society_id, Visit.status, func.count(Visit.id))
+        .where(Visit.status.in_(tuple(STATUS_COLUMNS)))
+        .group_by(Visit.society_id, Visit.status)
+    )
+    by_visitors = await db.execute(
+        select(Visit.society_id, func.count(func.distinct(Visit.visitor_id)))
+        .where(Visit.created_at >= today_start)
+        .group_by(Visit.society_id)
+    )
+    counts: dict[UUID, dict[str, int]] = {}
+    for society_id, status, count in by_status.all():
+        if society_id is not None:
+            counts.setdefault(society_id, {})[STATUS_COLUMNS[status]] = count
+    for society_id, count in by_visitors.all():
+        if society_id is not None:
+            counts.setdefault(society_id, {})["visitors_today"] = count
+    return {
+        society_id: (c.get("visitors_today", 0), c.get("pending", 0), c.get("checked_in", 0))
+        for society_id, c in counts.items()
+    }
+
+
+def _row_values(row: SocietyVisitCounters, today: date) -> tuple[int, int, int]:
+    return row.visitors_today if row.day == today else 0, row.pending, row.checked_in
+
+
+async def _recount_society(db: AsyncSession, society_id: UUID, today: date) -> bool:
+    """
+    Recount one society and fix its counter row, holding the row FOR UPDATE from before the count until commit.
+    Every transition updates that row, so none can commit in between; one waiting on the lock applies its delta
+    on top of the corrected value. Commits; returns whether the row had drifted.
+    """
+    row = (
+        await db.execute(
+            select(SocietyVisitCounters)
+            .where(SocietyVisitCounters.society_id == society_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+    ).scalar_one_or_none()
+    if row is None:
+        await db.rollback()
+        return False
+    counts = await count_visits(db, society_id)
+    values = (counts["visitors_today"], counts["pending_approvals"], counts["checked_in"])
+    drifted = _row_values(row, today) != values
+    if drifted:
+        row.day = today
+        row.visitors_today, row.pending, row.checked_in = values
+        after_commit(db, lambda: counter_mirror.invalidate(society_id))
+    await db.commit()
+    return drifted
+
+
+async def reconcile_counters(db: AsyncSession) -> int:
+    """
+    Overwrite counter rows that drifted from a recount of visits, creating missing rows. Commits; returns the
+    number of rows corrected. Two grouped queries pick the candidates; each is then recounted and written under
+    its row lock (_recount_society), so a transition committing while this runs is never overwritten.
+    """
+    today = _today()
+    expected = await _grouped_counts(db, today)
+    society_ids = (await db.execute(select(Society.id))).scalars().all()
+    rows = {
+        row.society_id: row
+        for row in (await db.execute(select(SocietyVisitCounters))).scalars().all()
+    }
+    candidates = []
+    for society_id in society_ids:
+        row = rows.get(society_id)
+        if row is None:
+            # Created empty, then recounted under its lock like any other row
+            try:
+                async with db.begin_nested():
+                    db.add(SocietyVisitCounters(
+                        society_id=society_id, day=today, visitors_today=0, pending=0, checked_in=0,
+                    ))
+            except IntegrityError:
+                pass  # another worker's reconcile added it
+            candidates.append(society_id)
+        elif _row_values(row, today) != expected.get(society_id, (0, 0, 0)):
+            candidates.append(society_id)
+    await db.commit()
+
+    corrected = 0
+    for society_id in candidates:
+        corrected += await _recount_society(db, society_id, today)
+    counter_mirror.reconciles += 1
+    counter_mirror.drift_corrections += corrected
+    return corrected
+
+
+_reconcile_task: Optional[asyncio.Task] = None
+
+
+async def _reconcile_loop(interval: int) -> None:
+    from app.core.database import AsyncSessionLocal
+
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                corrected = await reconcile_counters(db)
+            if corrected:
+                logger.info("Dashboard counters reconciled", corrected=corrected)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Dashboard counter reconcile failed", error=str(e))
+        await asyncio.sleep(interval)
+
+
+def start_reconcile_task() -> None:
+    """Reconcile once now and then every DASHBOARD_COUNTERS_RECONCILE_SECONDS (no-op when set to 0)."""
+    global _reconcile_task
+    interval = settings.DASHBOARD_COUNTERS_RECONCILE_SECONDS
+    if interval > 0 and _reconcile_task is None:
+        _reconcile_task = asyncio.create_task(_reconcile_loop(interval))
+
+
+async def stop_reconcile_task() -> None:
+    global _reconcile_task
+    if _reconcile_task is not None:
+        _reconcile_task.cancel()
+        try:
+            await _reconcile_task
+        except asyncio.CancelledError:
+            pass
+        _reconcile_task = None
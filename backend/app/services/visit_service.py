@@ -1,24 +1,41 @@
 """Visit & Visitor business logic."""
-import asyncio
 import json
 import secrets
 import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import AsyncIterator, Optional
 from uuid import UUID
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-
-from app.constants.visit import OTP_EXPIRE_MINUTES, OTP_LENGTH, QR_PREFIX, ARRIVAL_WINDOW_MINUTES
+from sqlalchemy.orm import selectinload, joinedload
+
+from app.constants.visit import (
+    OTP_EXPIRE_MINUTES,
+    OTP_LENGTH,
+    OTP_ALLOCATION_ATTEMPTS,
+    OTP_INSERT_ATTEMPTS,
+    ARRIVAL_WINDOW_MINUTES,
+)
 from app.core.roles import RESIDENT_HOST_ROLES
 from app.models.visitor import Visit, VisitStatus, Visitor, ConsentLog
 from app.models.user import User
 from app.models.notification import Notification
+from app.models.audit import AuditLog
 from app.models.society import Building
 from app.services.blacklist_service import is_visitor_blacklisted_for_society
-from app.core.notification_ws import broadcast_to_user
+from app.services.notification_service import notification_to_dict, record_new_notification
+from app.services.pass_index import pass_index, PassRecord, LIVE_PASS_STATUSES
+from app.services.presence import PresenceEntry, record_check_in, record_check_out
+from app.services.presence_journal import journal_check_in, journal_check_out
+from app.services.visit_counters import count_visits, get_society_stats, record_new_visit
+from app.services.visit_state import transition_visit
+from app.core.database import after_commit, after_rollback
+from app.core.pass_tokens import issue_pass_token
+from app.core.notification_ws import publish
+from app.utils.pagination import Page, paginate
 
 
 async def ensure_user_in_society(
@@ -77,8 +94,68 @@ def _generate_otp() -> str:
     return "".join(secrets.choice("0123456789") for _ in range(OTP_LENGTH))
 
 
-def _generate_qr() -> str:
-    return f"{QR_PREFIX}-{uuid.uuid4().hex[:12].upper()}"
+async def _otp_taken_in_db(db: AsyncSession, society_id: Optional[UUID], otp: str) -> bool:
+    """
+    True if a live pass in the society already uses this OTP. Served by ix_visits_society_id_otp.
+    Expired pending/approved holders still block it in uq_visits_society_id_otp_live, so their OTP is reclaimed.
+    """
+    now = datetime.utcnow()
+    result = await db.execute(
+        select(Visit.id, Visit.otp_expires_at)
+        .where(
+            and_(
+                Visit.society_id == society_id if society_id else Visit.society_id.is_(None),
+                Visit.otp == otp,
+                Visit.status.in_(LIVE_PASS_STATUSES),
+            )
+        )
+    )
+    holders = result.all()
+    if any(h.otp_expires_at is not None and h.otp_expires_at > now for h in holders):
+        return True
+    if holders:
+        await db.execute(update(Visit).where(Visit.id.in_([h.id for h in holders])).values(otp=None))
+    return False
+
+
+async def allocate_otp(db: AsyncSession, society_id: Optional[UUID], expires_at: datetime) -> str:
+    """
+    Pick an OTP not used by any live pass in this society and reserve it in-process until the pass commits
+    (released if the transaction rolls back). Other workers and transactions are kept out by
+    uq_visits_society_id_otp_live; create_invitation retries on a conflict there.
+    Raises ValueError only if the society's OTP space is effectively exhausted.
+    """
+    await pass_index.ensure_loaded(db)
+    for _ in range(OTP_ALLOCATION_ATTEMPTS):
+        otp = _generate_otp()
+        if pass_index.otp_in_use(society_id, otp):
+            continue
+        if await _otp_taken_in_db(db, society_id, otp):
+            continue
+        pass_index.reserve_otp(society_id, otp, expires_at)
+        after_rollback(db, lambda: pass_index.release_otp(society_id, otp))
+        return otp
+    raise ValueError("Could not allocate a unique OTP for this society; please retry")
+
+
+def _pass_record(visit: Visit, society_id: Optional[UUID]) -> PassRecord:
+    return PassRecord(
+        visit_id=visit.id,
+        host_id=visit.host_id,
+        society_id=society_id,
+        status=visit.status,
+        expires_at=visit.otp_expires_at,
+        otp=visit.otp,
+        qr_code=visit.qr_code,
+    )
+
+
+async def _ensure_relationships(db: AsyncSession, visit: Visit, attrs: list[str]) -> None:
+    """Refresh only the relationships that are not loaded yet (avoids a round trip when eager-loaded)."""
+    unloaded = sa_inspect(visit).unloaded
+    missing = [a for a in attrs if a in unloaded]
+    if missing:
+        await db.refresh(visit, missing)
 
 
 async def get_or_create_visitor(
@@ -120,19 +197,35 @@ async def create_invitation(
     if host and host.society_id and await is_visitor_blacklisted_for_society(db, visitor.id, host.society_id):
         raise ValueError("Visitor is blacklisted in this society")
 
+    society_id = host.society_id if host else None
     expires_at = datetime.utcnow() + timedelta(minutes=OTP_EXPIRE_MINUTES)
+    visit_id = uuid.uuid4()  # known up front so the QR token can embed it
     visit = Visit(
+        id=visit_id,
         visitor_id=visitor.id,
         host_id=host_id,
+        society_id=society_id,
         status=VisitStatus.PENDING,
         purpose=purpose,
         expected_arrival=expected_arrival,
-        qr_code=_generate_qr(),
-        otp=_generate_otp(),
+        qr_code=issue_pass_token(visit_id, society_id, expires_at),
         otp_expires_at=expires_at,
     )
-    db.add(visit)
-    await db.flush()
+    for attempt in range(OTP_INSERT_ATTEMPTS):
+        visit.otp = await allocate_otp(db, society_id, expires_at)
+        try:
+            async with db.begin_nested():
+                db.add(visit)
+                await db.flush()
+            break
+        except IntegrityError:
+            # Another worker committed the same OTP for this society since our probe
+            pass_index.release_otp(society_id, visit.otp)
+            if attempt == OTP_INSERT_ATTEMPTS - 1:
+                raise ValueError("Could not allocate a unique OTP for this society; please retry")
+    await record_new_visit(db, visit)
+    record = _pass_record(visit, society_id)
+    after_commit(db, lambda: pass_index.put(record))
     return visit
 
 
@@ -161,6 +254,7 @@ async def create_walkin_visit(
     visit = Visit(
         visitor_id=visitor.id,
         host_id=host_id,
+        society_id=host.society_id if host else None,
         status=VisitStatus.PENDING,  # Wait for resident approval
         purpose=purpose or "Walk-in",
         qr_code=None,  # No QR/OTP for walk-in; guard will check-in by visit_id after approval
@@ -170,6 +264,7 @@ async def create_walkin_visit(
     )
     db.add(visit)
     await db.flush()
+    await record_new_visit(db, visit)
     await db.refresh(visit, ["visitor", "host"])
 
     # Notify resident (by tower/flat) so they get alert on device to approve/reject
@@ -193,7 +288,9 @@ async def create_walkin_visit(
     )
     db.add(notif)
     await db.flush()
-    asyncio.create_task(broadcast_to_user(host_id, {"event": "notification"}))
+    pushed = notification_to_dict(notif)
+    record_new_notification(db, host_id)
+    after_commit(db, lambda: publish(host_id, pushed))
     return visit
 
 
@@ -207,43 +304,98 @@ async def get_visit_by_id(db: AsyncSession, visit_id: UUID) -> Optional[Visit]:
     return result.scalar_one_or_none()
 
 
-async def get_visit_by_otp(db: AsyncSession, otp: str) -> Optional[Visit]:
-    """Get visit by OTP (valid, not expired). Eager-loads visitor."""
+_PASS_COLUMNS = (
+    Visit.id,
+    Visit.host_id,
+    Visit.society_id,
+    Visit.status,
+    Visit.otp_expires_at,
+    Visit.otp,
+    Visit.qr_code,
+)
+
+
+async def load_visit_for_checkin(db: AsyncSession, visit_id: UUID) -> Optional[Visit]:
+    """Visit with visitor, host and host.building in one joined SELECT (everything the gate response needs)."""
     result = await db.execute(
         select(Visit)
-        .options(selectinload(Visit.visitor))
-        .where(
-            and_(
-                Visit.otp == otp,
-                Visit.otp_expires_at > datetime.utcnow(),
-                Visit.status.in_([VisitStatus.PENDING, VisitStatus.APPROVED]),
-            )
+        .options(
+            joinedload(Visit.visitor),
+            joinedload(Visit.host).joinedload(User.building),
         )
+        .where(Visit.id == visit_id)
     )
-    return result.scalar_one_or_none()
+    return result.unique().scalar_one_or_none()
 
 
-async def get_visit_by_qr(db: AsyncSession, qr_code: str) -> Optional[Visit]:
-    """Get visit by QR code (valid, not expired). Eager-loads visitor. QR expires with OTP."""
+async def _find_pass(db: AsyncSession, *criteria) -> Optional[PassRecord]:
+    """DB fallback for a pass this process has not seen (e.g. issued by another worker)."""
     result = await db.execute(
-        select(Visit)
-        .options(selectinload(Visit.visitor))
+        select(*_PASS_COLUMNS)
         .where(
             and_(
-                Visit.qr_code == qr_code,
+                *criteria,
                 Visit.otp_expires_at > datetime.utcnow(),
-                Visit.status.in_([VisitStatus.PENDING, VisitStatus.APPROVED]),
+                Visit.status.in_(LIVE_PASS_STATUSES),
             )
         )
+        .limit(2)
     )
-    return result.scalar_one_or_none()
+    rows = result.all()
+    if len(rows) != 1:
+        return None  # not found, or an unscoped OTP that is ambiguous across societies
+    row = rows[0]
+    record = PassRecord(
+        visit_id=row.id,
+        host_id=row.host_id,
+        society_id=row.society_id,
+        status=row.status,
+        expires_at=row.otp_expires_at,
+        otp=row.otp,
+        qr_code=row.qr_code,
+    )
+    pass_index.put(record)
+    return record
 
 
-def _validate_arrival_window(visit: Visit) -> None:
-    """Raise ValueError if expected_arrival is set and current time is outside window."""
+async def find_pass_by_otp(
+    db: AsyncSession, otp: str, society_id: Optional[UUID] = None
+) -> Optional[PassRecord]:
+    """
+    Resolve a valid (unexpired, pending/approved) OTP to its pass record. Served from the pass index.
+    OTPs are unique per society; pass the guard's society_id. Without it the code must be unique platform-wide.
+    """
+    await pass_index.ensure_loaded(db)
+    if society_id is not None:
+        return pass_index.lookup_otp(society_id, otp) or await _find_pass(
+            db, Visit.society_id == society_id, Visit.otp == otp
+        )
+    return await _find_pass(db, Visit.otp == otp)
+
+
+async def find_pass_by_qr(db: AsyncSession, qr_code: str) -> Optional[PassRecord]:
+    """Resolve a valid (unexpired, pending/approved) QR code to its pass record. Served from the pass index."""
+    await pass_index.ensure_loaded(db)
+    return pass_index.lookup_qr(qr_code) or await _find_pass(db, Visit.qr_code == qr_code)
+
+
+async def get_visit_by_otp(db: AsyncSession, otp: str, society_id: Optional[UUID] = None) -> Optional[Visit]:
+    """Get visit by OTP (valid, not expired) within a society. Eager-loads visitor and host."""
+    record = await find_pass_by_otp(db, otp, society_id)
+    return await get_visit_by_id(db, record.visit_id) if record else None
+
+
+async def get_visit_by_qr(db: AsyncSession, qr_code: str) -> Optional[Visit]:
+    """Get visit by QR code (valid, not expired). Eager-loads visitor and host. QR expires with OTP."""
+    record = await find_pass_by_qr(db, qr_code)
+    return await get_visit_by_id(db, record.visit_id) if record else None
+
+
+def _validate_arrival_window(visit: Visit, at: Optional[datetime] = None) -> None:
+    """Raise ValueError if expected_arrival is set and `at` (default: now) is outside window."""
     if not visit.expected_arrival:
         return
-    now = datetime.utcnow()
+    now = at or datetime.utcnow()
     window = timedelta(minutes=ARRIVAL_WINDOW_MINUTES)
     if now < visit.expected_arrival - window:
         raise ValueError(
@@ -257,31 +409,46 @@ def _validate_arrival_window(visit: Visit) -> None:
         )
 
 
+async def _visit_society_id(db: AsyncSession, visit: Visit) -> Optional[UUID]:
+    """Society of the visit; legacy rows without visits.society_id fall back to the host's society."""
+    if visit.society_id:
+        return visit.society_id
+    await _ensure_relationships(db, visit, ["host"])
+    return visit.host.society_id if visit.host else None
+
+
 async def checkin_visit(
     db: AsyncSession,
     visit: Visit,
     photo_url: Optional[str] = None,
+    audit_entry: Optional[AuditLog] = None,
+    arrived_at: Optional[datetime] = None,
 ) -> Visit:
     """
-    Check-in a visit.
+    Check-in a visit (pending/approved -> checked_in as one conditional UPDATE).
     Re-checks blacklist. Validates arrival window. Records DPDP consent log. Notifies host.
+    The consent log, notification and optional audit entry are written in a single flush.
+    arrived_at records when the gate actually scanned the pass (offline device uploads); default now.
+    Raises VisitTransitionError if another request checked it in first.
+    The pass index, presence registry and presence journal follow after commit.
     """
     # Re-check blacklist at check-in (visitor may have been blacklisted after invite)
-    await db.refresh(visit, ["visitor", "host"])
-    if visit.host and visit.host.society_id and await is_visitor_blacklisted_for_society(
-        db, visit.visitor_id, visit.host.society_id
-    ):
+    society_id = await _visit_society_id(db, visit)
+    if society_id and await is_visitor_blacklisted_for_society(db, visit.visitor_id, society_id):
         raise ValueError("Visitor is blacklisted - access denied")
 
-    _validate_arrival_window(visit)
+    _validate_arrival_window(visit, arrived_at)
 
     now = datetime.utcnow()
-    visit.status = VisitStatus.CHECKED_IN
-    visit.actual_arrival = now
-    visit.consent_given = True
-    visit.consent_timestamp = now
+    values = {
+        "actual_arrival": arrived_at or now,
+        "consent_given": True,
+        "consent_timestamp": now,
+    }
     if photo_url:
-        visit.checkin_photo_url = photo_url
+        values["checkin_photo_url"] = photo_url
+    visit = await transition_visit(db, visit.id, visit.status, VisitStatus.CHECKED_IN, **values)
+    await _ensure_relationships(db, visit, ["visitor", "host"])
 
     # DPDP: Create immutable consent log
     consent_log = ConsentLog(
@@ -291,10 +458,8 @@ async def checkin_visit(
         consent_text="I consent to my data being collected for this visit (DPDP Act 2023)",
         timestamp=now,
     )
-    db.add(consent_log)
 
     # Host notification: "Visitor arrived"
-    import json
     notif = Notification(
         user_id=visit.host_id,
         type="visitor_arrived",
@@ -303,26 +468,44 @@ async def checkin_visit(
         read=False,
         extra_data=json.dumps({"visit_id": str(visit.id), "visitor_name": visit.visitor.full_name}),
     )
-    db.add(notif)
+    db.add_all([row for row in (consent_log, notif, audit_entry) if row is not None])
     await db.flush()
-    asyncio.create_task(broadcast_to_user(visit.host_id, {"event": "notification"}))
+    visit_id = visit.id
+    after_commit(db, lambda: pass_index.discard(visit_id))
+    if society_id:
+        entry = PresenceEntry(
+            visit_id=visit.id,
+            visitor_id=visit.visitor_id,
+            society_id=society_id,
+            building_id=visit.host.building_id if visit.host else None,
+            visitor_name=visit.visitor.full_name,
+            visitor_phone=visit.visitor.phone,
+            host_name=visit.host.full_name if visit.host else "",
+            purpose=visit.purpose or "",
+            checked_in_at=visit.actual_arrival,
+        )
+        after_commit(db, lambda: record_check_in(entry))
+        after_commit(db, lambda: journal_check_in(entry))
+    pushed, host_id = notification_to_dict(notif), visit.host_id
+    record_new_notification(db, host_id)
+    after_commit(db, lambda: publish(host_id, pushed))
     return visit
 
 
 async def approve_visit(db: AsyncSession, visit: Visit) -> Visit:
     """
-    Approve a pending visit (resident or admin).
+    Approve a pending visit (resident or admin) with one conditional UPDATE.
     For walk-ins: resident approval = permission to enter, so we auto check-in (no guard action).
     """
     if visit.status != VisitStatus.PENDING:
         raise ValueError(f"Cannot approve visit with status {visit.status.value}")
-    visit.status = VisitStatus.APPROVED
-    await db.flush()
+    visit = await transition_visit(db, visit.id, VisitStatus.PENDING, VisitStatus.APPROVED)
+    visit_id = visit.id
+    after_commit(db, lambda: pass_index.set_status(visit_id, VisitStatus.APPROVED))
 
     # Walk-in: resident approved = allow entry; auto check-in so guard does not need a separate action
     extra = visit.extra_data or {}
     if extra.get("walkin") is True:
-        await db.refresh(visit, ["visitor", "host"])
         try:
             visit = await checkin_visit(db, visit)
         except ValueError:
@@ -331,62 +514,41 @@ async def approve_visit(db: AsyncSession, visit: Visit) -> Visit:
 
 
 async def checkout_visit(db: AsyncSession, visit: Visit) -> Visit:
-    """Check-out a visit."""
-    visit.status = VisitStatus.CHECKED_OUT
-    visit.actual_departure = datetime.utcnow()
-    await db.flush()
+    """Check-out a visit with one conditional UPDATE. Raises VisitTransitionError if already checked out."""
+    visit = await transition_visit(
+        db, visit.id, visit.status, VisitStatus.CHECKED_OUT, actual_departure=datetime.utcnow()
+    )
+    visit_id = visit.id
+    after_commit(db, lambda: pass_index.discard(visit_id))
+    society_id = await _visit_society_id(db, visit)  # same legacy fallback as check-in
+    after_commit(db, lambda: record_check_out(visit_id))
+    after_commit(db, lambda: journal_check_out(visit_id, society_id))
     return visit
 
 
 async def get_dashboard_stats(db: AsyncSession, society_id: Optional[UUID] = None) -> dict:
-    """Get dashboard statistics. Optionally filter by host's society_id."""
-    today = datetime.utcnow().date()
-
-    # Visitors today (unique)
-    vt_q = select(func.count(func.distinct(Visit.visitor_id))).select_from(Visit)
+    """Dashboard statistics. Per society this reads the maintained counters; platform-wide it counts visits."""
     if society_id:
-        vt_q = vt_q.join(User, Visit.host_id == User.id).where(User.society_id == society_id)
-    vt_q = vt_q.where(func.date(Visit.created_at) == today)
-    visitors_today = await db.execute(vt_q)
-    vt = visitors_today.scalar() or 0
+        return await get_society_stats(db, society_id)
+    return await count_visits(db)
 
-    # Pending
-    p_q = select(func.count(Visit.id)).select_from(Visit)
-    if society_id:
-        p_q = p_q.join(User, Visit.host_id == User.id).where(User.society_id == society_id)
-    p_q = p_q.where(Visit.status == VisitStatus.PENDING)
-    pending = await db.execute(p_q)
-    p = pending.scalar() or 0
-
-    # Checked in
-    ci_q = select(func.count(Visit.id)).select_from(Visit)
-    if society_id:
-        ci_q = ci_q.join(User, Visit.host_id == User.id).where(User.society_id == society_id)
-    ci_q = ci_q.where(Visit.status == VisitStatus.CHECKED_IN)
-    checked_in = await db.execute(ci_q)
-    ci = checked_in.scalar() or 0
 
-    return {"visitors_today": vt, "pending_approvals": p, "checked_in": ci}
-
-
-async def list_visits(
+async def list_visits_page(
     db: AsyncSession,
     limit: int = 50,
     offset: int = 0,
     status: Optional[str] = None,
     host_id: Optional[UUID] = None,
     society_id: Optional[UUID] = None,
-) -> list[Visit]:
-    """List visits with optional status, host_id, and society_id filter. Eager-loads visitor and host."""
-    q = (
-        select(Visit)
-        .options(selectinload(Visit.visitor), selectinload(Visit.host))
-        .order_by(Visit.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-    )
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    One page of visits, newest first, with optional status, host_id, and society_id filter.
+    Keyset-paged when cursor is given (raises ValueError if malformed), else offset. Eager-loads visitor and host.
+    """
+    q = select(Visit).options(selectinload(Visit.visitor), selectinload(Visit.host))
     if society_id:
-        q = q.join(User, Visit.host_id == User.id).where(User.society_id == society_id)
+        q = q.where(Visit.society_id == society_id)
     if status:
         try:
             status_enum = VisitStatus(status)
@@ -395,10 +557,53 @@ async def list_visits(
             pass
     if host_id:
         q = q.where(Visit.host_id == host_id)
-    result = await db.execute(q)
-    return list(result.scalars().unique().all())
+    return await paginate(db, q, Visit.created_at, Visit.id, limit, cursor=cursor, offset=offset)
+
+
+async def list_visits(
+    db: AsyncSession,
+    limit: int = 50,
+    offset: int = 0,
+    status: Optional[str] = None,
+    host_id: Optional[UUID] = None,
+    society_id: Optional[UUID] = None,
+) -> list[Visit]:
+    """List visits with optional status, host_id, and society_id filter. Eager-loads visitor and host."""
+    page = await list_visits_page(db, limit, offset, status, host_id, society_id)
+    return page.items
 
 
-async def get_checked_in_visitors(db: AsyncSession, society_id: Optional[UUID] = None) -> list[Visit]:
-    """Get all currently checked-in visits (for muster/emergency export). Optionally filter by society."""
-    return await list_visits(db, limit=500, status="checked_in", society_id=society_id)
+MUSTER_FIELDS = ["visitor_name", "visitor_phone", "host_name", "purpose", "checkin_time"]
+MUSTER_FETCH_SIZE = 500  # rows per round trip; server-side cursor on PostgreSQL
+
+
+async def iter_muster_rows(db: AsyncSession, society_id: Optional[UUID] = None) -> AsyncIterator[dict]:
+    """
+    Everyone currently checked in (emergency muster), newest first, as flat rows. No cap: rows are fetched
+    MUSTER_FETCH_SIZE at a time and yielded as they arrive, so memory stays constant however many are inside.
+    """
+    q = (
+        select(
+            Visitor.full_name.label("visitor_name"),
+            Visitor.phone.label("visitor_phone"),
+            User.full_name.label("host_name"),
+            Visit.purpose,
+            Visit.actual_arrival,
+        )
+        .join(Visitor, Visit.visitor_id == Visitor.id)
+        .outerjoin(User, Visit.host_id == User.id)
+        .where(Visit.status == VisitStatus.CHECKED_IN)
+        .order_by(Visit.created_at.desc())  # served by the (society_id, status, created_at) index, no sort step
+        .execution_options(yield_per=MUSTER_FETCH_SIZE)
+    )
+    if society_id:
+        q = q.where(Visit.society_id == society_id)
+    result = await db.stream(q)
+    async for row in result:
+        yield {
+            "visitor_name": row.visitor_name,
+            "visitor_phone": row.visitor_phone,
+            "host_name": row.host_name or "",
+            "purpose": row.purpose or "",
+            "checkin_time": row.actual_arrival.isoformat() if row.actual_arrival else "",
+        }
@@ -0,0 +1,64 @@
+"""
+Visit state machine: every transition is one conditional UPDATE ... RETURNING.
+The WHERE clause pins (id, expected current status), so two guards scanning the same pass cannot both
+check it in: the loser's UPDATE matches no row and fails cleanly, without row locks or a prior SELECT.
+"""
+from typing import Any, Optional
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.visitor import Visit, VisitStatus
+from app.services.visit_counters import record_transition
+
+# Allowed moves: current status -> statuses it may move to
+TRANSITIONS: dict[VisitStatus, frozenset[VisitStatus]] = {
+    VisitStatus.PENDING: frozenset({
+        VisitStatus.APPROVED, VisitStatus.CHECKED_IN, VisitStatus.CHECKED_OUT, VisitStatus.CANCELLED,
+    }),
+    VisitStatus.APPROVED: frozenset({VisitStatus.CHECKED_IN, VisitStatus.CHECKED_OUT, VisitStatus.CANCELLED}),
+    VisitStatus.CHECKED_IN: frozenset({VisitStatus.CHECKED_OUT}),
+    VisitStatus.CANCELLED: frozenset({VisitStatus.CHECKED_OUT}),
+    VisitStatus.CHECKED_OUT: frozenset(),
+}
+
+
+class VisitTransitionError(ValueError):
+    """Transition not allowed from the expected status, or the visit changed concurrently (lost race)."""
+
+    def __init__(self, message: str, current: Optional[VisitStatus] = None):
+        super().__init__(message)
+        self.current = current
+
+
+async def transition_visit(
+    db: AsyncSession,
+    visit_id: UUID,
+    expected: VisitStatus,
+    target: VisitStatus,
+    **values: Any,
+) -> Visit:
+    """
+    Move visit `visit_id` from `expected` to `target` and set `values`, in one statement.
+    Returns the updated Visit (the identity-map instance when already loaded, so eager-loaded relationships stay).
+    The society's dashboard counters move in the same transaction.
+    Raises VisitTransitionError if the move is not allowed or the row is no longer in `expected`.
+    """
+    if target not in TRANSITIONS.get(expected, frozenset()):
+        raise VisitTransitionError(
+            f"Cannot move visit from {expected.value} to {target.value}", current=expected
+        )
+    result = await db.execute(
+        update(Visit)
+        .where(Visit.id == visit_id, Visit.status == expected)
+        .values(status=target, **values)
+        .returning(Visit)
+    )
+    visit = result.scalar_one_or_none()
+    if visit is None:
+        raise VisitTransitionError(
+            f"Visit is no longer {expected.value}; it was updated by another request", current=None
+        )
+    await record_transition(db, visit.society_id, expected, target)
+    return visit
@@ -1,12 +1,37 @@
-"""WhatsApp (WAHA) integration - optional, non-blocking."""
+"""
+WhatsApp (WAHA) integration - optional, delivered through the outbox.
+Invites are queued in the outbox in the same transaction as the visit; outbox workers render them from the visit
+(invite_message) when sending and send them through waha_client (the shared outbound layer: pooled client, circuit
+breaker).
+"""
 import httpx
 import structlog
 from typing import Optional
 
+from app.core import outbound
 from app.core.config import settings
+from app.core.outbound import OutboundTarget, OutboundUnavailable
 
 logger = structlog.get_logger()
 
+WAHA_SESSION = "default"
+
+
+class DeliveryError(Exception):
+    """
+    A send that did not go through. retryable=False for requests the server will never accept (4xx);
+    attempted=False when nothing was sent because the target is known to be down (circuit open, limit reached).
+    """
+
+    def __init__(self, message: str, retryable: bool = True, attempted: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+        self.attempted = attempted
+
+
+def waha_enabled() -> bool:
+    return bool((settings.WAHA_API_URL or "").strip())
+
 
 def _normalize_phone(phone: str) -> str:
     """Convert to WAHA chatId format: 919876543210@c.us (no +)"""
@@ -18,17 +43,8 @@ def _normalize_phone(phone: str) -> str:
     return f"{digits}@c.us"
 
 
-async def send_invite_whatsapp(phone: str, visitor_name: str, otp: str, qr_code: Optional[str] = None) -> bool:
-    """
-    Send invite message via WAHA. Non-blocking; logs and returns False on failure.
-    Set WAHA_API_URL in env (e.g. http://localhost:3001/api) to enable.
-    """
-    url = (settings.WAHA_API_URL or "").rstrip("/")
-    if not url:
-        return False
-
-    chat_id = _normalize_phone(phone)
-
+def invite_message(phone: str, visitor_name: str, otp: str, qr_code: Optional[str] = None) -> dict:
+    """WAHA sendText payload for a visitor invite."""
     # Prefer QR link that opens our shared QR page in the browser.
     qr_link: Optional[str] = None
     if qr_code:
@@ -43,25 +59,46 @@ async def send_invite_whatsapp(phone: str, visitor_name: str, otp: str, qr_code:
         lines.append(f"OTP (fallback): {otp}")
         lines.append("Share this with security if QR is not working.")
 
-    text = "\n\n".join(lines)
-
-    payload = {
-        "session": "default",
-        "chatId": chat_id,
-        "text": text,
+    return {
+        "session": WAHA_SESSION,
+        "chatId": _normalize_phone(phone),
+        "text": "\n\n".join(lines),
     }
-    headers = {}
-    if settings.WAHA_API_KEY:
-        headers["X-Api-Key"] = settings.WAHA_API_KEY
-
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.post(f"{url}/sendText", json=payload, headers=headers or None)
-            if r.is_success:
-                logger.info("WhatsApp invite sent", phone=phone, visitor=visitor_name)
-                return True
-            logger.warning("WAHA send failed", status=r.status_code, body=r.text[:200])
-            return False
-    except Exception as e:
-        logger.warning("WAHA send error", error=str(e))
-        return False
+
+
+class WahaClient:
+    """WAHA calls through the shared outbound layer: one pooled client, circuit breaker, adaptive limit."""
+
+    def __init__(self, target: Optional[OutboundTarget] = None) -> None:
+        self._target = target
+
+    def _http(self) -> OutboundTarget:
+        if self._target is not None:
+            return self._target
+        headers = {"X-Api-Key": settings.WAHA_API_KEY} if settings.WAHA_API_KEY else None
+        return outbound.target(
+            "waha",
+            settings.WAHA_API_URL,
+            headers=headers,
+            timeout=settings.WAHA_TIMEOUT_SECONDS,
+            max_connections=settings.WAHA_MAX_CONNECTIONS,
+        )
+
+    async def send_text(self, payload: dict) -> None:
+        """
+        POST /sendText. Raises DeliveryError; 408, 429, 5xx, network errors and an open circuit are retryable,
+        other 4xx are not.
+        """
+        try:
+            r = await self._http().post("/sendText", json=payload)
+        except OutboundUnavailable as e:
+            raise DeliveryError(str(e), attempted=False) from e
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"{type(e).__name__}: {e}") from e
+        if r.is_success:
+            return
+        retryable = r.status_code in (408, 429) or r.status_code >= 500
+        raise DeliveryError(f"WAHA {r.status_code}: {r.text[:200]}", retryable=retryable)
+
+
+waha_client = WahaClient()
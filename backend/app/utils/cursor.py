@@ -0,0 +1,20 @@
+"""Opaque (timestamp, id) cursors for keyset pagination and sync."""
+import base64
+from datetime import datetime
+from uuid import UUID
+
+
+def encode_cursor(ts: datetime, row_id: UUID) -> str:
+    """Encode a (timestamp, id) position as a URL-safe opaque string."""
+    raw = f"{ts.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Decode a cursor from encode_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts_str, id_str = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(ts_str), UUID(id_str)
+    except Exception:
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,69 @@
+"""
+Keyset pagination on (created_at DESC, id DESC) with opaque cursors.
+A cursor page seeks straight to its position through a (..., created_at, id) index, so page 500 costs what
+page 1 does. Offset paging is kept for existing clients; totals are an optional extra COUNT.
+"""
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy import and_, or_, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils.cursor import encode_cursor, decode_cursor
+
+
+@dataclass
+class Page:
+    items: list[Any]
+    next_cursor: Optional[str]
+    total: Optional[int] = None
+
+    def total_pages(self, page_size: int) -> Optional[int]:
+        if self.total is None:
+            return None
+        return (self.total + page_size - 1) // page_size
+
+
+def keyset_after(query: Select, created_col, id_col, cursor: str) -> Select:
+    """
+    Restrict query to rows after cursor in (created_at DESC, id DESC) order. Raises ValueError if malformed.
+    Written as a range on created_at plus a tie-break so the index range scan starts at the cursor.
+    """
+    after_ts, after_id = decode_cursor(cursor)
+    return query.where(
+        and_(
+            created_col <= after_ts,
+            or_(created_col < after_ts, id_col < after_id),
+        )
+    )
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    created_col,
+    id_col,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    count_query: Optional[Select] = None,
+) -> Page:
+    """
+    Run query newest first and return one page of ORM rows.
+    cursor takes precedence over offset. next_cursor is None on the last page.
+    total is only computed when count_query is given. Raises ValueError on a malformed cursor.
+    """
+    q = query.order_by(created_col.desc(), id_col.desc())
+    if cursor:
+        q = keyset_after(q, created_col, id_col, cursor)
+    elif offset:
+        q = q.offset(offset)
+    result = await db.execute(q.limit(limit + 1))
+    items = list(result.scalars().unique().all())
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    total = (await db.scalar(count_query) or 0) if count_query is not None else None
+    return Page(items=items, next_cursor=next_cursor, total=total)
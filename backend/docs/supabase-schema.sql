@@ -26,6 +26,7 @@ CREATE TABLE IF NOT EXISTS societies (
   society_type VARCHAR(100),
   registration_year VARCHAR(10),
   documents_note VARCHAR(500),
+  max_occupancy INTEGER,
   plan VARCHAR(50) DEFAULT 'basic',
   status VARCHAR(50) DEFAULT 'active',
   is_active BOOLEAN NOT NULL DEFAULT true,
@@ -37,6 +38,7 @@ CREATE INDEX IF NOT EXISTS idx_societies_slug ON societies(slug);
 CREATE INDEX IF NOT EXISTS idx_societies_contact_email ON societies(contact_email);
 CREATE INDEX IF NOT EXISTS idx_societies_city ON societies(city);
 CREATE INDEX IF NOT EXISTS idx_societies_registration_number ON societies(registration_number);
+CREATE INDEX IF NOT EXISTS ix_societies_created_at_id ON societies(created_at, id);  -- keyset pagination
 
 -- ----------------------------------------------------------------
 -- 2. Buildings (within a society)
@@ -84,6 +86,7 @@ CREATE INDEX IF NOT EXISTS idx_users_building_id ON users(building_id);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_keycloak_id ON users(keycloak_id);
 CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone);
+CREATE INDEX IF NOT EXISTS ix_users_created_at_id ON users(created_at, id);  -- keyset pagination
 
 -- ----------------------------------------------------------------
 -- 4. Visitors (no society_id; scoping is via host’s society)
@@ -107,12 +110,13 @@ CREATE INDEX IF NOT EXISTS idx_visitors_phone ON visitors(phone);
 CREATE INDEX IF NOT EXISTS idx_visitors_email ON visitors(email);
 
 -- ----------------------------------------------------------------
--- 5. Visits (scoping via host.society_id in app logic)
+-- 5. Visits (society_id copied from the host at creation)
 -- ----------------------------------------------------------------
 CREATE TABLE IF NOT EXISTS visits (
   id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
   visitor_id UUID NOT NULL REFERENCES visitors(id) ON DELETE CASCADE,
   host_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  society_id UUID REFERENCES societies(id) ON DELETE SET NULL,
   status VARCHAR(20) NOT NULL DEFAULT 'pending',
   purpose VARCHAR(255),
   expected_arrival TIMESTAMPTZ,
@@ -134,6 +138,25 @@ CREATE INDEX IF NOT EXISTS idx_visits_host_id ON visits(host_id);
 CREATE INDEX IF NOT EXISTS idx_visits_status ON visits(status);
 CREATE INDEX IF NOT EXISTS idx_visits_qr_code ON visits(qr_code);
 CREATE INDEX IF NOT EXISTS idx_visits_otp ON visits(otp);
+-- OTPs are unique per society among live passes; gate lookup is (society_id, otp)
+CREATE INDEX IF NOT EXISTS ix_visits_society_id_otp ON visits(society_id, otp);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_visits_society_id_otp_live ON visits(society_id, otp)
+  WHERE status IN ('pending', 'approved') AND otp IS NOT NULL;
+-- Guard-device delta sync (changes since cursor)
+CREATE INDEX IF NOT EXISTS ix_visits_society_id_updated_at ON visits(society_id, updated_at);
+-- Society-scoped lists, muster and counts (see docs/VISIT_QUERY_PLANS.md)
+CREATE INDEX IF NOT EXISTS ix_visits_society_id_status_created_at ON visits(society_id, status, created_at);
+CREATE INDEX IF NOT EXISTS ix_visits_society_id_created_at ON visits(society_id, created_at);
+
+-- Dashboard counters per society (maintained by visit transitions, reconciled periodically by the API)
+CREATE TABLE IF NOT EXISTS society_visit_counters (
+  society_id UUID PRIMARY KEY REFERENCES societies(id) ON DELETE CASCADE,
+  day DATE NOT NULL,
+  visitors_today INTEGER NOT NULL DEFAULT 0,
+  pending INTEGER NOT NULL DEFAULT 0,
+  checked_in INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
 
 -- ----------------------------------------------------------------
 -- 6. Consent logs (DPDP compliance)
@@ -183,6 +206,61 @@ CREATE TABLE IF NOT EXISTS notifications (
 );
 
 CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id);
+CREATE INDEX IF NOT EXISTS ix_notifications_user_id_created_at_id ON notifications(user_id, created_at, id);  -- keyset pagination
+CREATE INDEX IF NOT EXISTS ix_notifications_user_id_read_created_at_id ON notifications(user_id, read, created_at, id);  -- unread page + count
+CREATE INDEX IF NOT EXISTS ix_notifications_read_created_at ON notifications(read, created_at);  -- retention
+
+-- Read notifications past their retention TTL, moved here in batches by the retention job
+CREATE TABLE IF NOT EXISTS notification_archive (
+  id UUID PRIMARY KEY,
+  user_id UUID NOT NULL,
+  type VARCHAR(50) NOT NULL,
+  title VARCHAR(255) NOT NULL,
+  body TEXT,
+  extra_data TEXT,
+  created_at TIMESTAMPTZ NOT NULL,
+  archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_notification_archive_user_id_created_at ON notification_archive(user_id, created_at);
+
+-- Society notices: stored once, merged into each member's notification list at read time
+CREATE TABLE IF NOT EXISTS society_notices (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  society_id UUID NOT NULL REFERENCES societies(id) ON DELETE CASCADE,
+  title VARCHAR(255) NOT NULL,
+  body TEXT,
+  created_by UUID REFERENCES users(id) ON DELETE SET NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_society_notices_society_id_created_at ON society_notices(society_id, created_at);
+
+-- Read set: a row per (notice, user) that has been read
+CREATE TABLE IF NOT EXISTS society_notice_reads (
+  notice_id UUID NOT NULL REFERENCES society_notices(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  read_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (notice_id, user_id)
+);
+
+-- Outbox: outbound messages (WhatsApp invites) written with the visit, delivered by background workers
+CREATE TABLE IF NOT EXISTS outbox_messages (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  channel VARCHAR(20) NOT NULL,  -- whatsapp, whatsapp_invite
+  payload TEXT NOT NULL,  -- invites hold the contact and visit id only; sent/dead rows are purged after a few days
+  status VARCHAR(20) NOT NULL DEFAULT 'pending',  -- pending, sending, sent, dead
+  attempts INTEGER NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  claim_id UUID,
+  lease_until TIMESTAMPTZ,
+  last_error TEXT,
+  visit_id UUID,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  sent_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_outbox_messages_status_next_attempt_at ON outbox_messages(status, next_attempt_at);
 
 -- ----------------------------------------------------------------
 -- 9. Audit logs (no society_id in model)
@@ -200,6 +278,7 @@ CREATE TABLE IF NOT EXISTS audit_logs (
 CREATE INDEX IF NOT EXISTS idx_audit_logs_user_id ON audit_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs(action);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at);
+CREATE INDEX IF NOT EXISTS ix_audit_logs_created_at_id ON audit_logs(created_at, id);  -- keyset pagination
 
 -- ----------------------------------------------------------------
 -- Optional: Demo society and building (for Table Editor / testing)
@@ -242,6 +321,7 @@ ALTER TABLE societies ADD COLUMN IF NOT EXISTS registration_number VARCHAR(100);
 ALTER TABLE societies ADD COLUMN IF NOT EXISTS society_type VARCHAR(100);
 ALTER TABLE societies ADD COLUMN IF NOT EXISTS registration_year VARCHAR(10);
 ALTER TABLE societies ADD COLUMN IF NOT EXISTS documents_note VARCHAR(500);
+ALTER TABLE societies ADD COLUMN IF NOT EXISTS max_occupancy INTEGER;
 ALTER TABLE societies ADD COLUMN IF NOT EXISTS address VARCHAR(500);
 -- Create buildings table if missing (run the buildings CREATE TABLE from above first)
 -- Add building_id to users
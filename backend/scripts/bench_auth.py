@@ -0,0 +1,101 @@
+"""
+Per-request cost of bearer-token auth, before and after the verification cache.
+Each simulated request verifies its token --per-request times (chained dependencies, WebSocket handshake), with
+--users distinct tokens in rotation, for a local (HS256) and a Keycloak-style token:
+- before: the old flow (HS256 decode attempt, then a second decode for non-local tokens), no cache
+- decode: the current decode (HS256 only for HS256 tokens), cache off
+- cached: verify_token with the cache on (first request per token misses)
+Usage: python -m scripts.bench_auth [--requests 20000] [--users 500] [--per-request 2]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+sys.path.insert(0, ".")
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from jose import JWTError, jwt  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.token_cache import TokenCache  # noqa: E402
+
+
+def legacy_decode(token: str) -> dict:
+    """verify_token as it was: always try HS256 first, decode again when it is not ours."""
+    jwt.get_unverified_header(token)
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"], options={"verify_aud": False})
+        if payload.get("iss") == security.LOCAL_JWT_ISSUER:
+            payload.setdefault("user_id", payload.get("sub"))
+            return payload
+    except JWTError:
+        pass
+    return jwt.decode(
+        token,
+        key="",
+        options={"verify_signature": False},
+        audience=settings.JWT_AUDIENCE,
+        algorithms=[settings.JWT_ALGORITHM],
+    )
+
+
+def make_tokens(kind: str, users: int) -> list[str]:
+    if kind == "local":
+        return [
+            security.create_access_token(str(uuid.uuid4()), f"u{i}@example.com", ["resident"],
+                                         society_id=str(uuid.uuid4()))
+            for i in range(users)
+        ]
+    # Keycloak signs with its realm RSA key; verification here does not check it, only the alg header matters
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    exp = int(time.time()) + 3600
+    return [
+        jwt.encode(
+            {"sub": str(uuid.uuid4()), "iss": "https://keycloak.example/realms/vms", "aud": settings.JWT_AUDIENCE,
+             "exp": exp, "realm_access": {"roles": ["resident"]}},
+            key,
+            algorithm="RS256",
+        )
+        for _ in range(users)
+    ]
+
+
+async def run(tokens: list[str], requests: int, per_request: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        token = tokens[i % len(tokens)]
+        for _ in range(per_request):
+            await security.verify_token(token)
+    return (time.perf_counter() - started) * 1e6 / requests
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--per-request", type=int, default=2)
+    args = parser.parse_args()
+
+    original_decode = security._decode_token
+    print(f"{args.requests} requests, {args.users} tokens, {args.per_request} verifications per request")
+    print(f"{'token':<10}{'before us/req':>15}{'decode us/req':>15}{'cached us/req':>15}{'hit rate':>10}")
+    for kind in ("local", "keycloak"):
+        tokens = make_tokens(kind, args.users)
+        security.token_cache = TokenCache(0, 1)
+        security._decode_token = legacy_decode
+        before = await run(tokens, args.requests, args.per_request)
+        security._decode_token = original_decode
+        decode = await run(tokens, args.requests, args.per_request)
+        cache = security.token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_TTL_SECONDS or 300, args.users * 2)
+        cached = await run(tokens, args.requests, args.per_request)
+        print(f"{kind:<10}{before:>15.1f}{decode:>15.1f}{cached:>15.1f}{cache.stats()['hit_rate']:>10.2%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
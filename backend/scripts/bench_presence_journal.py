@@ -0,0 +1,74 @@
+"""
+Replay time of the presence journal after a month of gate traffic.
+Writes --days of check-ins (each checked out the same day except --inside people) into a throwaway journal,
+then opens it fresh as a restarted worker would and reports replay time, with and without compaction.
+Usage: python -m scripts.bench_presence_journal [--days 30] [--per-day 2000] [--inside 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, ".")
+
+from app.core.config import settings  # noqa: E402
+from app.services.presence import PresenceEntry  # noqa: E402
+from app.services.presence_journal import PresenceJournal  # noqa: E402
+
+
+def _write_month(path: str, compact_bytes: int, days: int, per_day: int, inside: int) -> PresenceJournal:
+    journal = PresenceJournal(path, compact_bytes)
+    journal.open()
+    society_id = uuid.uuid4()
+    start = datetime.utcnow() - timedelta(days=days)
+    present: list[PresenceEntry] = []
+    for day in range(days):
+        for i in range(per_day):
+            entry = PresenceEntry(
+                visit_id=uuid.uuid4(), visitor_id=uuid.uuid4(), society_id=society_id, building_id=uuid.uuid4(),
+                visitor_name=f"Visitor {i}", visitor_phone=f"9{i:09d}", host_name="Host Name", purpose="Delivery",
+                checked_in_at=start + timedelta(days=day, seconds=i * 30),
+            )
+            journal.check_in(entry)
+            present.append(entry)
+        for entry in present[:-inside]:
+            journal.check_out(entry.visit_id, society_id)
+        present = present[-inside:]
+    journal.close()
+    return journal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=2000)
+    parser.add_argument("--inside", type=int, default=200)
+    args = parser.parse_args()
+    records = args.days * args.per_day * 2
+    print(f"{args.days} days x {args.per_day} visits/day ({records} records), {args.inside} inside at the end")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, compact_bytes in (
+            ("compacted", settings.PRESENCE_JOURNAL_COMPACT_BYTES),
+            ("never compacted", 1 << 40),
+        ):
+            path = os.path.join(tmp, label.replace(" ", "-"))
+            started = time.perf_counter()
+            writer = _write_month(path, compact_bytes, args.days, args.per_day, args.inside)
+            write_s = time.perf_counter() - started
+            replayer = PresenceJournal(path, compact_bytes)
+            replayer.open()
+            stats = replayer.stats()
+            replayer.close()
+            print(
+                f"{label:>16}: file {stats['bytes'] / 1024:.0f} KiB, {writer.compactions} compactions, "
+                f"append {write_s / records * 1e6:.1f} us/record, replay {stats['replay_ms']:.2f} ms "
+                f"({stats['inside']} inside)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+End-to-end push latency through the Redis backplane: publish on one process, delivered into SSE stream queues held
+by --workers other processes (as uvicorn workers would). Each user's stream lives on exactly one worker.
+Reports publish -> stream-queue latency percentiles. Needs a reachable Redis at REDIS_URL.
+Usage: python -m scripts.bench_push_latency [--workers 4] [--messages 2000] [--rate 500] [--users 400]
+       python -m scripts.bench_push_latency --local   (same path with the in-process backplane, for a baseline)
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, ".")
+
+from app.core import notification_ws  # noqa: E402
+from app.core.backplane import InProcessBackplane, RedisBackplane  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+
+async def _consume(queue: asyncio.Queue, latencies: list[float], done: asyncio.Event, expected: int) -> None:
+    while True:
+        payload = await queue.get()
+        if payload is None:
+            return
+        latencies.append((time.time() - payload["sent_at"]) * 1000)
+        if len(latencies) >= expected:
+            done.set()
+
+
+async def _worker(url: str, channel: str, users: list[str], expected: int, ready, results, timeout: float) -> None:
+    backplane = RedisBackplane(url, channel, notification_ws.deliver_local)
+    await backplane.start()
+    latencies: list[float] = []
+    done = asyncio.Event()
+    consumers = [
+        asyncio.create_task(_consume(notification_ws.subscribe(uuid.UUID(u)), latencies, done, expected))
+        for u in users
+    ]
+    while not backplane.connected:
+        await asyncio.sleep(0.01)
+    ready.release()
+    if expected:
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    for task in consumers:
+        task.cancel()
+    await backplane.stop()
+    results.put(latencies)
+
+
+def _run_worker(*args) -> None:
+    asyncio.run(_worker(*args))
+
+
+async def _publish(backplane, users: list[str], plan: list[int], rate: int) -> None:
+    interval = 1.0 / rate if rate else 0.0
+    started = time.perf_counter()
+    for i, target in enumerate(plan):
+        notification = {"id": str(uuid.uuid4()), "sent_at": time.time()}
+        backplane.publish([uuid.UUID(users[target])], [], {"event": "notification", "payload": notification})
+        delay = started + (i + 1) * interval - time.perf_counter()
+        await asyncio.sleep(max(delay, 0))
+    while getattr(backplane, "_outgoing", None) is not None and not backplane._outgoing.empty():
+        await asyncio.sleep(0.01)
+
+
+async def _publisher(url: str, channel: str, users: list[str], plan: list[int], rate: int) -> None:
+    backplane = RedisBackplane(url, channel, lambda user_ids, rooms, frame: None)
+    await backplane.start()
+    await _publish(backplane, users, plan, rate)
+    await asyncio.sleep(0.1)
+    await backplane.stop()
+
+
+async def _local(users: list[str], plan: list[int], rate: int) -> list[float]:
+    backplane = InProcessBackplane(notification_ws.deliver_local)
+    latencies: list[float] = []
+    done = asyncio.Event()
+    consumers = [
+        asyncio.create_task(_consume(notification_ws.subscribe(uuid.UUID(u)), latencies, done, len(plan)))
+        for u in users
+    ]
+    await _publish(backplane, users, plan, rate)
+    await asyncio.wait_for(done.wait(), 30)
+    for task in consumers:
+        task.cancel()
+    return latencies
+
+
+def _report(label: str, latencies: list[float], sent: int) -> None:
+    latencies.sort()
+    if not latencies:
+        print(f"{label}: nothing delivered")
+        return
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    print(
+        f"{label}: delivered {len(latencies)}/{sent}  p50 {pct(50):.2f} ms  p95 {pct(95):.2f} ms  "
+        f"p99 {pct(99):.2f} ms  max {latencies[-1]:.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rate", type=int, default=500, help="messages per second (0 = as fast as possible)")
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--local", action="store_true", help="in-process backplane, single process")
+    args = parser.parse_args()
+
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    rng = random.Random(7)
+    plan = [rng.randrange(args.users) for _ in range(args.messages)]
+
+    if args.local:
+        _report("local", asyncio.run(_local(users, plan, args.rate)), len(plan))
+        return
+
+    channel = f"vms:bench:{uuid.uuid4().hex[:8]}"
+    ctx = mp.get_context("spawn")
+    ready = ctx.Semaphore(0)
+    results = ctx.Queue()
+    procs = []
+    timeout = 10 + (args.messages / args.rate if args.rate else 0)
+    for w in range(args.workers):
+        owned = [i for i in range(args.users) if i % args.workers == w]
+        expected = sum(1 for target in plan if target % args.workers == w)
+        proc = ctx.Process(
+            target=_run_worker,
+            args=(settings.REDIS_URL, channel, [users[i] for i in owned], expected, ready, results, timeout),
+        )
+        proc.start()
+        procs.append(proc)
+    for _ in procs:
+        if not ready.acquire(timeout=15):
+            print(f"Workers could not subscribe; is Redis reachable at {settings.REDIS_URL}?")
+            for proc in procs:
+                proc.terminate()
+            sys.exit(1)
+
+    asyncio.run(_publisher(settings.REDIS_URL, channel, users, plan, args.rate))
+    latencies: list[float] = []
+    for _ in procs:
+        latencies.extend(results.get(timeout=timeout + 5))
+    for proc in procs:
+        proc.join()
+    _report(f"redis, {args.workers} workers", latencies, len(plan))
+
+
+if __name__ == "__main__":
+    main()
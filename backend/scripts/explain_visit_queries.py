@@ -0,0 +1,157 @@
+"""
+Print query plans for the society-scoped visit queries, before (users join) and after (visits.society_id).
+Builds a throwaway SQLite database with synthetic visits and runs ANALYZE, so plans reflect real statistics.
+Usage: python -m scripts.explain_visit_queries [--societies 50] [--visits 40000]
+Output is what docs/VISIT_QUERY_PLANS.md records.
+"""
+import argparse
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, create_engine, desc, event, func, select, text
+
+sys.path.insert(0, ".")
+
+import app.models  # noqa: F401,E402 - ensure all models registered
+from app.core.database import Base, VISITS_EXTRA_INDEXES  # noqa: E402
+from app.models import Society, User, Visit, Visitor  # noqa: E402
+from app.models.visitor import VisitStatus  # noqa: E402
+
+# Indexes that did not exist before visits.society_id was denormalized
+NEW_INDEXES = [
+    "ix_visits_society_id_status_created_at",
+    "ix_visits_society_id_created_at",
+]
+
+
+def _seed(conn, societies: int, visits: int) -> uuid.UUID:
+    now = datetime.utcnow()
+    society_ids = [uuid.uuid4() for _ in range(societies)]
+    conn.execute(Society.__table__.insert(), [
+        {"id": sid, "name": f"Society {i}", "slug": f"society-{i}", "contact_email": f"s{i}@example.com"}
+        for i, sid in enumerate(society_ids)
+    ])
+    hosts = [(uuid.uuid4(), sid) for sid in society_ids for _ in range(20)]
+    conn.execute(User.__table__.insert(), [
+        {"id": uid, "email": f"{uid}@example.com", "full_name": "Host", "role": "resident", "society_id": sid}
+        for uid, sid in hosts
+    ])
+    visitor_ids = [uuid.uuid4() for _ in range(visits // 4)]
+    conn.execute(Visitor.__table__.insert(), [
+        {"id": vid, "phone": f"9{i:09d}", "full_name": "Visitor"} for i, vid in enumerate(visitor_ids)
+    ])
+    statuses = [VisitStatus.CHECKED_OUT] * 16 + [VisitStatus.CHECKED_IN, VisitStatus.PENDING,
+                                                  VisitStatus.APPROVED, VisitStatus.CANCELLED]
+    rows = []
+    for _ in range(visits):
+        host_id, sid = random.choice(hosts)
+        created = now - timedelta(minutes=random.randint(0, 60 * 24 * 90))
+        rows.append({
+            "id": uuid.uuid4(), "visitor_id": random.choice(visitor_ids), "host_id": host_id, "society_id": sid,
+            "status": random.choice(statuses), "created_at": created, "updated_at": created,
+        })
+    conn.execute(Visit.__table__.insert(), rows)
+    conn.execute(text("ANALYZE"))
+    return society_ids[0]
+
+
+def _queries(society_id: uuid.UUID, after: bool) -> dict:
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    def scoped(q):
+        if after:
+            return q.where(Visit.society_id == society_id)
+        return q.join(User, Visit.host_id == User.id).where(User.society_id == society_id)
+
+    if after:
+        counts = (
+            select(Visit.society_id, func.count(Visit.id).label("visit_count"))
+            .where(Visit.society_id.is_not(None))
+            .group_by(Visit.society_id)
+            .subquery()
+        )
+        top = (
+            select(Society.id, Society.name, counts.c.visit_count)
+            .outerjoin(counts, counts.c.society_id == Society.id)
+            .order_by(desc(func.coalesce(counts.c.visit_count, 0)))
+            .limit(5)
+        )
+    else:
+        top = (
+            select(Society.id, Society.name, func.count(Visit.id).label("visit_count"))
+            .outerjoin(User, User.society_id == Society.id)
+            .outerjoin(Visit, Visit.host_id == User.id)
+            .group_by(Society.id, Society.name)
+            .order_by(desc("visit_count"))
+            .limit(5)
+        )
+    return {
+        "list_visits (society, status=pending)": scoped(select(Visit.id))
+        .where(Visit.status == VisitStatus.PENDING)
+        .order_by(Visit.created_at.desc()).limit(50),
+        "list_visits (society, no status)": scoped(select(Visit.id)).order_by(Visit.created_at.desc()).limit(50),
+        "iter_muster_rows (muster)": scoped(select(Visit.id))
+        .where(Visit.status == VisitStatus.CHECKED_IN)
+        .order_by(Visit.created_at.desc()),
+        "dashboard: pending count": scoped(select(func.count(Visit.id))).where(Visit.status == VisitStatus.PENDING),
+        "dashboard: visitors today": scoped(select(func.count(func.distinct(Visit.visitor_id))))
+        .where(Visit.created_at >= today_start),
+        "admin top_societies": top,
+        "get_society_detail: visitors this month": scoped(select(func.count(Visit.id)))
+        .where(and_(Visit.created_at >= month_start)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--societies", type=int, default=50)
+    parser.add_argument("--visits", type=int, default=40000)
+    args = parser.parse_args()
+    random.seed(7)
+
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _explain(conn, cursor, statement, parameters, context, executemany):
+        if context.execution_options.get("explain"):
+            statement = "EXPLAIN QUERY PLAN " + statement
+        return statement, parameters
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        society_id = _seed(conn, args.societies, args.visits)
+    print(f"SQLite {engine.dialect.dbapi.sqlite_version}, {args.societies} societies, {args.visits} visits, ANALYZEd")
+
+    for label, after in (("BEFORE", False), ("AFTER", True)):
+        with engine.begin() as conn:
+            for name, _ in VISITS_EXTRA_INDEXES:
+                if name in NEW_INDEXES:
+                    if after:
+                        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {dict(VISITS_EXTRA_INDEXES)[name]}"))
+                    else:
+                        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.execute(text("ANALYZE"))
+            print(f"\n===== {label} =====")
+            for name, stmt in _queries(society_id, after).items():
+                result = conn.execute(stmt, execution_options={"explain": True})
+                print(f"\n-- {name}")
+                for row in result.cursor.fetchall():
+                    print("  " * _depth(row) + row[-1])
+
+
+_parents: dict[int, int] = {}
+
+
+def _depth(row) -> int:
+    """Indent level for an EXPLAIN QUERY PLAN row (id, parent, notused, detail)."""
+    node, parent = row[0], row[1]
+    _parents[node] = _parents.get(parent, -1) + 1 if parent else 0
+    return _parents[node]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Local WAHA stand-in for load tests: accepts POST /api/sendText like WAHA, after a configurable latency, failing a
+configurable share of requests (503 by default, so the outbox retries them). GET /stats reports what it received.
+Usage: python -m scripts.waha_stub [--port 3001] [--latency-ms 150] [--jitter-ms 100] [--fail-rate 0.05]
+                                   [--fail-status 503]
+Then run the API with WAHA_API_URL=http://localhost:3001/api and invite visitors as usual.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def build_app(latency_ms: float, jitter_ms: float, fail_rate: float, fail_status: int) -> FastAPI:
+    app = FastAPI(title="WAHA stub")
+    stats = {"received": 0, "sent": 0, "failed": 0, "chats": set(), "started": time.time()}
+
+    @app.post("/api/sendText")
+    async def send_text(request: Request):
+        payload = await request.json()
+        stats["received"] += 1
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if not payload.get("chatId") or not payload.get("text"):
+            stats["failed"] += 1
+            return JSONResponse({"error": "chatId and text are required"}, status_code=400)
+        if random.random() < fail_rate:
+            stats["failed"] += 1
+            return JSONResponse({"error": "stub failure"}, status_code=fail_status)
+        stats["sent"] += 1
+        stats["chats"].add(payload["chatId"])
+        return {"id": f"stub_{stats['sent']}", "chatId": payload["chatId"]}
+
+    @app.get("/stats")
+    async def get_stats():
+        elapsed = time.time() - stats["started"]
+        return {
+            "received": stats["received"],
+            "sent": stats["sent"],
+            "failed": stats["failed"],
+            "distinct_chats": len(stats["chats"]),
+            "per_second": round(stats["received"] / elapsed, 2) if elapsed else None,
+        }
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests that fail (0-1)")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+    app = build_app(args.latency_ms, args.jitter_ms, args.fail_rate, args.fail_status)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
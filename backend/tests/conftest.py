@@ -1,3 +1,33 @@
 # Pytest fixtures for VMS backend
 import os
 os.environ["AUTH_DEMO_MODE"] = "true"
+
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    """Fresh file-backed SQLite schema per test; separate sessions really are separate connections."""
+    import app.models  # noqa: F401 - ensure all models registered
+    from app.core.database import Base
+    from app.core.notification_ws import coalescer
+    from app.core.token_cache import token_cache
+    from app.services.blacklist_cache import blacklist_cache
+    from app.services.pass_index import pass_index
+    from app.services.presence import presence_registry
+    from app.services.unread_counts import unread_counts
+    from app.services.visit_counters import counter_mirror
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{(tmp_path / 'test.db').as_posix()}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    pass_index.clear()
+    presence_registry.clear()
+    blacklist_cache.invalidate()
+    counter_mirror.invalidate()
+    coalescer.clear()
+    unread_counts.clear()
+    token_cache.clear()
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    await engine.dispose()
@@ -0,0 +1,64 @@
+"""
+Backplane tests: one publish reaches every worker's local streams; Redis messages round-trip and an unreachable
+Redis still delivers on the publishing worker.
+Run: pytest tests/test_backplane.py -v (from backend dir).
+"""
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from app.core.backplane import InProcessBackplane, RedisBackplane, create_backplane
+
+
+class Worker:
+    """Stands in for one worker's deliver_local()."""
+
+    def __init__(self):
+        self.delivered = []
+
+    def __call__(self, user_ids, rooms, frame):
+        self.delivered.append((user_ids, rooms, frame))
+
+
+def test_create_backplane_rejects_unknown_kind():
+    assert isinstance(create_backplane("local", Worker()), InProcessBackplane)
+    assert isinstance(create_backplane("redis", Worker(), "redis://localhost:6379/0", "ch"), RedisBackplane)
+    with pytest.raises(ValueError):
+        create_backplane("kafka", Worker())
+
+
+def test_redis_message_round_trip_delivers_on_each_worker():
+    workers = [Worker() for _ in range(4)]
+    backplanes = [RedisBackplane("redis://localhost:6379/0", "ch", w) for w in workers]
+    user_ids = [uuid4(), uuid4()]
+    frame = {"event": "notification", "payload": {"id": "n1", "title": "Visitor at gate"}}
+    raw = backplanes[0].encode(user_ids, ["society:x"], frame, sent_at=0.0)
+    for backplane in backplanes:  # what each worker's listener does with the one channel message
+        backplane.handle(raw.encode())
+    assert all(w.delivered == [(user_ids, ["society:x"], frame)] for w in workers)
+    assert backplanes[3].stats()["received"] == 1
+
+    backplanes[0].handle(b"not json")
+    backplanes[0].handle(b'{"t": 1, "u": ["not-a-uuid"], "r": [], "f": {}}')
+    assert backplanes[0].errors == 2
+    assert len(workers[0].delivered) == 1
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_still_delivers_locally():
+    worker = Worker()
+    backplane = RedisBackplane("redis://127.0.0.1:1/0", "ch", worker)
+    await backplane.start()
+    try:
+        user_id = uuid4()
+        backplane.publish([user_id], [], {"id": "n1"})
+        for _ in range(100):
+            if worker.delivered:
+                break
+            await asyncio.sleep(0.02)
+        assert worker.delivered == [([user_id], [], {"id": "n1"})]
+        assert backplane.stats()["local_fallbacks"] == 1
+        assert backplane.stats()["connected"] is False
+    finally:
+        await backplane.stop()
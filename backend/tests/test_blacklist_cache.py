@@ -0,0 +1,101 @@
+"""
+Blacklist cache tests: Bloom filter membership, per-society cache with hit/miss counters, cross-worker invalidation.
+Run: pytest tests/test_blacklist_cache.py -v (from backend dir).
+"""
+from uuid import uuid4
+
+import pytest
+
+from app.core import notification_ws
+from app.models import Society, User, Visitor
+from app.services import blacklist_service
+from app.services.blacklist_cache import BlacklistCache, BloomFilter, blacklist_cache
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class FakeSession:
+    """Counts queries; returns the configured visitor ids for any blacklist SELECT."""
+
+    def __init__(self, visitor_ids):
+        self.visitor_ids = visitor_ids
+        self.queries = 0
+
+    async def execute(self, _stmt):
+        self.queries += 1
+        return FakeResult([(vid,) for vid in self.visitor_ids])
+
+
+def test_bloom_filter_has_no_false_negatives():
+    items = [uuid4() for _ in range(500)]
+    bloom = BloomFilter(len(items))
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(uuid4() in bloom for _ in range(2000))
+    assert false_positives < 100
+
+
+@pytest.mark.asyncio
+async def test_negative_lookups_need_no_db_round_trip_after_build():
+    banned = uuid4()
+    society_id = uuid4()
+    db = FakeSession([banned])
+    cache = BlacklistCache(ttl_seconds=60)
+
+    assert await cache.contains(db, society_id, banned) is True
+    for _ in range(50):
+        assert await cache.contains(db, society_id, uuid4()) is False
+
+    assert db.queries == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 50
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_rebuild():
+    society_id = uuid4()
+    visitor_id = uuid4()
+    db = FakeSession([])
+    cache = BlacklistCache(ttl_seconds=60)
+    assert await cache.contains(db, society_id, visitor_id) is False
+
+    db.visitor_ids = [visitor_id]
+    cache.invalidate(society_id)
+    assert await cache.contains(db, society_id, visitor_id) is True
+    assert db.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_blacklisting_on_another_worker_invalidates_this_one(session_factory, monkeypatch):
+    sent = []
+    monkeypatch.setattr(blacklist_service, "publish_sync", lambda event, payload: sent.append((event, payload)))
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        guard = User(email="guard@example.com", full_name="Guard", role="guard", society_id=society.id)
+        visitor = Visitor(phone="9000000001", full_name="Visitor")
+        db.add_all([guard, visitor])
+        await db.commit()
+        assert await blacklist_cache.contains(db, society.id, visitor.id) is False  # cached "no"
+
+        await blacklist_service.add_to_blacklist(db, visitor.id, "Trespass", guard.id, society.id)
+        assert sent == []  # nothing leaves the worker before commit
+        await db.commit()
+    assert sent == [(blacklist_service.BLACKLIST_SYNC_EVENT, {"society_id": str(society.id)})]
+
+    # The receiving worker: its cached "no" is dropped and the next check sees the new row
+    async with session_factory() as db:
+        other = FakeSession([])
+        assert await blacklist_cache.contains(other, society.id, visitor.id) is False
+        event, payload = sent[0]
+        notification_ws.deliver_local([], [], {"event": event, "payload": payload})
+        assert await blacklist_cache.contains(db, society.id, visitor.id) is True
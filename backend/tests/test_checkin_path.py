@@ -0,0 +1,86 @@
+"""
+Check-in write path: statement budget for a warm gate scan (pass index and blacklist cache populated).
+Run: pytest tests/test_checkin_path.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, select
+
+from app.api.checkin import _checkin_and_respond
+from app.models import AuditLog, Building, ConsentLog, Notification, Society, User, Visitor, Visit
+from app.models.visitor import VisitStatus
+from app.services.visit_service import find_pass_by_otp
+
+# pass lookup (index) 0 + joined SELECT 1 + blacklist (cache) 0 + UPDATE ... RETURNING 1
+# + UPDATE society_visit_counters 1 + INSERT consent_logs 1 + INSERT notifications 1 + INSERT audit_logs 1
+WARM_CHECKIN_STATEMENTS = 6
+
+
+async def seed(session_factory):
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        building = Building(society_id=society.id, name="Tower B")
+        db.add(building)
+        await db.flush()
+        host = User(
+            email="host@example.com", full_name="Host", role="resident",
+            society_id=society.id, building_id=building.id, flat_number="B-402",
+        )
+        admin = User(email="chair@example.com", full_name="Chair", role="chairman", society_id=society.id)
+        db.add_all([host, admin])
+        await db.flush()
+        expires = datetime.utcnow() + timedelta(minutes=30)
+        for i, otp in enumerate(["111111", "222222"]):
+            visitor = Visitor(phone=f"900000000{i}", full_name=f"Visitor {i}")
+            db.add(visitor)
+            await db.flush()
+            db.add(Visit(
+                visitor_id=visitor.id, host_id=host.id, society_id=society.id,
+                status=VisitStatus.APPROVED, otp=otp, qr_code=f"VMS-{otp}", otp_expires_at=expires,
+            ))
+        await db.commit()
+        return society.id, admin.id
+
+
+async def scan(db, society_id, admin_id, otp):
+    current_user = {
+        "user_id": str(admin_id),
+        "society_id": str(society_id),
+        "realm_access": {"roles": ["chairman"]},
+    }
+    request = SimpleNamespace(url=SimpleNamespace(path="/api/v1/checkin/otp"), method="POST")
+    gate_pass = await find_pass_by_otp(db, otp, society_id)
+    return await _checkin_and_respond(
+        request, db, current_user, admin_id, gate_pass.visit_id,
+        "checkin_otp", "Check-in successful", 403,
+    )
+
+
+@pytest.mark.asyncio
+async def test_warm_otp_checkin_statement_budget(session_factory):
+    society_id, admin_id = await seed(session_factory)
+    async with session_factory() as db:
+        await scan(db, society_id, admin_id, "111111")  # warms pass index + blacklist cache
+        await db.commit()
+
+        statements = []
+        engine = db.bind.sync_engine
+        listener = lambda conn, cursor, stmt, *args: statements.append(stmt)  # noqa: E731
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = await scan(db, society_id, admin_id, "222222")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        await db.commit()
+
+        assert len(statements) == WARM_CHECKIN_STATEMENTS, statements
+        assert response.building_name == "Tower B"
+        assert response.host_flat_number == "B-402"
+
+        for model in (ConsentLog, Notification, AuditLog):
+            rows = (await db.execute(select(model))).scalars().all()
+            assert len(rows) == 2
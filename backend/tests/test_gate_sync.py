@@ -0,0 +1,172 @@
+"""
+Guard-device sync tests: manifest signature (verified as a device would), delta cursor, offline check-in
+reconciliation.
+Run: pytest tests/test_gate_sync.py -v (from backend dir).
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+from uuid import uuid4
+
+from app.models import Society, User, Visitor, Visit
+from app.models.visitor import VisitStatus
+from app.schemas.gate_sync import GateDeltaResponse, GateManifestResponse, GateSigningKeyResponse
+from app.services.gate_sync_service import (
+    build_delta,
+    build_manifest,
+    hash_code,
+    public_key,
+    reconcile_offline_checkins,
+    verify_payload,
+)
+
+
+def as_received(model, payload: dict) -> dict:
+    """The response body a device gets: serialized through the route's response model, then parsed."""
+    return json.loads(json.dumps(model.model_validate(payload).model_dump(mode="json")))
+
+
+def device_verifies(key: dict, body: dict) -> bool:
+    """Independent of the server helpers: raw Ed25519 key + canonical JSON of the body without signature."""
+    body = dict(body)
+    signature = body.pop("signature")
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    unb64 = lambda s: base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))  # noqa: E731
+    try:
+        Ed25519PublicKey.from_public_bytes(unb64(key["public_key"])).verify(unb64(signature), canonical)
+    except Exception:
+        return False
+    return True
+
+
+async def seed_pass(session_factory, status=VisitStatus.APPROVED):
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        host = User(email="host@example.com", full_name="Host", role="resident", society_id=society.id)
+        visitor = Visitor(phone="9000000001", full_name="Visitor")
+        db.add_all([host, visitor])
+        await db.flush()
+        visit = Visit(
+            visitor_id=visitor.id,
+            host_id=host.id,
+            society_id=society.id,
+            status=status,
+            otp="123456",
+            qr_code="VMS-abc",
+            otp_expires_at=datetime.utcnow() + timedelta(hours=1),
+        )
+        db.add(visit)
+        await db.commit()
+        return society.id, visit.id
+
+
+@pytest.mark.asyncio
+async def test_manifest_is_signed_and_hashes_codes(session_factory):
+    society_id, visit_id = await seed_pass(session_factory)
+    async with session_factory() as db:
+        manifest = as_received(GateManifestResponse, await build_manifest(db, society_id))
+        delta = as_received(GateDeltaResponse, await build_delta(db, society_id, None))
+    key = as_received(GateSigningKeyResponse, public_key(society_id))
+    assert key["algorithm"] == "Ed25519" and manifest["key_id"] == key["key_id"]
+    assert device_verifies(key, manifest) and device_verifies(key, delta)
+
+    (entry,) = manifest["passes"]
+    assert entry["visit_id"] == str(visit_id)
+    assert entry["qr_hash"] == hash_code(society_id, "qr", "VMS-abc") and entry["has_otp"]
+    assert "123456" not in json.dumps(manifest) and "otp_hash" not in entry  # OTPs are not published at all
+    signature = manifest.pop("signature")
+    assert verify_payload(key["public_key"], manifest, signature)
+    manifest["passes"] = []
+    assert not device_verifies(key, {**manifest, "signature": signature})
+    other = as_received(GateSigningKeyResponse, public_key(uuid4()))
+    assert not device_verifies(other, {**delta})
+
+
+@pytest.mark.asyncio
+async def test_offline_checkin_then_delta_removes_pass(session_factory):
+    society_id, visit_id = await seed_pass(session_factory)
+    async with session_factory() as db:
+        cursor = (await build_manifest(db, society_id))["cursor"]
+        assert (await build_delta(db, society_id, cursor))["removals"] == []
+
+    scanned_at = datetime.now(timezone.utc)
+    async with session_factory() as db:
+        outcome = await reconcile_offline_checkins(db, society_id, [
+            {"visit_id": visit_id, "scanned_at": scanned_at, "method": "qr", "code": "VMS-abc", "consent_given": True},
+            {"visit_id": visit_id, "scanned_at": scanned_at, "method": "otp", "code": "123456", "consent_given": True},
+        ])
+        await db.commit()
+    assert (outcome["checked_in"], outcome["duplicates"], outcome["rejected"]) == (1, 1, 0)
+
+    async with session_factory() as db:
+        delta = await build_delta(db, society_id, cursor)
+        visit = await db.get(Visit, visit_id)
+    assert delta["removals"] == [visit_id]
+    assert visit.status == VisitStatus.CHECKED_IN
+
+
+@pytest.mark.asyncio
+async def test_delta_returns_a_change_that_commits_with_an_older_stamp(session_factory):
+    society_id, visit_id = await seed_pass(session_factory)
+    async with session_factory() as db:
+        cursor = (await build_manifest(db, society_id))["cursor"]
+    stamped_at = datetime.utcnow()  # a cancellation flushes here but has not committed yet
+
+    async with session_factory() as db:  # meanwhile another pass is issued and the device pulls
+        first = await db.get(Visit, visit_id)
+        db.add(Visit(
+            visitor_id=first.visitor_id, host_id=first.host_id, society_id=society_id, status=VisitStatus.APPROVED,
+            qr_code="VMS-def", otp_expires_at=datetime.utcnow() + timedelta(hours=1),
+        ))
+        await db.commit()
+        delta = await build_delta(db, society_id, cursor)
+    assert len(delta["upserts"]) == 2 and delta["removals"] == []
+
+    async with session_factory() as db:  # the cancellation commits, stamped before what the device already has
+        visit = await db.get(Visit, visit_id)
+        visit.status, visit.updated_at = VisitStatus.CANCELLED, stamped_at
+        await db.commit()
+        late = await build_delta(db, society_id, delta["cursor"])
+    assert late["removals"] == [visit_id]
+
+
+@pytest.mark.asyncio
+async def test_offline_checkin_requires_the_pass_code(session_factory):
+    society_id, visit_id = await seed_pass(session_factory)
+    scanned_at = datetime.utcnow()
+    async with session_factory() as db:
+        outcome = await reconcile_offline_checkins(db, society_id, [
+            {"visit_id": visit_id, "scanned_at": scanned_at, "method": "otp", "code": "654321", "consent_given": True},
+            {"visit_id": visit_id, "scanned_at": scanned_at, "method": "otp", "code": "VMS-abc", "consent_given": True},
+        ])
+    assert outcome["rejected"] == 2 and outcome["checked_in"] == 0
+    assert {r["detail"] for r in outcome["results"]} == {"Code does not match this pass"}
+
+
+@pytest.mark.asyncio
+async def test_offline_checkin_after_expiry_is_rejected(session_factory):
+    society_id, visit_id = await seed_pass(session_factory)
+    async with session_factory() as db:
+        outcome = await reconcile_offline_checkins(db, society_id, [
+            {"visit_id": visit_id, "scanned_at": datetime.utcnow() + timedelta(hours=2), "method": "otp",
+             "code": "123456", "consent_given": True},
+        ])
+    assert outcome["checked_in"] == 1  # a scan "from the future" is judged at upload time instead
+    async with session_factory() as db:
+        visit = await db.get(Visit, visit_id)
+        visit.otp_expires_at = datetime.utcnow() - timedelta(hours=2)  # beyond GATE_SYNC_MAX_SCAN_AGE_MINUTES
+        visit.status = VisitStatus.APPROVED
+        await db.commit()
+        # Backdating the scan to when the pass was still valid does not revive it
+        outcome = await reconcile_offline_checkins(db, society_id, [
+            {"visit_id": visit_id, "scanned_at": datetime.utcnow() - timedelta(days=1), "method": "qr",
+             "code": "VMS-abc", "consent_given": True},
+        ])
+    assert outcome["rejected"] == 1
+    assert outcome["results"][0]["detail"] == "Pass had expired at scan time"
@@ -0,0 +1,57 @@
+"""
+Muster export tests: every checked-in visitor is streamed (no row cap), scoped by society.
+Run: pytest tests/test_muster_stream.py -v (from backend dir).
+"""
+from datetime import datetime
+
+import pytest
+
+from app.models import Society, User
+from app.models.visitor import Visit, Visitor, VisitStatus
+from app.services import visit_service
+from app.services.visit_service import iter_muster_rows
+
+
+async def seed(session_factory, inside: int):
+    async with session_factory() as db:
+        ours = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        theirs = Society(name="Blue Hill", slug="blue-hill", contact_email="bh@example.com")
+        db.add_all([ours, theirs])
+        await db.flush()
+        host = User(email="host@example.com", full_name="Host", role="resident", society_id=ours.id)
+        other = User(email="other@example.com", full_name="Other", role="resident", society_id=theirs.id)
+        visitor = Visitor(phone="9000000001", full_name="Visitor")
+        db.add_all([host, other, visitor])
+        await db.flush()
+        now = datetime.utcnow()
+        db.add_all([
+            Visit(visitor_id=visitor.id, host_id=host.id, society_id=ours.id,
+                  status=VisitStatus.CHECKED_IN, actual_arrival=now)
+            for _ in range(inside)
+        ])
+        db.add(Visit(visitor_id=visitor.id, host_id=host.id, society_id=ours.id, status=VisitStatus.PENDING))
+        db.add(Visit(visitor_id=visitor.id, host_id=other.id, society_id=theirs.id,
+                     status=VisitStatus.CHECKED_IN, actual_arrival=now))
+        await db.commit()
+        return ours.id
+
+
+@pytest.mark.asyncio
+async def test_muster_streams_past_fetch_size(session_factory, monkeypatch):
+    monkeypatch.setattr(visit_service, "MUSTER_FETCH_SIZE", 50)
+    society_id = await seed(session_factory, inside=620)  # more than the old 500-row cap
+    async with session_factory() as db:
+        rows = [row async for row in iter_muster_rows(db, society_id=society_id)]
+    assert len(rows) == 620
+    assert set(rows[0]) == set(visit_service.MUSTER_FIELDS)
+    assert rows[0]["host_name"] == "Host"
+    assert rows[0]["checkin_time"]
+
+
+@pytest.mark.asyncio
+async def test_muster_unscoped_includes_every_society(session_factory):
+    await seed(session_factory, inside=3)
+    async with session_factory() as db:
+        rows = [row async for row in iter_muster_rows(db)]
+    assert len(rows) == 4
+    assert sum(row["host_name"] == "Other" for row in rows) == 1
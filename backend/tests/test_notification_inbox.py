@@ -0,0 +1,117 @@
+"""
+Notification inbox tests: keyset pages across notifications and society notices, cached unread badge, mark-all-read.
+Run: pytest tests/test_notification_inbox.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Notification, Society, SocietyNoticeRead, User
+from app.services.notification_service import (
+    create_society_notice,
+    get_unread_count,
+    list_user_notifications_page,
+    mark_all_notifications_read,
+    mark_notification_read,
+    record_new_notification,
+)
+from app.services.unread_counts import UnreadCountCache, unread_counts
+
+
+async def seed_inbox(session_factory, personal: int = 5, notices: int = 3):
+    """A resident with `personal` notifications and `notices` society notices, interleaved a minute apart."""
+    now = datetime.utcnow()
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        user = User(email="r@example.com", full_name="Resident", role="resident", society_id=society.id,
+                    created_at=now - timedelta(days=1))
+        db.add(user)
+        await db.flush()
+        for i in range(personal):
+            db.add(Notification(user_id=user.id, type="visitor_arrived", title=f"n{i}",
+                                created_at=now - timedelta(minutes=2 * i + 1)))
+        for i in range(notices):
+            notice = await create_society_notice(db, society.id, f"s{i}", None)
+            notice.created_at = now - timedelta(minutes=2 * i + 2)
+        await db.commit()
+        return society.id, user.id
+
+
+@pytest.mark.asyncio
+async def test_pages_walk_both_sources_newest_first(session_factory):
+    _, user_id = await seed_inbox(session_factory)
+    async with session_factory() as db:
+        seen, cursor = [], None
+        while True:
+            page = await list_user_notifications_page(db, user_id, limit=3, cursor=cursor)
+            assert len(page.items) <= 3
+            seen.extend(n["title"] for n in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert seen == ["n0", "s0", "n1", "s1", "n2", "s2", "n3", "n4"]
+
+        with pytest.raises(ValueError):
+            await list_user_notifications_page(db, user_id, cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_unread_count_is_cached_and_follows_reads(session_factory):
+    society_id, user_id = await seed_inbox(session_factory)
+    async with session_factory() as db:
+        assert await get_unread_count(db, user_id) == 8
+        misses = unread_counts.misses
+        first = (await list_user_notifications_page(db, user_id, limit=1)).items[0]
+
+        await mark_notification_read(db, user_id, UUID(first["id"]))
+        await db.commit()
+        assert await get_unread_count(db, user_id) == 7
+        await mark_notification_read(db, user_id, UUID(first["id"]))  # already read: no change
+        await db.commit()
+        assert await get_unread_count(db, user_id) == 7
+
+        db.add(Notification(user_id=user_id, type="visitor_arrived", title="new"))
+        record_new_notification(db, user_id)
+        await create_society_notice(db, society_id, "new notice", None)
+        await db.commit()
+        assert await get_unread_count(db, user_id) == 9
+        assert unread_counts.misses == misses  # every read after the first came from the cache
+
+        unread_counts.invalidate(user_id)
+        assert await get_unread_count(db, user_id) == 9  # recount agrees with the maintained value
+
+
+@pytest.mark.asyncio
+async def test_mark_all_read_covers_notifications_and_notices(session_factory):
+    _, user_id = await seed_inbox(session_factory)
+    async with session_factory() as db:
+        assert await get_unread_count(db, user_id) == 8
+        notice = (await list_user_notifications_page(db, user_id, limit=2)).items[1]
+        await mark_notification_read(db, user_id, UUID(notice["id"]))
+        await db.commit()
+
+        assert await mark_all_notifications_read(db, user_id) == 7
+        await db.commit()
+        assert await get_unread_count(db, user_id) == 0
+        assert (await list_user_notifications_page(db, user_id, unread_only=True)).items == []
+        assert await db.scalar(select(func.count()).select_from(SocietyNoticeRead)) == 3
+        assert await mark_all_notifications_read(db, user_id) == 0
+
+        unread_counts.invalidate(user_id)
+        assert await get_unread_count(db, user_id) == 0
+
+
+def test_cache_evicts_least_recently_read_users():
+    cache = UnreadCountCache(ttl_seconds=60, max_users=2)
+    a, b, c, society_id = uuid4(), uuid4(), uuid4(), uuid4()
+    cache.set(a, society_id, 1)
+    cache.set(b, society_id, 2)
+    assert cache.get(a) == 1  # a is now the most recent
+    cache.set(c, None, 3)
+    assert cache.get(b) is None and cache.evictions == 1
+    cache.apply_society(society_id, 1)
+    assert cache.get(a) == 2 and cache.get(c) == 3
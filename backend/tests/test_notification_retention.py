@@ -0,0 +1,92 @@
+"""
+Notification retention tests: per-type TTLs, read rows only, bounded batches that stop when the window closes.
+Run: pytest tests/test_notification_retention.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Notification, NotificationArchive, User
+from app.services.notification_retention import (
+    RetentionRule, in_window, retention_progress, retention_rules, run_retention,
+)
+
+RULES = [RetentionRule("walkin_pending", 30), RetentionRule("guard_note", 0), RetentionRule(None, 90)]
+
+
+async def seed_user(db) -> User:
+    user = User(email="host@example.com", full_name="Host", role="resident")
+    db.add(user)
+    await db.flush()
+    return user
+
+
+def aged(user: User, title: str, kind: str, days: int, read: bool = True) -> Notification:
+    return Notification(user_id=user.id, type=kind, title=title, read=read,
+                        created_at=datetime.utcnow() - timedelta(days=days))
+
+
+@pytest.mark.asyncio
+async def test_expired_read_notifications_move_to_archive(session_factory):
+    async with session_factory() as db:
+        user = await seed_user(db)
+        db.add_all([
+            aged(user, "old walk-in", "walkin_pending", 40),
+            aged(user, "recent walk-in", "walkin_pending", 10),
+            aged(user, "check-in, under default TTL", "visitor_arrived", 40),
+            aged(user, "old check-in", "visitor_arrived", 100),
+            aged(user, "old but unread", "visitor_arrived", 200, read=False),
+            aged(user, "kept type", "guard_note", 400),
+        ])
+        await db.commit()
+
+    assert await run_retention(session_factory, rules=RULES, pause_seconds=0, window=lambda: True) == 2
+
+    async with session_factory() as db:
+        remaining = (await db.execute(select(Notification.title).order_by(Notification.title))).scalars().all()
+        assert remaining == ["check-in, under default TTL", "kept type", "old but unread", "recent walk-in"]
+        archived = (await db.execute(select(NotificationArchive))).scalars().all()
+        assert sorted(a.title for a in archived) == ["old check-in", "old walk-in"]
+        assert all(a.user_id == user.id and a.archived_at is not None for a in archived)
+
+
+@pytest.mark.asyncio
+async def test_batches_stop_when_window_closes(session_factory):
+    async with session_factory() as db:
+        user = await seed_user(db)
+        db.add_all([aged(user, f"n{i}", "visitor_arrived", 100 + i) for i in range(5)])
+        await db.commit()
+
+    checks = iter([True, True, False])
+    stopped, batches = retention_progress.stopped_by_window, retention_progress.batches
+    moved = await run_retention(
+        session_factory, rules=[RetentionRule(None, 90)], batch_size=2, pause_seconds=0, window=lambda: next(checks),
+    )
+    assert moved == 4  # two full batches, then the window closed
+    assert retention_progress.stopped_by_window == stopped + 1
+    assert retention_progress.batches == batches + 2
+    assert retention_progress.run_archived == 4 and not retention_progress.running
+
+    async with session_factory() as db:
+        # Oldest first: the newest expired row is left for the next pass
+        assert (await db.execute(select(Notification.title))).scalars().all() == ["n0"]
+
+    skipped = retention_progress.skipped_outside_window
+    assert await run_retention(session_factory, rules=[RetentionRule(None, 90)], window=lambda: False) == 0
+    assert retention_progress.skipped_outside_window == skipped + 1
+
+
+def test_rules_and_window_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFY_RETENTION_TYPE_DAYS", "walkin_pending:7, bad, visitor_arrived:x")
+    monkeypatch.setattr(settings, "NOTIFY_RETENTION_DAYS", 60)
+    assert retention_rules() == [RetentionRule("walkin_pending", 7), RetentionRule(None, 60)]
+
+    monkeypatch.setattr(settings, "NOTIFY_RETENTION_WINDOW_HOURS", "22-5")
+    assert in_window(datetime(2026, 1, 1, 23)) and in_window(datetime(2026, 1, 1, 4))
+    assert not in_window(datetime(2026, 1, 1, 5)) and not in_window(datetime(2026, 1, 1, 12))
+    monkeypatch.setattr(settings, "NOTIFY_RETENTION_WINDOW_HOURS", "1-5")
+    assert in_window(datetime(2026, 1, 1, 1)) and not in_window(datetime(2026, 1, 1, 9))
+    monkeypatch.setattr(settings, "NOTIFY_RETENTION_WINDOW_HOURS", "")
+    assert in_window(datetime(2026, 1, 1, 9))
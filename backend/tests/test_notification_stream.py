@@ -0,0 +1,133 @@
+"""
+Notification push tests: publish() feeds SSE queues without the DB, and a Last-Event-ID resume is one catch-up query.
+Run: pytest tests/test_notification_stream.py -v (from backend dir).
+"""
+import asyncio
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.core import notification_ws
+from app.core.database import after_commit
+from app.models import Notification, Society, SocietyNotice, SocietyNoticeRead, User
+from app.services.notification_service import list_user_notifications_after, notification_to_dict
+
+
+@pytest.mark.asyncio
+async def test_publish_reaches_subscribed_stream_only_for_that_user():
+    user_id, other_id = uuid4(), uuid4()
+    queue = notification_ws.subscribe(user_id)
+    try:
+        notification_ws.publish(user_id, {"id": "a"})
+        notification_ws.publish(other_id, {"id": "b"})
+        notification_ws.publish_many([other_id, user_id], {"id": "c"})
+        notification_ws.coalescer.flush()  # "c" was held in user_id's coalescing window
+        assert [queue.get_nowait(), queue.get_nowait()] == [{"id": "a"}, {"id": "c"}]
+        assert queue.empty()
+    finally:
+        notification_ws.unsubscribe(user_id, queue)
+    assert notification_ws.stats()["sse_streams"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_stream_is_ended_on_overflow(monkeypatch):
+    monkeypatch.setattr(notification_ws, "STREAM_QUEUE_SIZE", 3)
+    user_id = uuid4()
+    queue = notification_ws.subscribe(user_id)
+    try:
+        for i in range(4):
+            notification_ws.publish(user_id, {"id": str(i)})
+        notification_ws.coalescer.flush()
+        assert queue.get_nowait() is None
+        assert queue.empty()
+    finally:
+        notification_ws.unsubscribe(user_id, queue)
+
+
+@pytest.mark.asyncio
+async def test_notification_published_only_after_commit(session_factory):
+    async with session_factory() as db:
+        user = User(email="host@example.com", full_name="Host", role="resident")
+        db.add(user)
+        await db.flush()
+        queue = notification_ws.subscribe(user.id)
+        try:
+            notif = Notification(user_id=user.id, type="visitor_arrived", title="Visitor checked in")
+            db.add(notif)
+            await db.flush()
+            pushed, user_id = notification_to_dict(notif), user.id
+            after_commit(db, lambda: notification_ws.publish(user_id, pushed))
+            assert queue.empty()
+            await db.commit()
+            assert queue.get_nowait()["id"] == str(notif.id)
+        finally:
+            notification_ws.unsubscribe(user.id, queue)
+            notification_ws.coalescer.clear()
+
+
+@pytest.mark.asyncio
+async def test_catch_up_merges_notices_after_cursor_in_order(session_factory):
+    now = datetime.utcnow()
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        user = User(email="r@example.com", full_name="Resident", role="resident",
+                    society_id=society.id, created_at=now - timedelta(days=1))
+        db.add(user)
+        await db.flush()
+        seen = Notification(user_id=user.id, type="visitor_arrived", title="seen",
+                            created_at=now - timedelta(minutes=10))
+        missed = Notification(user_id=user.id, type="visitor_arrived", title="missed",
+                              created_at=now - timedelta(minutes=5))
+        old_notice = SocietyNotice(society_id=society.id, title="old notice", created_at=now - timedelta(hours=1))
+        new_notice = SocietyNotice(society_id=society.id, title="new notice", created_at=now - timedelta(minutes=2))
+        db.add_all([seen, missed, old_notice, new_notice])
+        await db.flush()
+        db.add(SocietyNoticeRead(notice_id=new_notice.id, user_id=user.id))
+        await db.commit()
+
+    async with session_factory() as db:
+        rows = await list_user_notifications_after(db, user.id, (seen.created_at, seen.id))
+        assert [r["title"] for r in rows] == ["missed", "new notice"]
+        assert rows[1]["type"] == "society_notice"
+        assert rows[1]["read"] is True
+        assert rows[0]["read"] is False
+
+        assert len(await list_user_notifications_after(db, user.id, (seen.created_at, seen.id), limit=1)) == 1
+        assert await list_user_notifications_after(db, user.id, (new_notice.created_at, new_notice.id)) == []
+
+
+@pytest.mark.asyncio
+async def test_burst_for_one_user_is_coalesced_into_one_push(monkeypatch):
+    monkeypatch.setattr(notification_ws.coalescer, "window_seconds", 0.05)
+    user_id = uuid4()
+    queue = notification_ws.subscribe(user_id)
+    try:
+        for i in range(5):
+            notification_ws.publish(user_id, {"id": str(i), "type": "visitor_arrived"})
+        assert queue.qsize() == 1  # first one goes out at once
+        pushes = notification_ws.coalescer.pushes
+        await asyncio.sleep(0.08)
+        # SSE gets each notification; the rest went out as one push
+        assert [queue.get_nowait()["id"] for _ in range(5)] == ["0", "1", "2", "3", "4"]
+        assert notification_ws.coalescer.pushes == pushes + 1
+
+        # A gate alert is never held back
+        notification_ws.publish(user_id, {"id": "g", "type": "walkin_pending"})
+        assert queue.get_nowait()["id"] == "g"
+        await asyncio.sleep(0.08)  # window with nothing held ends
+        assert notification_ws.coalescer.stats()["open_windows"] == 0
+    finally:
+        notification_ws.unsubscribe(user_id, queue)
+        notification_ws.coalescer.clear()
+
+
+@pytest.mark.asyncio
+async def test_batch_frame_carries_ids_inline():
+    frame = notification_ws._batch_frame([{"id": "a"}, {"id": "b"}])
+    assert frame["event"] == "notification"
+    assert frame["payload"] == {"id": "b"}
+    assert frame["ids"] == ["a", "b"]
+    assert notification_ws._batch_frame([{"id": "a"}]) == {"event": "notification", "payload": {"id": "a"}}
@@ -0,0 +1,101 @@
+"""
+OTP allocation tests: live OTPs are unique per society in the database (not just in this process), a conflict
+with another worker is retried, and reservations are released on rollback.
+Run: pytest tests/test_otp_allocation.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.models import Society, User, Visitor, Visit
+from app.models.visitor import VisitStatus
+from app.services import visit_service
+from app.services.pass_index import pass_index
+from app.services.visit_service import allocate_otp, create_invitation
+
+
+async def seed_host(session_factory):
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        host = User(email="host@example.com", full_name="Host", role="resident", society_id=society.id)
+        visitor = Visitor(phone="9000000009", full_name="Earlier")
+        db.add_all([host, visitor])
+        await db.commit()
+        return society.id, host.id, visitor.id
+
+
+def other_worker_pass(society_id, host_id, visitor_id, otp, status=VisitStatus.PENDING, minutes=30) -> Visit:
+    return Visit(
+        visitor_id=visitor_id, host_id=host_id, society_id=society_id, status=status, otp=otp,
+        otp_expires_at=datetime.utcnow() + timedelta(minutes=minutes),
+    )
+
+
+@pytest.mark.asyncio
+async def test_live_otp_is_unique_in_the_database(session_factory):
+    society_id, host_id, visitor_id = await seed_host(session_factory)
+    async with session_factory() as db:
+        db.add(other_worker_pass(society_id, host_id, visitor_id, "111111"))
+        db.add(other_worker_pass(society_id, host_id, visitor_id, "222222", status=VisitStatus.CHECKED_OUT))
+        await db.commit()
+    async with session_factory() as db:
+        db.add(other_worker_pass(society_id, host_id, visitor_id, "222222"))  # only the old pass is done
+        await db.commit()
+        db.add(other_worker_pass(society_id, host_id, visitor_id, "111111"))
+        with pytest.raises(IntegrityError):
+            await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_conflict_with_another_worker_is_retried(session_factory, monkeypatch):
+    society_id, host_id, visitor_id = await seed_host(session_factory)
+    async with session_factory() as db:
+        await pass_index.ensure_loaded(db)
+        # Committed by another worker after this one loaded its index, and after our probe ran
+        db.add(other_worker_pass(society_id, host_id, visitor_id, "111111"))
+        await db.commit()
+
+    draws = iter(["111111", "333333"])
+    monkeypatch.setattr(visit_service, "_generate_otp", lambda: next(draws))
+    probe = visit_service._otp_taken_in_db
+
+    async def racing_probe(db, sid, otp):
+        return False if otp == "111111" else await probe(db, sid, otp)
+
+    monkeypatch.setattr(visit_service, "_otp_taken_in_db", racing_probe)
+    async with session_factory() as db:
+        visit = await create_invitation(db, host_id, "9000000001", "Invited")
+        await db.commit()
+    assert visit.otp == "333333"
+    assert not pass_index.otp_in_use(society_id, "111111")  # the losing reservation was released
+    assert pass_index.lookup_otp(society_id, "333333").visit_id == visit.id
+
+
+@pytest.mark.asyncio
+async def test_reservation_is_released_on_rollback(session_factory, monkeypatch):
+    society_id, _, _ = await seed_host(session_factory)
+    monkeypatch.setattr(visit_service, "_generate_otp", lambda: "444444")
+    async with session_factory() as db:
+        otp = await allocate_otp(db, society_id, datetime.utcnow() + timedelta(minutes=30))
+        assert pass_index.otp_in_use(society_id, otp)
+        await db.rollback()
+    assert not pass_index.otp_in_use(society_id, otp)
+
+
+@pytest.mark.asyncio
+async def test_expired_pass_gives_its_otp_back(session_factory, monkeypatch):
+    society_id, host_id, visitor_id = await seed_host(session_factory)
+    async with session_factory() as db:
+        stale = other_worker_pass(society_id, host_id, visitor_id, "555555", minutes=-5)
+        db.add(stale)
+        await db.commit()
+    monkeypatch.setattr(visit_service, "_generate_otp", lambda: "555555")
+    async with session_factory() as db:
+        visit = await create_invitation(db, host_id, "9000000001", "Invited")
+        await db.commit()
+        otps = dict((await db.execute(select(Visit.id, Visit.otp))).all())
+    assert visit.otp == "555555" and otps[stale.id] is None
@@ -0,0 +1,117 @@
+"""
+Outbound call layer tests: circuit breaker fails fast while a target is down, concurrency limit adapts to latency.
+Run: pytest tests/test_outbound.py -v (from backend dir).
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import outbound, security
+from app.core.outbound import AdaptiveLimit, CircuitBreaker, OutboundTarget, OutboundUnavailable
+
+
+def flaky_target(statuses: list[int], name: str = "test") -> tuple[OutboundTarget, list[httpx.Request]]:
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(statuses.pop(0) if statuses else 200, json={})
+
+    return OutboundTarget(name, "http://remote.local", transport=httpx.MockTransport(handler)), seen
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_recovers_through_one_probe(monkeypatch):
+    target, seen = flaky_target([503] * 5)
+    try:
+        for _ in range(5):
+            assert (await target.get("/ping")).status_code == 503
+        assert target.breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(OutboundUnavailable):
+            await target.get("/ping")
+        assert len(seen) == 5 and target.rejected_open == 1  # the sixth call never left the process
+
+        monkeypatch.setattr(target.breaker, "opened_at", target.breaker.opened_at - target.breaker.reset_seconds)
+        assert target.breaker.allow()  # half-open: this caller is the probe
+        assert not target.breaker.allow()  # everyone else still fails fast
+        target.breaker.abandon()
+        assert (await target.get("/ping")).status_code == 200
+        assert target.breaker.state == CircuitBreaker.CLOSED
+        stats = target.stats()
+        assert stats["breaker"]["opens"] == 1 and stats["failures"] == 5 and stats["calls"] == 6
+    finally:
+        await target.aclose()
+
+
+@pytest.mark.asyncio
+async def test_network_errors_count_and_cancellation_does_not():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    target = OutboundTarget("down", "http://remote.local", transport=httpx.MockTransport(handler))
+    try:
+        with pytest.raises(httpx.ConnectError):
+            await target.get("/")
+        assert target.failures == 1 and target.limiter.in_flight == 0
+    finally:
+        await target.aclose()
+
+    async def hang(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    target = OutboundTarget("slow", "http://remote.local", transport=httpx.MockTransport(hang))
+    try:
+        call = asyncio.create_task(target.get("/"))
+        await asyncio.sleep(0.01)
+        assert target.limiter.in_flight == 1
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert target.limiter.in_flight == 0 and target.failures == 0
+    finally:
+        await target.aclose()
+
+
+def test_limit_shrinks_on_slow_or_failed_calls_and_grows_back():
+    limit = AdaptiveLimit(initial=10, minimum=2, maximum=12, tolerance=2.0, backoff=0.5)
+    for _ in range(10):
+        assert limit.try_acquire()
+    assert not limit.try_acquire()  # at the limit: rejected, not queued
+    for _ in range(10):
+        limit.release(10.0, ok=True)
+    assert limit.stats()["baseline_ms"] == 10.0 and int(limit.limit) == 10
+
+    limit.try_acquire()
+    limit.release(50.0, ok=True)  # 5x the healthy latency
+    assert int(limit.limit) == 5
+    limit.try_acquire()
+    limit.release(10.0, ok=False)
+    limit.try_acquire()
+    limit.release(10.0, ok=False)
+    assert int(limit.limit) == 2  # never below the minimum
+
+    for _ in range(200):
+        limit.try_acquire()
+        limit.release(10.0, ok=True)
+    assert int(limit.limit) == 12  # capped at the maximum
+
+
+@pytest.mark.asyncio
+async def test_keycloak_key_is_fetched_once_through_the_outbound_layer(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/openid-configuration"):
+            return httpx.Response(200, json={"jwks_uri": "http://keycloak.local/certs"})
+        return httpx.Response(200, json={"keys": [{"x5c": ["MIIBkey"]}]})
+
+    target = OutboundTarget("keycloak", "http://keycloak.local", transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(outbound._targets, "keycloak", target)
+    monkeypatch.setattr(security, "_keycloak_public_key", None)
+    try:
+        assert await security.get_keycloak_public_key() == "MIIBkey"
+        assert await security.get_keycloak_public_key() == "MIIBkey"
+        assert target.calls == 2  # discovery + JWKS, then cached
+        assert "keycloak" in outbound.stats()
+    finally:
+        await target.aclose()
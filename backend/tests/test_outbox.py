@@ -0,0 +1,242 @@
+"""
+Outbox tests: rows are written with the caller's transaction, claimed once, retried with backoff, dead-lettered.
+Run: pytest tests/test_outbox.py -v (from backend dir).
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.outbound import OutboundTarget
+from app.core.tasks import TaskRegistry
+from app.models import OutboxMessage, OutboxStatus, Society, User, Visit, Visitor
+from app.models.visitor import VisitStatus
+from app.services import outbox
+from app.services.outbox import (
+    WHATSAPP, WHATSAPP_INVITE, OutboxWorkers, enqueue, enqueue_whatsapp_invite, invite_sender,
+)
+from app.services.waha_service import DeliveryError, WahaClient
+
+
+def make_workers(session_factory, send, max_attempts: int = 3) -> OutboxWorkers:
+    return OutboxWorkers(
+        session_factory=session_factory, senders={WHATSAPP: send}, tasks=TaskRegistry(), workers=2, batch=10,
+        poll_seconds=0.05, lease_seconds=60, max_attempts=max_attempts,
+    )
+
+
+async def rows(session_factory) -> dict[str, OutboxMessage]:
+    async with session_factory() as db:
+        return {json.loads(m.payload)["text"]: m for m in (await db.execute(select(OutboxMessage))).scalars().all()}
+
+
+@pytest.mark.asyncio
+async def test_message_is_queued_only_if_the_transaction_commits(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "WAHA_API_URL", "")
+    async with session_factory() as db:
+        assert enqueue_whatsapp_invite(db, uuid4(), "9876543210", "Asha") is None  # WAHA off: nothing queued
+
+    monkeypatch.setattr(settings, "WAHA_API_URL", "http://waha.local/api")
+    visit_id = uuid4()
+    async with session_factory() as db:
+        enqueue_whatsapp_invite(db, uuid4(), "9876543210", "Asha")
+        await db.rollback()
+        message = enqueue_whatsapp_invite(db, visit_id, "9876543210", "Ravi")
+        await db.commit()
+    assert outbox.outbox_workers._wake.is_set()  # woken after commit
+    outbox.outbox_workers._wake.clear()
+
+    async with session_factory() as db:
+        stored = (await db.execute(select(OutboxMessage))).scalars().all()
+    assert [m.id for m in stored] == [message.id]
+    assert stored[0].channel == WHATSAPP_INVITE and stored[0].visit_id == visit_id
+    # Only the contact: the pass is read from the visit at send time
+    assert json.loads(stored[0].payload) == {"visit_id": str(visit_id), "phone": "9876543210", "visitor_name": "Ravi"}
+    assert stored[0].status == OutboxStatus.PENDING.value and stored[0].attempts == 0
+
+
+@pytest.mark.asyncio
+async def test_outcomes_sent_retried_and_dead_lettered(session_factory):
+    async def send(payload: dict) -> None:
+        if payload["text"] == "flaky":
+            raise DeliveryError("WAHA 503: busy")
+        if payload["text"] == "rejected":
+            raise DeliveryError("WAHA 400: bad chatId", retryable=False)
+
+    workers = make_workers(session_factory, send, max_attempts=2)
+    async with session_factory() as db:
+        for text in ("ok", "flaky", "rejected"):
+            enqueue(db, WHATSAPP, {"text": text})
+        await db.commit()
+
+    assert await workers.claim(10) == 3
+    assert await workers.claim(10) == 0  # claimed rows are not handed out twice
+    while not workers._queue.empty():
+        await workers.deliver(workers._queue.get_nowait())
+    by_text = await rows(session_factory)
+    assert by_text["ok"].status == OutboxStatus.SENT.value and by_text["ok"].sent_at is not None
+    assert by_text["rejected"].status == OutboxStatus.DEAD.value and "400" in by_text["rejected"].last_error
+    flaky = by_text["flaky"]
+    assert flaky.status == OutboxStatus.PENDING.value and flaky.attempts == 1
+    assert flaky.next_attempt_at > datetime.utcnow() and flaky.claim_id is None
+    assert await workers.claim(10) == 0  # backing off
+
+    async with session_factory() as db:
+        row = await db.get(OutboxMessage, flaky.id)
+        row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        await db.commit()
+    assert await workers.claim(10) == 1
+    await workers.deliver(workers._queue.get_nowait())
+    flaky = (await rows(session_factory))["flaky"]
+    assert flaky.status == OutboxStatus.DEAD.value and flaky.attempts == 2  # attempts exhausted
+    assert (workers.sent, workers.retried, workers.dead) == (1, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed_and_stale_claim_cannot_record(session_factory):
+    sent = []
+
+    async def send(payload: dict) -> None:
+        sent.append(payload["text"])
+
+    workers = make_workers(session_factory, send)
+    async with session_factory() as db:
+        enqueue(db, WHATSAPP, {"text": "invite"})
+        await db.commit()
+    assert await workers.claim(10) == 1
+    stale = workers._queue.get_nowait()  # this worker "dies" before sending
+
+    async with session_factory() as db:
+        row = (await db.execute(select(OutboxMessage))).scalar_one()
+        row.lease_until = datetime.utcnow() - timedelta(seconds=1)
+        await db.commit()
+    assert await workers.claim(10) == 1
+    await workers.deliver(workers._queue.get_nowait())
+    await workers.deliver(stale)  # the old claim no longer owns the row
+    message = (await rows(session_factory))["invite"]
+    assert message.status == OutboxStatus.SENT.value and message.attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_drains_committed_rows_concurrently(session_factory):
+    active, peak = 0, 0
+
+    async def send(payload: dict) -> None:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    workers = make_workers(session_factory, send)
+    workers.start()
+    try:
+        async with session_factory() as db:
+            for i in range(6):
+                enqueue(db, WHATSAPP, {"text": f"m{i}"})
+            await db.commit()
+        workers.wake()
+        for _ in range(100):
+            if workers.sent == 6:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await workers.stop(1.0)
+    assert workers.sent == 6 and peak == 2 and not workers.running
+    assert {m.status for m in (await rows(session_factory)).values()} == {OutboxStatus.SENT.value}
+
+
+@pytest.mark.asyncio
+async def test_waha_client_classifies_failures():
+    statuses = iter([200, 503, 429, 400])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(next(statuses), json={})
+
+    target = OutboundTarget("waha-test", "http://waha.local/api", transport=httpx.MockTransport(handler))
+    client = WahaClient(target)
+    try:
+        await client.send_text({"chatId": "1@c.us", "text": "hi"})
+        for retryable in (True, True, False):
+            with pytest.raises(DeliveryError) as exc:
+                await client.send_text({"chatId": "1@c.us", "text": "hi"})
+            assert exc.value.retryable is retryable and exc.value.attempted
+    finally:
+        await target.aclose()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_defers_without_using_attempts(session_factory):
+    async def send(payload: dict) -> None:
+        raise DeliveryError("waha: circuit open", attempted=False)
+
+    workers = make_workers(session_factory, send, max_attempts=1)
+    async with session_factory() as db:
+        enqueue(db, WHATSAPP, {"text": "invite"})
+        await db.commit()
+    assert await workers.claim(10) == 1
+    await workers.deliver(workers._queue.get_nowait())
+    message = (await rows(session_factory))["invite"]
+    assert message.status == OutboxStatus.PENDING.value and message.attempts == 0
+    assert message.next_attempt_at > datetime.utcnow()
+    assert (workers.deferred, workers.dead) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_invite_is_rendered_from_the_visit_when_sent(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "FRONTEND_BASE_URL", "https://vms.example")
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        host = User(email="host@example.com", full_name="Host", role="resident", society_id=society.id)
+        visitor = Visitor(phone="9000000001", full_name="Visitor")
+        db.add_all([host, visitor])
+        await db.flush()
+        live = Visit(
+            visitor_id=visitor.id, host_id=host.id, society_id=society.id, status=VisitStatus.APPROVED,
+            otp="482913", qr_code="qr-live",
+        )
+        cancelled = Visit(
+            visitor_id=visitor.id, host_id=host.id, society_id=society.id, status=VisitStatus.CANCELLED,
+            otp="111111", qr_code="qr-cancelled",
+        )
+        db.add_all([live, cancelled])
+        await db.commit()
+    sent = []
+
+    async def send_text(payload: dict) -> None:
+        sent.append(payload)
+
+    send = invite_sender(session_factory, send_text)
+    await send({"visit_id": str(live.id), "phone": "9000000001", "visitor_name": "Visitor"})
+    assert sent[0]["chatId"] == "919000000001@c.us"
+    assert "482913" in sent[0]["text"] and "https://vms.example/qr/qr-live" in sent[0]["text"]
+    with pytest.raises(DeliveryError) as exc:  # cancelled before the send: the pass is not sent out
+        await send({"visit_id": str(cancelled.id), "phone": "9000000001", "visitor_name": "Visitor"})
+    assert exc.value.retryable is False and len(sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_only_old_finished_rows(session_factory, monkeypatch):
+    monkeypatch.setattr(outbox, "PURGE_BATCH", 2)
+    workers = make_workers(session_factory, None)
+    old = datetime.utcnow() - timedelta(days=10)
+    async with session_factory() as db:
+        for text, status, due in (
+            ("old-sent-1", OutboxStatus.SENT, old), ("old-sent-2", OutboxStatus.SENT, old),
+            ("old-dead", OutboxStatus.DEAD, old), ("recent-sent", OutboxStatus.SENT, datetime.utcnow()),
+            ("old-pending", OutboxStatus.PENDING, old),
+        ):
+            message = enqueue(db, WHATSAPP, {"text": text})
+            message.status, message.next_attempt_at = status.value, due
+        await db.commit()
+    assert await workers.purge(0) == 0  # retention disabled
+    assert await workers.purge(7) == 3
+    assert set(await rows(session_factory)) == {"recent-sent", "old-pending"}
+    assert workers.stats()["purged"] == 3
@@ -0,0 +1,53 @@
+"""
+Keyset pagination tests: cursor pages cover every row exactly once, including created_at ties.
+Run: pytest tests/test_pagination.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Society
+from app.utils.pagination import paginate
+
+
+async def seed_societies(session_factory, n=7):
+    base = datetime(2026, 1, 1)
+    async with session_factory() as db:
+        for i in range(n):
+            # pairs share a created_at so the id tie-break matters
+            db.add(Society(
+                name=f"S{i}", slug=f"s{i}", contact_email=f"s{i}@example.com",
+                created_at=base + timedelta(minutes=i // 2),
+            ))
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_match_offset_order(session_factory):
+    await seed_societies(session_factory)
+    async with session_factory() as db:
+        everything = await paginate(db, select(Society), Society.created_at, Society.id, 100)
+        seen, cursor = [], None
+        while True:
+            page = await paginate(db, select(Society), Society.created_at, Society.id, 3, cursor=cursor)
+            seen.extend(s.id for s in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert seen == [s.id for s in everything.items]
+        assert len(seen) == 7
+
+        by_offset = await paginate(
+            db, select(Society), Society.created_at, Society.id, 3, offset=3,
+            count_query=select(func.count(Society.id)),
+        )
+        assert [s.id for s in by_offset.items] == seen[3:6]
+        assert (by_offset.total, by_offset.total_pages(3)) == (7, 3)
+
+
+@pytest.mark.asyncio
+async def test_malformed_cursor_raises(session_factory):
+    async with session_factory() as db:
+        with pytest.raises(ValueError):
+            await paginate(db, select(Society), Society.created_at, Society.id, 3, cursor="not-a-cursor")
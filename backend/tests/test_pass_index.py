@@ -0,0 +1,97 @@
+"""
+Pass index tests: timer-wheel expiry and OTP/QR lookups without a database.
+Run: pytest tests/test_pass_index.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from app.models.visitor import VisitStatus
+from app.services.pass_index import PassIndex, PassRecord, TimerWheel
+
+
+SOCIETY_ID = uuid4()
+
+
+def make_record(otp="123456", qr="VMS-ABC", minutes=30, status=VisitStatus.PENDING, society_id=SOCIETY_ID):
+    return PassRecord(
+        visit_id=uuid4(),
+        host_id=uuid4(),
+        society_id=society_id,
+        status=status,
+        expires_at=datetime.utcnow() + timedelta(minutes=minutes),
+        otp=otp,
+        qr_code=qr,
+    )
+
+
+class TestTimerWheel:
+    def test_key_expires_after_deadline(self):
+        wheel = TimerWheel(tick_seconds=1, size=8)
+        now = datetime(2025, 1, 1, 8, 0, 0)
+        wheel.advance(now)
+        wheel.schedule("a", now + timedelta(seconds=3))
+        assert wheel.advance(now + timedelta(seconds=2)) == []
+        assert wheel.advance(now + timedelta(seconds=5)) == ["a"]
+        assert len(wheel) == 0
+
+    def test_deadline_beyond_one_rotation(self):
+        wheel = TimerWheel(tick_seconds=1, size=4)
+        now = datetime(2025, 1, 1, 8, 0, 0)
+        wheel.advance(now)
+        wheel.schedule("far", now + timedelta(seconds=10))
+        assert wheel.advance(now + timedelta(seconds=6)) == []
+        assert wheel.advance(now + timedelta(seconds=12)) == ["far"]
+
+    def test_cancel(self):
+        wheel = TimerWheel(tick_seconds=1, size=4)
+        now = datetime(2025, 1, 1, 8, 0, 0)
+        wheel.advance(now)
+        wheel.schedule("a", now + timedelta(seconds=1))
+        wheel.cancel("a")
+        assert wheel.advance(now + timedelta(seconds=3)) == []
+
+
+class TestPassIndex:
+    def test_lookup_by_otp_and_qr(self):
+        index = PassIndex()
+        rec = make_record()
+        index.put(rec)
+        assert index.lookup_otp(SOCIETY_ID, "123456") == rec
+        assert index.lookup_qr("VMS-ABC") == rec
+        assert index.lookup_otp(SOCIETY_ID, "000000") is None
+        assert index.stats()["hits"] == 2
+
+    def test_expired_pass_is_not_returned(self):
+        index = PassIndex()
+        index.put(make_record(minutes=-1))
+        assert index.lookup_otp(SOCIETY_ID, "123456") is None
+
+    def test_checked_in_pass_is_dropped(self):
+        index = PassIndex()
+        rec = make_record()
+        index.put(rec)
+        index.set_status(rec.visit_id, VisitStatus.APPROVED)
+        assert index.lookup_otp(SOCIETY_ID, "123456").status == VisitStatus.APPROVED
+        index.set_status(rec.visit_id, VisitStatus.CHECKED_IN)
+        assert index.lookup_otp(SOCIETY_ID, "123456") is None
+        assert index.stats()["passes"] == 0
+
+    def test_otp_is_scoped_by_society(self):
+        index = PassIndex()
+        other_society = uuid4()
+        mine = make_record(qr="VMS-MINE")
+        theirs = make_record(qr="VMS-THEIRS", society_id=other_society)
+        index.put(mine)
+        index.put(theirs)
+        assert index.lookup_otp(SOCIETY_ID, "123456") == mine
+        assert index.lookup_otp(other_society, "123456") == theirs
+        assert index.lookup_otp(uuid4(), "123456") is None
+
+    def test_reserved_otp_is_in_use_until_expiry(self):
+        index = PassIndex()
+        now = datetime.utcnow()
+        index.reserve_otp(SOCIETY_ID, "654321", now + timedelta(minutes=5))
+        assert index.otp_in_use(SOCIETY_ID, "654321")
+        assert not index.otp_in_use(uuid4(), "654321")
+        index.reserve_otp(SOCIETY_ID, "111111", now - timedelta(seconds=1))
+        assert not index.otp_in_use(SOCIETY_ID, "111111")
@@ -0,0 +1,55 @@
+"""
+QR pass token tests: signature, expiry, tampering, key rotation, legacy codes.
+Run: pytest tests/test_pass_tokens.py -v (from backend dir).
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import pass_tokens
+from app.core.pass_tokens import PassTokenError, accepts_legacy_code, issue_pass_token, verify_pass_token
+
+
+def _expires():
+    return datetime.utcnow() + timedelta(minutes=30)
+
+
+def test_round_trip():
+    visit_id, society_id = uuid.uuid4(), uuid.uuid4()
+    claims = verify_pass_token(issue_pass_token(visit_id, society_id, _expires()))
+    assert (claims.visit_id, claims.society_id) == (visit_id, society_id)
+    assert verify_pass_token(issue_pass_token(visit_id, None, _expires())).society_id is None
+
+
+def test_tampered_body_and_garbage_are_rejected():
+    token = issue_pass_token(uuid.uuid4(), uuid.uuid4(), _expires())
+    version, kid, body, sig = token.split(".")
+    other = issue_pass_token(uuid.uuid4(), uuid.uuid4(), _expires()).split(".")[2]
+    for bad in (f"{version}.{kid}.{other}.{sig}", "VP1.k0.abc.def", "VP1.nope", token + "x"):
+        with pytest.raises(PassTokenError):
+            verify_pass_token(bad)
+
+
+def test_expired_token_is_rejected():
+    token = issue_pass_token(uuid.uuid4(), uuid.uuid4(), _expires())
+    with pytest.raises(PassTokenError, match="expired"):
+        verify_pass_token(token, now=datetime.utcnow() + timedelta(hours=1))
+
+
+def test_key_rotation(monkeypatch):
+    monkeypatch.setattr(pass_tokens.settings, "QR_TOKEN_KEYS", "k1:old-secret")
+    old = issue_pass_token(uuid.uuid4(), uuid.uuid4(), _expires())
+    monkeypatch.setattr(pass_tokens.settings, "QR_TOKEN_KEYS", "k2:new-secret,k1:old-secret")
+    assert verify_pass_token(old).kid == "k1"
+    assert verify_pass_token(issue_pass_token(uuid.uuid4(), None, _expires())).kid == "k2"
+    monkeypatch.setattr(pass_tokens.settings, "QR_TOKEN_KEYS", "k2:new-secret")
+    with pytest.raises(PassTokenError):
+        verify_pass_token(old)
+
+
+def test_legacy_codes(monkeypatch):
+    assert accepts_legacy_code("VMS-0A1B2C3D4E5F")
+    assert not accepts_legacy_code("VMS-garbage")
+    monkeypatch.setattr(pass_tokens.settings, "QR_ACCEPT_LEGACY_CODES", False)
+    assert not accepts_legacy_code("VMS-0A1B2C3D4E5F")
@@ -0,0 +1,145 @@
+"""
+Presence registry tests: check-in/out keep it equal to the checked-in visits; capacity thresholds emit events.
+Run: pytest tests/test_presence.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.models import Building, Society, User, Visitor, Visit
+from app.models.visitor import VisitStatus
+from app.core import notification_ws
+from app.services import presence
+from app.services.presence import PresenceEntry, PresenceRegistry, presence_registry
+from app.services.visit_service import checkin_visit, checkout_visit
+
+
+def entry(society_id, building_id=None, visitor_id=None):
+    return PresenceEntry(
+        visit_id=uuid4(), visitor_id=visitor_id or uuid4(), society_id=society_id, building_id=building_id,
+        visitor_name="V", visitor_phone="9000000000", host_name="H", purpose="", checked_in_at=datetime.utcnow(),
+    )
+
+
+def test_capacity_events_fire_once_per_crossing(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PRESENCE_CAPACITY_THRESHOLDS", "50,100")
+    registry = PresenceRegistry()
+    events = []
+    registry.subscribe(events.append)
+    society_id = uuid4()
+    registry.set_capacity(society_id, 4)
+    inside = [entry(society_id) for _ in range(4)]
+    for e in inside[:2]:
+        registry.check_in(e)
+    assert [(ev.threshold, ev.direction) for ev in events] == [(50, "above")]
+    for e in inside[2:]:
+        registry.check_in(e)
+    registry.check_in(inside[3])  # replayed check-in is not double counted
+    assert registry.occupancy(society_id) == 4
+    assert [(ev.threshold, ev.direction) for ev in events] == [(50, "above"), (100, "above")]
+    for e in inside[:3]:
+        registry.check_out(e.visit_id)
+    assert [(ev.threshold, ev.direction) for ev in events[2:]] == [(100, "below"), (50, "below")]
+
+
+def test_building_and_visitor_counts():
+    registry = PresenceRegistry()
+    society_id, building_id, visitor_id = uuid4(), uuid4(), uuid4()
+    a, b = entry(society_id, building_id, visitor_id), entry(society_id, None, visitor_id)
+    registry.check_in(a)
+    registry.check_in(b)
+    assert registry.building_occupancy(society_id) == {building_id: 1, None: 1}
+    assert registry.muster(society_id) == [b, a]
+    registry.check_out(a.visit_id)
+    assert registry.is_inside(society_id, visitor_id)
+    registry.check_out(b.visit_id)
+    assert not registry.is_inside(society_id, visitor_id)
+    assert registry.occupancy(society_id) == 0
+    assert registry.building_occupancy(society_id) == {}
+
+
+async def seed(session_factory, visits: int):
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com", max_occupancy=10)
+        db.add(society)
+        await db.flush()
+        building = Building(society_id=society.id, name="Tower B")
+        db.add(building)
+        await db.flush()
+        host = User(email="host@example.com", full_name="Host", role="resident",
+                    society_id=society.id, building_id=building.id)
+        db.add(host)
+        await db.flush()
+        expires = datetime.utcnow() + timedelta(minutes=30)
+        ids = []
+        for i in range(visits):
+            visitor = Visitor(phone=f"900000000{i}", full_name=f"Visitor {i}")
+            db.add(visitor)
+            await db.flush()
+            visit = Visit(visitor_id=visitor.id, host_id=host.id, society_id=society.id,
+                          status=VisitStatus.APPROVED, otp_expires_at=expires)
+            db.add(visit)
+            await db.flush()
+            ids.append((visit.id, visitor.id))
+        await db.commit()
+        return society.id, building.id, ids
+
+
+@pytest.mark.asyncio
+async def test_checkin_checkout_follow_commits_and_rebuild_agrees(session_factory):
+    society_id, building_id, ids = await seed(session_factory, visits=2)
+    async with session_factory() as db:
+        await presence_registry.ensure_loaded(db)
+        for visit_id, _ in ids:
+            await checkin_visit(db, await db.get(Visit, visit_id))
+        assert presence_registry.occupancy(society_id) == 0  # not committed yet
+        await db.commit()
+        assert presence_registry.occupancy(society_id) == 2
+        assert presence_registry.building_occupancy(society_id) == {building_id: 2}
+        assert presence_registry.capacity(society_id) == 10
+
+        await checkout_visit(db, await db.get(Visit, ids[0][0]))
+        await db.commit()
+    assert not presence_registry.is_inside(society_id, ids[0][1])
+    assert presence_registry.is_inside(society_id, ids[1][1])
+
+    live = [e.visit_id for e in presence_registry.muster(society_id)]
+    presence_registry.clear()
+    async with session_factory() as db:
+        await presence_registry.ensure_loaded(db)
+    assert [e.visit_id for e in presence_registry.muster(society_id)] == live == [ids[1][0]]
+
+
+def test_other_workers_changes_arrive_over_the_backplane(monkeypatch):
+    """A check-in committed on another worker reaches this registry; only the committing worker announces."""
+    monkeypatch.setattr("app.core.config.settings.PRESENCE_CAPACITY_THRESHOLDS", "50,100")
+    events, sent = [], []
+    presence_registry.subscribe(events.append)
+    monkeypatch.setattr(notification_ws, "publish_sync", lambda event, payload: sent.append((event, payload)))
+    monkeypatch.setattr(presence, "publish_sync", notification_ws.publish_sync)
+    try:
+        society_id = uuid4()
+        presence.record_capacity(society_id, 2)
+        mine, theirs = entry(society_id), entry(society_id, building_id=uuid4())
+        # As the other worker would broadcast it (JSON over Redis): crosses 50% there, so it is not announced here
+        remote = {"origin": "other-worker", "op": "in", "entry": theirs.as_sync()}
+        notification_ws.deliver_local([], [], {"event": presence.PRESENCE_SYNC_EVENT, "payload": remote})
+        assert presence_registry.muster(society_id) == [theirs] and events == []
+        presence.record_check_in(mine)
+        assert presence_registry.occupancy(society_id) == 2
+        assert [(e.threshold, e.direction) for e in events] == [(100, "above")]
+        assert [e.threshold for e in presence_registry.events_for(society_id)] == [50, 100]
+
+        for event, payload in sent:  # our own broadcasts come back and are ignored
+            notification_ws.deliver_local([], [], {"event": event, "payload": payload})
+        assert presence_registry.occupancy(society_id) == 2 and presence_registry.capacity(society_id) == 2
+
+        notification_ws.deliver_local([], [], {"event": presence.PRESENCE_SYNC_EVENT, "payload": {
+            "origin": "other-worker", "op": "out", "visit_id": str(theirs.visit_id),
+        }})
+        presence.record_check_out(mine.visit_id)
+        assert presence_registry.occupancy(society_id) == 0
+        assert [(e.threshold, e.direction) for e in events] == [(100, "above"), (50, "below")]
+    finally:
+        presence_registry._listeners.remove(events.append)
@@ -0,0 +1,141 @@
+"""
+Presence journal tests: workers sharing one file see each other's appends and compactions; the failsafe muster
+falls back to the journal when the DB does not answer.
+Run: pytest tests/test_presence_journal.py -v (from backend dir).
+"""
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.api import dashboard
+from app.services import presence_journal as journal_module
+from app.services.presence import PresenceEntry
+from app.services.presence_journal import PresenceJournal
+
+
+def entry(society_id, minutes_ago=0):
+    return PresenceEntry(
+        visit_id=uuid4(), visitor_id=uuid4(), society_id=society_id, building_id=None,
+        visitor_name="Visitor", visitor_phone="9000000000", host_name="Host", purpose="Delivery",
+        checked_in_at=datetime.utcnow() - timedelta(minutes=minutes_ago),
+    )
+
+
+def open_journal(path, compact_bytes=1 << 20):
+    journal = PresenceJournal(str(path), compact_bytes)
+    journal.open()
+    return journal
+
+
+def test_workers_share_appends_and_compactions(tmp_path):
+    path = tmp_path / "presence.journal"
+    a, b = open_journal(path, compact_bytes=4096), open_journal(path, compact_bytes=4096)
+    society_id = uuid4()
+    inside = []
+    for i in range(200):  # enough traffic to compact several times
+        e = entry(society_id)
+        (a if i % 2 else b).check_in(e)
+        inside.append(e)
+        if len(inside) > 5:
+            gone = inside.pop(0)
+            (b if i % 2 else a).check_out(gone.visit_id, society_id)
+    assert a.compactions + b.compactions > 0
+    expected = {e.visit_id for e in inside}
+    assert {e.visit_id for e in a.inside(society_id)} == expected
+    assert {e.visit_id for e in b.inside(society_id)} == expected
+    fresh = open_journal(path)
+    assert {e.visit_id for e in fresh.inside()} == expected
+    assert fresh.inside(uuid4()) == []
+    assert fresh.inside(society_id)[0].visitor_name == "Visitor"
+    for journal in (a, b, fresh):
+        journal.close()
+
+
+def test_snapshot_keeps_appends_made_after_position(tmp_path):
+    journal = open_journal(tmp_path / "presence.journal")
+    society_id = uuid4()
+    stale, from_db, late = entry(society_id), entry(society_id, minutes_ago=5), entry(society_id)
+    journal.check_in(stale)  # e.g. checked out on a worker without the journal: the DB snapshot drops it
+    since = journal.position()
+    journal.check_in(late)  # committed while the DB was being read
+    journal.snapshot([from_db], since=since)
+    assert [e.visit_id for e in journal.inside(society_id)] == [late.visit_id, from_db.visit_id]
+    journal.close()
+
+
+@pytest.mark.asyncio
+async def test_failsafe_muster_falls_back_to_journal(tmp_path, monkeypatch):
+    journal = open_journal(tmp_path / "presence.journal")
+    society_id = uuid4()
+    journal.check_in(entry(society_id))
+    monkeypatch.setattr(dashboard, "presence_journal", journal)
+    monkeypatch.setattr(dashboard.settings, "MUSTER_DB_TIMEOUT_SECONDS", 0.05)
+
+    async def hung_db(*args):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(dashboard, "_muster_from_db", hung_db)
+    request = SimpleNamespace(url=SimpleNamespace(path="/api/v1/dashboard/muster/failsafe"), method="GET")
+    current_user = {"user_id": str(uuid4()), "society_id": str(society_id), "realm_access": {"roles": ["guard"]}}
+    result = await dashboard.get_muster_failsafe(request, current_user, uuid4())
+    assert result["source"] == "journal"
+    assert result["count"] == 1
+    journal.close()
+
+
+def test_commit_hooks_write_on_the_writer_thread_in_order(tmp_path, monkeypatch):
+    journal = open_journal(tmp_path / "presence.journal")
+    writer = journal_module.JournalWriter(on_drain=journal_module.sync_journal)
+    monkeypatch.setattr(journal_module, "presence_journal", journal)
+    monkeypatch.setattr(journal_module, "journal_writer", writer)
+    threads = set()
+    append = journal._append
+
+    def recording_append(*args):
+        threads.add(threading.current_thread().name)
+        append(*args)
+
+    monkeypatch.setattr(journal, "_append", recording_append)
+    society_id = uuid4()
+    stays, legacy = entry(society_id), entry(society_id)
+    for e in (stays, legacy):
+        journal_module.journal_check_in(e)
+    journal_module.journal_check_out(legacy.visit_id, None)  # legacy visit without a society is still checked out
+    writer.flush()
+    assert threads == {"presence-journal"}
+    assert 1 <= journal.stats()["syncs"] <= 3  # at least once per drain, not necessarily per append
+    assert [e.visit_id for e in journal.inside(society_id)] == [stays.visit_id]
+    writer.stop()
+    journal.close()
+
+
+def test_journal_append_failure_is_contained(monkeypatch):
+    broken = SimpleNamespace(is_open=True, errors=0)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    broken.check_in = broken.check_out = fail
+    writer = journal_module.JournalWriter()
+    monkeypatch.setattr(journal_module, "presence_journal", broken)
+    monkeypatch.setattr(journal_module, "journal_writer", writer)
+    journal_module.journal_check_in(entry(uuid4()))
+    journal_module.journal_check_out(uuid4(), uuid4())
+    writer.flush()
+    assert broken.errors == 2
+    writer.stop()
+
+
+def test_full_write_queue_drops_instead_of_blocking():
+    writer = journal_module.JournalWriter(maxsize=1)
+    release = threading.Event()
+    writer.submit(release.wait)  # occupies the thread
+    writer.submit(lambda: None)  # fills the queue (the first one may not have been taken yet)
+    writer.submit(lambda: None)
+    assert writer.dropped >= 1
+    release.set()
+    writer.stop()
@@ -0,0 +1,99 @@
+"""
+Push dispatcher tests: classification, bulk fan-out not delaying gate alerts, per-class metrics, and sockets
+sending higher-priority frames first.
+Run: pytest tests/test_push_dispatch.py -v (from backend dir).
+"""
+import asyncio
+import json
+from uuid import uuid4
+
+import pytest
+
+from app.core.dispatcher import Priority, PushDispatcher, PushJob, classify
+from app.core.notification_ws import ConnectionManager
+from app.core.tasks import TaskRegistry
+
+
+def test_classify():
+    assert classify({"event": "notification", "payload": {"type": "walkin_pending"}}) == Priority.GATE
+    assert classify({"event": "notification", "payload": {"type": "visitor_arrived"}}) == Priority.TRANSACTIONAL
+    assert classify({"event": "notification", "payload": {"type": "society_notice"}}) == Priority.BULK
+    assert classify({"event": "capacity_threshold", "payload": {}}) == Priority.GATE
+
+
+def recording_fanout(log):
+    def fanout(job, chunk):
+        for i, member in enumerate(job.rooms):
+            log.append((job.frame["name"], member))
+            if (i + 1) % chunk == 0:
+                yield
+    return fanout
+
+
+def job(priority, name, members):
+    return PushJob(priority, [], members, {"name": name})
+
+
+@pytest.mark.asyncio
+async def test_gate_alert_is_not_queued_behind_bulk_fanout():
+    log = []
+    tasks = TaskRegistry()
+    dispatcher = PushDispatcher(tasks, recording_fanout(log), workers={}, queue_size=100, chunk=50)
+    dispatcher.submit(job(Priority.BULK, "notice", [f"m{i}" for i in range(5000)]))
+    await asyncio.sleep(0)  # bulk worker starts and yields after its first chunk
+    dispatcher.submit(job(Priority.GATE, "gate", ["resident"]))
+
+    first_gate = log.index(("gate", "resident"))
+    assert first_gate < 5000
+    assert sum(1 for name, _ in log[:first_gate] if name == "notice") <= 100
+
+    await dispatcher.stop(timeout=5)
+    assert len(log) == 5001
+    stats = dispatcher.stats()
+    assert stats["gate"]["inline"] == 1
+    assert stats["bulk"]["delivered"] == 1 and stats["bulk"]["queue_depth"] == 0
+    assert stats["bulk"]["latency_max_ms"] >= stats["gate"]["latency_max_ms"]
+    await asyncio.sleep(0)  # registry done-callbacks
+    assert len(tasks) == 0
+
+
+@pytest.mark.asyncio
+async def test_backlogged_class_keeps_order_and_full_queue_drops():
+    log = []
+    dispatcher = PushDispatcher(TaskRegistry(), recording_fanout(log), workers={}, queue_size=2, chunk=1)
+    dispatcher.submit(job(Priority.BULK, "a", ["x", "y"]))
+    dispatcher.submit(job(Priority.BULK, "b", ["x"]))
+    dispatcher.submit(job(Priority.BULK, "c", ["x"]))  # queue of 2 is full
+    await dispatcher.stop(timeout=5)
+    assert [name for name, _ in log] == ["a", "a", "b"]
+    assert dispatcher.stats()["bulk"]["dropped"] == 1
+
+
+class Socket:
+    def __init__(self):
+        self.frames = []
+        self.release = asyncio.Event()
+
+    async def send_text(self, text):
+        await self.release.wait()
+        self.frames.append(json.loads(text)["n"])
+
+    async def close(self, code=1000):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_socket_sends_higher_priority_frames_first():
+    tasks = TaskRegistry()
+    connections = ConnectionManager(tasks, queue_size=10, send_timeout=5.0, heartbeat_seconds=30.0)
+    ws, user_id = Socket(), uuid4()
+    connections.register(ws, user_id)
+    for i in range(3):
+        connections.send({"n": f"bulk{i}"}, user_ids=[user_id], priority=Priority.BULK)
+        await asyncio.sleep(0)
+    connections.send({"n": "gate"}, user_ids=[user_id], priority=Priority.GATE)
+    ws.release.set()
+    await asyncio.sleep(0.01)
+    assert ws.frames == ["bulk0", "gate", "bulk1", "bulk2"]  # bulk0 was already being sent
+    connections.close_all()
+    await tasks.drain(1)
@@ -0,0 +1,77 @@
+"""
+Society notice tests: one row per notice, merged into members' notifications at read time with a per-user read set.
+Run: pytest tests/test_society_notices.py -v (from backend dir).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Notification, Society, SocietyNotice, SocietyNoticeRead, User
+from app.services.notification_service import (
+    create_society_notice, list_user_notifications_page, mark_notification_read,
+)
+
+
+async def list_user_notifications(db, user_id, **kwargs):
+    return (await list_user_notifications_page(db, user_id, **kwargs)).items
+
+
+async def seed(session_factory):
+    async with session_factory() as db:
+        ours = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        theirs = Society(name="Blue Hill", slug="blue-hill", contact_email="bh@example.com")
+        db.add_all([ours, theirs])
+        await db.flush()
+        joined = datetime.utcnow() - timedelta(days=1)
+        members = [
+            User(email=f"r{i}@example.com", full_name=f"Resident {i}", role="resident",
+                 society_id=ours.id, created_at=joined)
+            for i in range(3)
+        ]
+        outsider = User(email="o@example.com", full_name="Outsider", role="resident", society_id=theirs.id)
+        db.add_all(members + [outsider])
+        await db.flush()
+        await db.commit()
+        return ours.id, [m.id for m in members], outsider.id
+
+
+@pytest.mark.asyncio
+async def test_notice_is_one_row_merged_per_member(session_factory):
+    society_id, members, outsider = await seed(session_factory)
+    async with session_factory() as db:
+        db.add(Notification(user_id=members[0], type="visitor_arrived", title="Visitor checked in",
+                            created_at=datetime.utcnow() - timedelta(hours=1)))
+        notice = await create_society_notice(db, society_id, "Water cut", "10am-2pm", created_by=members[0])
+        await db.commit()
+        assert await db.scalar(select(func.count()).select_from(SocietyNotice)) == 1
+        assert await db.scalar(select(func.count()).select_from(Notification)) == 1
+
+        first = await list_user_notifications(db, members[0])
+        assert [n["type"] for n in first] == ["society_notice", "visitor_arrived"]
+        assert first[0]["id"] == str(notice.id) and first[0]["read"] is False
+        assert [n["title"] for n in await list_user_notifications(db, members[1])] == ["Water cut"]
+        assert await list_user_notifications(db, outsider) == []
+
+        assert await mark_notification_read(db, members[1], notice.id)
+        assert await mark_notification_read(db, members[1], notice.id)  # idempotent
+        assert not await mark_notification_read(db, outsider, notice.id)
+        await db.commit()
+        assert await db.scalar(select(func.count()).select_from(SocietyNoticeRead)) == 1
+        assert (await list_user_notifications(db, members[1]))[0]["read"] is True
+        assert await list_user_notifications(db, members[1], unread_only=True) == []
+        assert len(await list_user_notifications(db, members[2], unread_only=True)) == 1
+
+
+@pytest.mark.asyncio
+async def test_members_joining_later_do_not_see_older_notices(session_factory):
+    society_id, members, _ = await seed(session_factory)
+    async with session_factory() as db:
+        await create_society_notice(db, society_id, "Old notice", None)
+        await db.flush()
+        newcomer = User(email="new@example.com", full_name="New", role="resident", society_id=society_id,
+                        created_at=datetime.utcnow() + timedelta(seconds=1))
+        db.add(newcomer)
+        await db.commit()
+        assert await list_user_notifications(db, newcomer.id) == []
+        assert len(await list_user_notifications(db, members[0])) == 1
@@ -0,0 +1,95 @@
+"""
+Access-token verification cache: hits skip the decode, entries never outlive the token, logout drops them.
+Run: pytest tests/test_token_cache.py -v (from backend dir).
+"""
+import time
+import uuid
+
+import pytest
+from jose import jwt
+
+from app.core import security, token_cache as token_cache_module
+from app.core.security import create_access_token, invalidate_token, verify_token
+from app.core.token_cache import TokenCache, token_cache
+
+
+def local_token(user_id: str = None, **claims) -> str:
+    return create_access_token(user_id or str(uuid.uuid4()), "resident@example.com", ["resident"], **claims)
+
+
+@pytest.mark.asyncio
+async def test_second_verification_is_served_from_cache(monkeypatch):
+    token_cache.clear()
+    society_id = str(uuid.uuid4())
+    token = local_token(society_id=society_id)
+    first = await verify_token(token)
+    assert first["society_id"] == society_id and first["user_id"] == first["sub"]
+
+    def no_decode(token: str):
+        raise AssertionError("cached token decoded again")
+
+    monkeypatch.setattr(security, "_decode_token", no_decode)
+    second = await verify_token(token)
+    assert second == first
+    second["realm_access"]["roles"].append("platform_admin")  # callers cannot poison the cache
+    assert (await verify_token(token))["realm_access"]["roles"] == ["resident"]
+    stats = token_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_invalid_tokens_are_rejected_and_not_cached():
+    token_cache.clear()
+    forged = jwt.encode({"sub": "x", "iss": security.LOCAL_JWT_ISSUER, "exp": int(time.time()) + 600}, "not-the-key")
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await verify_token(forged)
+    assert token_cache.stats()["size"] == 0 and token_cache.stats()["misses"] == 2
+
+
+def test_entries_never_outlive_the_token(monkeypatch):
+    cache = TokenCache(ttl_seconds=300, max_entries=10)
+    now = time.time()
+    cache.put("expired", {"sub": "u", "exp": now - 1})
+    assert cache.get("expired") is None and cache.stats()["size"] == 0
+
+    cache.put("short", {"sub": "u", "exp": now + 5})
+    assert cache.get("short") == {"sub": "u", "exp": now + 5}
+    monkeypatch.setattr(token_cache_module.time, "time", lambda: now + 6)
+    assert cache.get("short") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["size"] == 0
+
+    cache.put("long", {"sub": "u", "exp": now + 3600})  # TTL caps a long-lived token
+    monkeypatch.setattr(token_cache_module.time, "time", lambda: now + 6 + 301)
+    assert cache.get("long") is None
+
+
+def test_lru_bound_and_disabled_cache():
+    cache = TokenCache(ttl_seconds=300, max_entries=2)
+    exp = time.time() + 600
+    for name in ("a", "b"):
+        cache.put(name, {"sub": name, "exp": exp})
+    cache.get("a")
+    cache.put("c", {"sub": "c", "exp": exp})
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+    off = TokenCache(ttl_seconds=0, max_entries=2)
+    off.put("a", {"sub": "a", "exp": exp})
+    assert off.get("a") is None and off.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_logout_hook_drops_every_token_of_the_user():
+    token_cache.clear()
+    user_id, other = str(uuid.uuid4()), str(uuid.uuid4())
+    phone, laptop, theirs = local_token(user_id), local_token(user_id, full_name="Laptop"), local_token(other)
+    for token in (phone, laptop, theirs):
+        await verify_token(token)
+    invalidate_token(user_id=user_id)
+    stats = token_cache.stats()
+    assert (stats["size"], stats["users"], stats["invalidations"]) == (1, 1, 2)
+
+    invalidate_token(token=theirs)
+    assert token_cache.stats()["size"] == 0
+    assert (await verify_token(phone))["user_id"] == user_id  # still a valid JWT, just verified afresh
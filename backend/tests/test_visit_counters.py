@@ -0,0 +1,104 @@
+"""
+Dashboard counter tests: transitions keep counters equal to a recount; reconcile corrects drift.
+Run: pytest tests/test_visit_counters.py -v (from backend dir).
+"""
+import pytest
+from sqlalchemy import update
+
+from app.models import Society, User, SocietyVisitCounters
+from app.models.visitor import VisitStatus
+from app.services import visit_counters
+from app.services.visit_counters import count_visits, counter_mirror, get_society_stats, reconcile_counters
+from app.services.visit_service import (
+    approve_visit, checkout_visit, create_invitation, create_walkin_visit, get_visit_by_id,
+)
+
+
+async def seed_society(session_factory):
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        host = User(email="host@example.com", full_name="Host", role="resident", society_id=society.id)
+        db.add(host)
+        await db.flush()
+        await reconcile_counters(db)
+        return society.id, host.id
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_transitions(session_factory):
+    society_id, host_id = await seed_society(session_factory)
+    async with session_factory() as db:
+        await create_invitation(db, host_id, "9000000001", "Invited")
+        await create_invitation(db, host_id, "9000000001", "Invited")  # same visitor: counted once today
+        walkin = await create_walkin_visit(db, host_id, "9000000002", "Walk-in")
+        await db.commit()
+        assert await get_society_stats(db, society_id) == {
+            "visitors_today": 2, "pending_approvals": 3, "checked_in": 0,
+        }
+
+        walkin = await approve_visit(db, walkin)  # walk-in approval checks the visitor in
+        await db.commit()
+        assert walkin.status == VisitStatus.CHECKED_IN
+        assert await get_society_stats(db, society_id) == await count_visits(db, society_id)
+
+        await checkout_visit(db, walkin)
+        await db.commit()
+        stats = await get_society_stats(db, society_id)
+        assert stats == await count_visits(db, society_id)
+        assert stats["checked_in"] == 0
+
+    # A fresh read of the row (as another worker would see it) agrees with the mirror
+    counter_mirror.invalidate()
+    async with session_factory() as db:
+        assert await get_society_stats(db, society_id) == stats
+
+
+@pytest.mark.asyncio
+async def test_reconcile_corrects_drift(session_factory):
+    society_id, host_id = await seed_society(session_factory)
+    async with session_factory() as db:
+        await create_invitation(db, host_id, "9000000001", "Invited")
+        await db.commit()
+        await db.execute(
+            update(SocietyVisitCounters)
+            .where(SocietyVisitCounters.society_id == society_id)
+            .values(pending=42)
+        )
+        await db.commit()
+        assert await reconcile_counters(db) == 1
+        assert (await get_society_stats(db, society_id))["pending_approvals"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_transition_committed_after_its_count(session_factory, monkeypatch):
+    society_id, host_id = await seed_society(session_factory)
+    async with session_factory() as db:
+        visit = await create_invitation(db, host_id, "9000000001", "Invited")
+        await db.commit()
+        await db.execute(
+            update(SocietyVisitCounters)
+            .where(SocietyVisitCounters.society_id == society_id)
+            .values(pending=42)
+        )
+        await db.commit()
+        visit_id = visit.id
+
+    grouped_counts = visit_counters._grouped_counts
+
+    async def count_then_approve(db, today):
+        counts = await grouped_counts(db, today)  # still sees the visit pending
+        async with session_factory() as gate:
+            await approve_visit(gate, await get_visit_by_id(gate, visit_id))
+            await gate.commit()
+        return counts
+
+    monkeypatch.setattr(visit_counters, "_grouped_counts", count_then_approve)
+    async with session_factory() as db:
+        assert await reconcile_counters(db) == 1
+    counter_mirror.invalidate()
+    async with session_factory() as db:
+        stats = await get_society_stats(db, society_id)
+        assert stats["pending_approvals"] == 0  # the approval is not overwritten by the stale count
+        assert stats == await count_visits(db, society_id)
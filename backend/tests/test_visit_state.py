@@ -0,0 +1,59 @@
+"""
+Visit state machine tests: conditional UPDATE transitions and lost races.
+Run: pytest tests/test_visit_state.py -v (from backend dir).
+"""
+import pytest
+
+from app.models import Society, User, Visitor, Visit
+from app.models.visitor import VisitStatus
+from app.services.visit_service import get_visit_by_id
+from app.services.visit_state import VisitTransitionError, transition_visit
+
+
+async def seed_visit(session_factory, status=VisitStatus.PENDING):
+    async with session_factory() as db:
+        society = Society(name="Green Park", slug="green-park", contact_email="gp@example.com")
+        db.add(society)
+        await db.flush()
+        host = User(email="host@example.com", full_name="Host", role="resident", society_id=society.id)
+        visitor = Visitor(phone="9000000001", full_name="Visitor")
+        db.add_all([host, visitor])
+        await db.flush()
+        visit = Visit(visitor_id=visitor.id, host_id=host.id, society_id=society.id, status=status)
+        db.add(visit)
+        await db.commit()
+        return visit.id
+
+
+@pytest.mark.asyncio
+async def test_transition_updates_loaded_instance(session_factory):
+    visit_id = await seed_visit(session_factory)
+    async with session_factory() as db:
+        visit = await get_visit_by_id(db, visit_id)
+        updated = await transition_visit(db, visit_id, VisitStatus.PENDING, VisitStatus.APPROVED)
+        assert updated is visit
+        assert visit.status == VisitStatus.APPROVED
+        assert visit.visitor.full_name == "Visitor"
+
+
+@pytest.mark.asyncio
+async def test_second_checkin_loses_race(session_factory):
+    visit_id = await seed_visit(session_factory, VisitStatus.APPROVED)
+    async with session_factory() as guard_a, session_factory() as guard_b:
+        visit_a = await get_visit_by_id(guard_a, visit_id)
+        visit_b = await get_visit_by_id(guard_b, visit_id)
+        await guard_a.commit()
+        await guard_b.commit()
+
+        await transition_visit(guard_a, visit_a.id, visit_a.status, VisitStatus.CHECKED_IN)
+        await guard_a.commit()
+        with pytest.raises(VisitTransitionError):
+            await transition_visit(guard_b, visit_b.id, visit_b.status, VisitStatus.CHECKED_IN)
+
+
+@pytest.mark.asyncio
+async def test_disallowed_transition_is_rejected(session_factory):
+    visit_id = await seed_visit(session_factory, VisitStatus.CHECKED_OUT)
+    async with session_factory() as db:
+        with pytest.raises(VisitTransitionError):
+            await transition_visit(db, visit_id, VisitStatus.CHECKED_OUT, VisitStatus.CHECKED_IN)
@@ -0,0 +1,158 @@
+"""
+WebSocket connection manager tests: per-socket queues and writers, slow-consumer eviction, heartbeats, rooms from
+token claims, and shutdown draining through the task registry.
+Run: pytest tests/test_ws_connections.py -v (from backend dir).
+"""
+import asyncio
+import json
+from uuid import uuid4
+
+import pytest
+
+from app.core import notification_ws
+from app.core.notification_ws import (
+    CLOSE_SLOW_CONSUMER, ConnectionManager, building_room, role_room, rooms_from_claims, society_room,
+)
+from app.core.tasks import TaskRegistry
+
+
+class Socket:
+    """Records frames; a stalled socket blocks every send until released."""
+
+    def __init__(self, stalled: bool = False):
+        self.frames = []
+        self.close_code = None
+        self._release = asyncio.Event()
+        if not stalled:
+            self._release.set()
+
+    async def send_text(self, text):
+        await self._release.wait()
+        self.frames.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+async def settle():
+    await asyncio.sleep(0.01)
+
+
+def manager(tasks, **overrides):
+    options = {"queue_size": 4, "send_timeout": 5.0, "heartbeat_seconds": 30.0, **overrides}
+    return ConnectionManager(tasks, **options)
+
+
+@pytest.mark.asyncio
+async def test_slow_socket_is_evicted_without_delaying_others():
+    tasks = TaskRegistry()
+    connections = manager(tasks)
+    fast_user, slow_user = uuid4(), uuid4()
+    fast, slow = Socket(), Socket(stalled=True)
+    connections.register(fast, fast_user)
+    slow_conn = connections.register(slow, slow_user)
+
+    for i in range(6):  # slow writer holds one frame in send_text, so its queue of 4 overflows on the 6th
+        connections.send({"n": i}, user_ids=[slow_user, fast_user])
+        await settle()
+    assert [f["n"] for f in fast.frames] == list(range(6))
+    assert slow_conn.closed and not connections.is_connected(slow_user)
+    assert connections.stats()["websocket_evicted"] == 1
+
+    slow._release.set()
+    await settle()
+    assert slow.close_code == CLOSE_SLOW_CONSUMER
+    connections.close_all()
+    await tasks.drain(1)
+
+
+@pytest.mark.asyncio
+async def test_stalled_send_times_out_and_idle_socket_gets_heartbeat():
+    tasks = TaskRegistry()
+    connections = manager(tasks, send_timeout=0.05, heartbeat_seconds=0.05)
+    idle, stuck = Socket(), Socket(stalled=True)
+    connections.register(idle, uuid4())
+    stuck_user = uuid4()
+    connections.register(stuck, stuck_user)
+    connections.send({"n": 1}, user_ids=[stuck_user])
+    await asyncio.sleep(0.2)
+    assert {"event": "heartbeat"} in idle.frames
+    assert not connections.is_connected(stuck_user)
+    assert connections.stats()["websocket_send_failures"] == 1
+    connections.close_all()
+    await tasks.drain(1)
+
+
+@pytest.mark.asyncio
+async def test_close_all_closes_sockets_and_drains_writers():
+    tasks = TaskRegistry()
+    connections = manager(tasks)
+    sockets = [Socket() for _ in range(3)]
+    for ws in sockets:
+        connections.register(ws, uuid4())
+    assert len(tasks) == 3
+    connections.close_all()
+    await tasks.drain(1)
+    assert len(tasks) == 0
+    assert all(ws.close_code == 1001 for ws in sockets)
+    assert connections.stats()["websockets"] == 0
+
+
+def test_rooms_from_claims():
+    society_id, building_id = uuid4(), uuid4()
+    claims = {
+        "society_id": str(society_id).upper(),
+        "building_id": str(building_id),
+        "realm_access": {"roles": ["guard", "offline_access"]},
+    }
+    assert rooms_from_claims(claims) == [
+        society_room(society_id), role_room(society_id, "guard"), building_room(building_id),
+    ]
+    assert rooms_from_claims({"realm_access": {"roles": ["guard"]}}) == []
+    assert rooms_from_claims({"society_id": "not-a-uuid"}) == []
+
+
+@pytest.mark.asyncio
+async def test_room_push_reaches_each_member_once():
+    tasks = TaskRegistry()
+    connections = manager(tasks)
+    society_id = uuid4()
+    guards = role_room(society_id, "guard")
+    guard, resident, outsider = Socket(), Socket(), Socket()
+    guard_user = uuid4()
+    guard_conn = connections.register(guard, guard_user, [society_room(society_id), guards])
+    connections.register(resident, uuid4(), [society_room(society_id), role_room(society_id, "resident")])
+    connections.register(outsider, uuid4(), [society_room(uuid4())])
+
+    assert connections.send({"event": "gate"}, rooms=[guards]) == 1
+    # A guard addressed by id and by two rooms still gets one frame
+    assert connections.send({"event": "notice"}, user_ids=[guard_user], rooms=[society_room(society_id), guards]) == 2
+    await asyncio.sleep(0.01)
+    assert guard.frames == [{"event": "gate"}, {"event": "notice"}]
+    assert resident.frames == [{"event": "notice"}]
+    assert outsider.frames == []
+
+    connections.unregister(guard_conn)
+    assert connections.room_size(guards) == 0
+    assert connections.room_size(society_room(society_id)) == 1
+    connections.close_all()
+    await tasks.drain(1)
+    assert connections.stats()["websocket_rooms"] == 0
+
+
+@pytest.mark.asyncio
+async def test_room_notification_reaches_sse_streams_of_members():
+    society_id = uuid4()
+    rooms, elsewhere = [society_room(society_id)], [society_room(uuid4())]
+    member_id, other_id = uuid4(), uuid4()
+    member = notification_ws.subscribe(member_id, rooms)
+    other = notification_ws.subscribe(other_id, elsewhere)
+    try:
+        notification_ws.publish_to_rooms(rooms, {"id": "n1"})
+        notification_ws.publish_event(rooms, "capacity_threshold", {"occupancy": 10})
+        assert member.get_nowait() == {"id": "n1"}
+        assert member.empty() and other.empty()
+    finally:
+        notification_ws.unsubscribe(member_id, member, rooms)
+        notification_ws.unsubscribe(other_id, other, elsewhere)
+    assert notification_ws.stats()["sse_streams"] == 0